@@ -14,6 +14,7 @@ from werkzeug.exceptions import NotFound
 from configs import dify_config
 from constants.languages import languages
 from core.plugin.entities.plugin import ToolProviderID
+from core.rag.datasource.keyword.jieba.jieba_inverted_index import JiebaInvertedIndex
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.index_processor.constant.built_in_field import BuiltInField
@@ -27,7 +28,14 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DatasetMetadata, DatasetMetadataBinding, DocumentSegment
+from models.dataset import (
+    Dataset,
+    DatasetCollectionBinding,
+    DatasetKeywordTable,
+    DatasetMetadata,
+    DatasetMetadataBinding,
+    DocumentSegment,
+)
 from models.dataset import Document as DatasetDocument
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
@@ -620,6 +628,51 @@ def old_metadata_migration():
     click.echo(click.style("Old metadata migration completed.", fg="green"))
 
 
+@click.command("migrate-keyword-postings", help="Copy jieba keyword tables into keyword postings.")
+@click.option(
+    "--delete-legacy",
+    is_flag=True,
+    default=False,
+    help="Delete the keyword tables once copied, the jieba keyword store then no longer finds their keywords.",
+)
+def migrate_keyword_postings(delete_legacy: bool):
+    """
+    Copy the keyword tables of the jieba keyword store into the postings of the jieba_inverted_index store.
+    Run it after switching KEYWORD_STORE to jieba_inverted_index. The keyword tables are kept unless
+    --delete-legacy is passed, so switching back to jieba still finds the keywords indexed before.
+    """
+    click.echo(click.style("Starting keyword postings migration.", fg="green"))
+    migrated_count = 0
+    failed_count = 0
+    last_dataset_id = None
+    while True:
+        stmt = (
+            select(Dataset)
+            .join(DatasetKeywordTable, DatasetKeywordTable.dataset_id == Dataset.id)
+            .order_by(Dataset.id)
+            .limit(50)
+        )
+        if last_dataset_id:
+            stmt = stmt.where(Dataset.id > last_dataset_id)
+        datasets = db.session.scalars(stmt).all()
+        if not datasets:
+            break
+        for dataset in datasets:
+            try:
+                JiebaInvertedIndex(dataset).migrate_legacy_keyword_table(delete_legacy=delete_legacy)
+                migrated_count += 1
+            except Exception:
+                db.session.rollback()
+                failed_count += 1
+                logging.exception("Failed to migrate keywords of dataset %s", dataset.id)
+        last_dataset_id = datasets[-1].id
+    click.echo(
+        click.style(
+            f"Keyword postings migration completed, migrated: {migrated_count}, failed: {failed_count}.", fg="green"
+        )
+    )
+
+
 @click.command("create-tenant", help="Create account and tenant.")
 @click.option("--email", prompt=True, help="Tenant account email.")
 @click.option("--name", prompt=True, help="Workspace name.")
@@ -5,6 +5,7 @@ from pydantic import (
     Field,
     HttpUrl,
     NegativeInt,
+    NonNegativeFloat,
     NonNegativeInt,
     PositiveFloat,
     PositiveInt,
@@ -56,6 +57,22 @@ class SecurityConfig(BaseSettings):
         default=None,
     )
 
+    TENANT_PRIVATE_KEY_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds a parsed workspace private key is cached in each process",
+        default=300,
+    )
+
+    DECRYPTED_SECRET_CACHE_TTL: NonNegativeInt = Field(
+        description="Time in seconds decrypted credentials and secret variables are cached in each process,"
+        " 0 to disable",
+        default=60,
+    )
+
+    DECRYPTED_SECRET_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of decrypted credentials and secret variables cached in each process",
+        default=10000,
+    )
+
 
 class AppExecutionConfig(BaseSettings):
     """
@@ -162,6 +179,23 @@ class PluginConfig(BaseSettings):
         default="plugin-api-key",
     )
 
+    PLUGIN_DAEMON_POOL_MAXSIZE: PositiveInt = Field(
+        description="Maximum number of keep-alive connections to the plugin daemon kept by each process",
+        default=100,
+    )
+
+    PLUGIN_DAEMON_CONNECT_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds for connecting to the plugin daemon",
+        default=10.0,
+    )
+
+    PLUGIN_DAEMON_READ_TIMEOUT: PositiveFloat = Field(
+        description="Default timeout in seconds for reading a response from the plugin daemon,"
+        " applies between received chunks for streamed responses."
+        " Installs, uploads and model, tool and agent invocations have no read timeout",
+        default=600.0,
+    )
+
     INNER_API_KEY_FOR_PLUGIN: str = Field(description="Inner api key for plugin", default="inner-api-key")
 
     PLUGIN_REMOTE_INSTALL_HOST: str = Field(
@@ -184,6 +218,22 @@ class PluginConfig(BaseSettings):
         default=15728640 * 12,
     )
 
+    PLUGIN_DECLARATION_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of plugin provider declarations and model schemas kept in the in-process"
+        " cache, 0 to disable",
+        default=1000,
+    )
+
+    PLUGIN_DECLARATION_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds plugin provider declarations and model schemas are cached",
+        default=600,
+    )
+
+    PLUGIN_DECLARATION_REDIS_CACHE_ENABLED: bool = Field(
+        description="Share cached plugin provider declarations and model schemas between processes through Redis",
+        default=False,
+    )
+
 
 class MarketplaceConfig(BaseSettings):
     """
@@ -529,6 +579,11 @@ class WorkflowConfig(BaseSettings):
         default=200 * 1024,
     )
 
+    WORKFLOW_GRAPH_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of parsed workflow graphs kept in the in-process cache, 0 to disable",
+        default=128,
+    )
+
 
 class WorkflowNodeExecutionConfig(BaseSettings):
     """
@@ -540,11 +595,53 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_SCHEDULER_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel node executions started by workflow runs that run at once in a"
+        " process, nested parallel branches and iteration items are limited by WORKFLOW_SCHEDULER_NESTED_MAX_TASKS",
+        default=100,
+    )
+
+    WORKFLOW_SCHEDULER_TENANT_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel node executions started by the workflow runs of one tenant that run"
+        " at once in a process",
+        default=20,
+    )
+
+    WORKFLOW_SCHEDULER_RUN_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel node executions of one workflow run that run at once",
+        default=10,
+    )
+
+    WORKFLOW_SCHEDULER_NESTED_MAX_TASKS: PositiveInt = Field(
+        description="Maximum number of nested parallel branches and iteration items, started by parallel node"
+        " executions that are already running, queued or running at once in a process. Submitting more fails the"
+        " node, so a process runs at most WORKFLOW_SCHEDULER_MAX_WORKERS + WORKFLOW_SCHEDULER_NESTED_MAX_TASKS"
+        " scheduler threads",
+        default=200,
+    )
+
     WORKFLOW_NODE_EXECUTION_STORAGE: str = Field(
         default="rdbms",
         description="Storage backend for WorkflowNodeExecution. Options: 'rdbms', 'hybrid'",
     )
 
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Seconds between background writes of node executions buffered by"
+        " WriteBehindWorkflowNodeExecutionRepository",
+        default=0.5,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of buffered node executions of a workflow run that triggers a background write right away",
+        default=100,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS: PositiveInt = Field(
+        description="Number of failed background writes of the node executions of a workflow run, retried with an"
+        " exponential backoff, after which its buffered executions are dropped",
+        default=5,
+    )
+
 
 class RepositoryConfig(BaseSettings):
     """
@@ -739,6 +836,24 @@ class RagEtlConfig(BaseSettings):
         default="database",
     )
 
+    KEYWORD_SCORE_METHOD: Literal["tfidf_cosine", "bm25"] = Field(
+        description="Keyword scoring used by weighted rerank and economy multi-dataset retrieval"
+        " ('tfidf_cosine' or 'bm25'), default to 'tfidf_cosine'",
+        default="tfidf_cosine",
+    )
+
+    KEYWORD_FEATURE_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of chunk keyword sets kept in the in-process cache used by keyword scoring,"
+        " 0 to disable",
+        default=10000,
+    )
+
+    KEYWORD_FEATURE_CACHE_TTL: NonNegativeInt = Field(
+        description="Expiration time in seconds of chunk keyword sets cached in Redis for keyword scoring,"
+        " 0 to disable",
+        default=86400,
+    )
+
     UNSTRUCTURED_API_URL: Optional[str] = Field(
         description="API URL for Unstructured.io service",
         default=None,
@@ -817,6 +932,61 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    EMBEDDING_CACHE_LOOKUP_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of text hashes resolved per query when looking up or storing cached embeddings",
+        default=500,
+    )
+
+    EMBEDDING_CACHE_LRU_SIZE: NonNegativeInt = Field(
+        description="Maximum number of document embeddings kept in the in-process LRU cache, 0 to disable",
+        default=0,
+    )
+
+    EMBEDDING_CACHE_BINARY_FORMAT_ENABLED: bool = Field(
+        description="Store cached embeddings as raw float64 arrays instead of pickled lists. Versions before this"
+        " option was added cannot read them, enable it once no api or worker of such a version runs anymore",
+        default=False,
+    )
+
+    EMBEDDING_CONCURRENT_BATCHES: PositiveInt = Field(
+        description="Maximum number of document embedding requests a workspace has in flight per embedding model"
+        " in each process, shared by all its indexing calls. 1 sends the requests of each call one by one",
+        default=1,
+    )
+
+    EMBEDDING_EXECUTOR_WORKERS: PositiveInt = Field(
+        description="Number of threads per process sending document embedding requests concurrently,"
+        " used when EMBEDDING_CONCURRENT_BATCHES is above 1",
+        default=32,
+    )
+
+    EMBEDDING_BATCH_MAX_TOKENS: NonNegativeInt = Field(
+        description="Token budget of a single document embedding request, 0 to batch by the model's max chunks only",
+        default=0,
+    )
+
+    EMBEDDING_RATE_LIMIT_MAX_RETRIES: NonNegativeInt = Field(
+        description="Maximum number of retries with exponential backoff when an embedding request is rate limited",
+        default=3,
+    )
+
+    INDEXING_STREAMING_BATCH_SIZE: NonNegativeInt = Field(
+        description="Number of extracted text documents (e.g. pages) split, embedded and written per batch when"
+        " indexing a document as a stream of batches, 0 to index the whole document at once",
+        default=0,
+    )
+
+    INDEXING_STREAMING_MAX_PENDING_BATCHES: PositiveInt = Field(
+        description="Maximum number of split batches waiting to be embedded before splitting pauses",
+        default=2,
+    )
+
+    INDEXING_CHECKPOINT_BATCH_SIZE: PositiveInt = Field(
+        description="Number of segments embedded and written to the vector store before their progress is committed,"
+        " a paused or retried document resumes after the last committed batch",
+        default=100,
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -865,6 +1035,19 @@ class CeleryScheduleTasksConfig(BaseSettings):
         description="Enable check upgradable plugin task",
         default=True,
     )
+    CLEAN_MESSAGES_BATCH_SIZE: PositiveInt = Field(
+        description="Number of messages the clean messages task checks and deletes per transaction",
+        default=1000,
+    )
+    CLEAN_EMBEDDING_CACHE_BATCH_SIZE: PositiveInt = Field(
+        description="Number of embeddings the clean embedding cache task deletes per transaction",
+        default=1000,
+    )
+    CLEAN_TASK_BATCH_INTERVAL: NonNegativeFloat = Field(
+        description="Seconds the clean messages and clean embedding cache tasks wait between batches,"
+        " to leave the database to other queries",
+        default=0.1,
+    )
 
 
 class PositionConfig(BaseSettings):
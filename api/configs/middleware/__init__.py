@@ -1,4 +1,3 @@
-import os
 from typing import Any, Literal, Optional
 from urllib.parse import parse_qsl, quote_plus
 
@@ -90,11 +89,29 @@ class VectorStoreConfig(BaseSettings):
         default="Vector_index",
     )
 
+    VECTOR_CLIENT_IDLE_TIMEOUT: NonNegativeInt = Field(
+        description="Seconds a shared vector store client or connection pool may stay unused before it is closed."
+        " Set to 0 to keep clients open.",
+        default=600,
+    )
+
+    VECTOR_CLIENT_HEALTH_CHECK_INTERVAL: NonNegativeInt = Field(
+        description="Minimum seconds between health checks of a shared vector store client before it is reused.",
+        default=60,
+    )
+
+    VECTOR_POOL_CONNECTION_TIMEOUT: PositiveFloat = Field(
+        description="Seconds to wait for a free connection of a shared vector store connection pool before failing.",
+        default=30,
+    )
+
 
 class KeywordStoreConfig(BaseSettings):
     KEYWORD_STORE: str = Field(
         description="Method for keyword extraction and storage."
-        " Default is 'jieba', a Chinese text segmentation library.",
+        " Default is 'jieba', a Chinese text segmentation library."
+        " 'jieba_inverted_index' stores keywords as per-segment postings instead of one JSON table per dataset,"
+        " run `flask migrate-keyword-postings` after switching to it to copy the keywords of existing datasets.",
         default="jieba",
     )
 
@@ -183,8 +200,24 @@ class DatabaseConfig(BaseSettings):
     )
 
     RETRIEVAL_SERVICE_EXECUTORS: NonNegativeInt = Field(
-        description="Number of processes for the retrieval service, default to CPU cores.",
-        default=os.cpu_count() or 1,
+        description="Number of worker threads shared by the search branches of all retrievals in the process.",
+        default=64,
+    )
+
+    RETRIEVAL_DATASET_EXECUTORS: PositiveInt = Field(
+        description="Number of shared worker threads retrieving datasets of multi-dataset queries.",
+        default=32,
+    )
+
+    RETRIEVAL_SERVICE_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds for the search branches of a retrieval, late branches are discarded.",
+        default=30,
+    )
+
+    RETRIEVAL_DATASET_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds for the datasets of a multi-dataset query, late datasets are discarded"
+        " with a warning.",
+        default=60,
     )
 
     @computed_field  # type: ignore[misc]
@@ -40,8 +40,8 @@ class OpenGaussConfig(BaseSettings):
     )
 
     OPENGAUSS_MAX_CONNECTION: PositiveInt = Field(
-        description="Max connection of the OpenGauss database",
-        default=5,
+        description="Max connection of the OpenGauss database, shared by all requests of a process",
+        default=20,
     )
 
     OPENGAUSS_ENABLE_PQ: bool = Field(
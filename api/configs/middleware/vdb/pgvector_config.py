@@ -40,8 +40,8 @@ class PGVectorConfig(BaseSettings):
     )
 
     PGVECTOR_MAX_CONNECTION: PositiveInt = Field(
-        description="Max connection of the PostgreSQL database",
-        default=5,
+        description="Max connection of the PostgreSQL database, shared by all requests of a process",
+        default=20,
     )
 
     PGVECTOR_PG_BIGM: bool = Field(
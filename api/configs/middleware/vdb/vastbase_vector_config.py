@@ -40,6 +40,6 @@ class VastbaseVectorConfig(BaseSettings):
     )
 
     VASTBASE_MAX_CONNECTION: PositiveInt = Field(
-        description="Max connection of the Vastbase database",
-        default=5,
+        description="Max connection of the Vastbase database, shared by all requests of a process",
+        default=20,
     )
@@ -0,0 +1,125 @@
+import threading
+import time
+from enum import Enum
+from typing import Any, Generic, Optional, TypeVar
+
+from cachetools import LRUCache
+from pydantic import TypeAdapter
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+T = TypeVar("T")
+
+# In-process tier, keyed by (tenant_id, version, cache type, key), holding (expires_at, serialized declaration).
+# Entries of an old version are never read again and age out of the LRU.
+_declaration_lru_cache: Optional[LRUCache] = (
+    LRUCache(maxsize=dify_config.PLUGIN_DECLARATION_CACHE_SIZE)
+    if dify_config.PLUGIN_DECLARATION_CACHE_SIZE > 0
+    else None
+)
+_declaration_lru_lock = threading.Lock()
+
+
+class PluginDeclarationCacheType(Enum):
+    TOOL_PROVIDER = "tool_provider"
+    MODEL_PROVIDERS = "model_providers"
+    MODEL_SCHEMA = "model_schema"
+
+
+# building a TypeAdapter compiles a validator, each value type is built once per process
+_type_adapters: dict[Any, TypeAdapter[Any]] = {}
+
+
+def _type_adapter(value_type: type[T]) -> TypeAdapter[T]:
+    type_adapter = _type_adapters.get(value_type)
+    if type_adapter is None:
+        type_adapter = _type_adapters[value_type] = TypeAdapter(value_type)
+    return type_adapter
+
+
+class PluginDeclarationCache(Generic[T]):
+    """
+    Cache of the declarations the plugin daemon returns for the plugins installed in a tenant.
+
+    Declarations are cached per process and, with PLUGIN_DECLARATION_REDIS_CACHE_ENABLED, in Redis for the other
+    processes. Entries are stored under the tenant's declaration version, which `invalidate` bumps whenever
+    plugins of the tenant are installed, upgraded or uninstalled, so every process stops reading the old ones
+    at once. Entries also expire after PLUGIN_DECLARATION_CACHE_TTL seconds, which bounds how long changes the
+    api cannot see, such as debugging plugins, take to show up.
+
+    Declarations are kept serialized and parsed on every hit, callers get their own copy to modify.
+    """
+
+    def __init__(self, tenant_id: str, cache_type: PluginDeclarationCacheType, key: str, value_type: type[T]):
+        # read the version once, so a declaration fetched before an invalidation is not stored under the new one
+        self.version = self.get_version(tenant_id)
+        self.cache_key = f"plugin_declarations:tenant_id:{tenant_id}:version:{self.version}:{cache_type.value}:{key}"
+        self._type_adapter: TypeAdapter[T] = _type_adapter(value_type)
+
+    def get(self) -> Optional[T]:
+        """
+        Get the cached declaration.
+
+        :return: the declaration, or None if it is not cached
+        """
+        if _declaration_lru_cache is not None:
+            with _declaration_lru_lock:
+                cached = _declaration_lru_cache.get(self.cache_key)
+            if cached is not None and cached[0] > time.monotonic():
+                return self._type_adapter.validate_json(cached[1])
+
+        if dify_config.PLUGIN_DECLARATION_REDIS_CACHE_ENABLED:
+            data = redis_client.get(self.cache_key)
+            if data:
+                self._set_local(data)
+                return self._type_adapter.validate_json(data)
+
+        return None
+
+    def set(self, value: T) -> None:
+        """
+        Cache the declaration.
+
+        :param value: the declaration
+        """
+        data = self._type_adapter.dump_json(value)
+        self._set_local(data)
+        if dify_config.PLUGIN_DECLARATION_REDIS_CACHE_ENABLED:
+            redis_client.setex(self.cache_key, dify_config.PLUGIN_DECLARATION_CACHE_TTL, data)
+
+    def _set_local(self, data: bytes) -> None:
+        if _declaration_lru_cache is not None:
+            with _declaration_lru_lock:
+                _declaration_lru_cache[self.cache_key] = (
+                    time.monotonic() + dify_config.PLUGIN_DECLARATION_CACHE_TTL,
+                    data,
+                )
+
+    @staticmethod
+    def get_version(tenant_id: str) -> int:
+        version = redis_client.get(f"plugin_declarations:version:tenant_id:{tenant_id}")
+        return int(version) if version else 0
+
+    @staticmethod
+    def invalidate(tenant_id: str) -> None:
+        """
+        Invalidate the cached declarations of the tenant in all processes.
+
+        :param tenant_id: tenant id
+        """
+        redis_client.incr(f"plugin_declarations:version:tenant_id:{tenant_id}")
+
+    @staticmethod
+    def invalidate_for_finished_task(tenant_id: str, task_id: str) -> None:
+        """
+        Invalidate the cached declarations of the tenant once for a finished install task.
+
+        Installs and upgrades finish in the plugin daemon after the request starting them returned, the first
+        one to see the task finished invalidates the declarations cached meanwhile.
+
+        :param tenant_id: tenant id
+        :param task_id: install task id
+        """
+        if redis_client.set(f"plugin_declarations:install_task:{task_id}", 1, nx=True, ex=86400):
+            PluginDeclarationCache.invalidate(tenant_id)
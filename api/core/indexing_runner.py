@@ -2,14 +2,17 @@ import concurrent.futures
 import datetime
 import json
 import logging
+import queue
 import re
 import threading
 import time
 import uuid
+from collections import deque
 from typing import Any, Optional, cast
 
 from flask import current_app
 from flask_login import current_user
+from sqlalchemy import func
 from sqlalchemy.orm.exc import ObjectDeletedError
 
 from configs import dify_config
@@ -38,6 +41,7 @@ from libs import helper
 from models.dataset import ChildChunk, Dataset, DatasetProcessRule, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from models.model import UploadFile
+from services.entities.knowledge_entities.knowledge_entities import ParentMode
 from services.feature_service import FeatureService
 
 
@@ -69,6 +73,13 @@ class IndexingRunner:
                 # extract
                 text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
 
+                if self._is_streaming_enabled(dataset_document, processing_rule.to_dict()):
+                    # transform, save and load batch by batch
+                    self._run_streaming(
+                        index_processor, dataset, dataset_document, text_docs, processing_rule.to_dict()
+                    )
+                    continue
+
                 # transform
                 documents = self._transform(
                     index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
@@ -108,12 +119,32 @@ class IndexingRunner:
             if not dataset:
                 raise ValueError("no dataset found")
 
+            # get the process rule
+            processing_rule = (
+                db.session.query(DatasetProcessRule)
+                .where(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
+                .first()
+            )
+            if not processing_rule:
+                raise ValueError("no process rule found")
+
+            index_type = dataset_document.doc_form
+            index_processor = IndexProcessorFactory(index_type).init_index_processor()
+
             # get exist document_segment list and delete
             document_segments = (
                 db.session.query(DocumentSegment)
                 .filter_by(dataset_id=dataset.id, document_id=dataset_document.id)
                 .all()
             )
+            if document_segments:
+                # an interrupted streaming run may have indexed some of the segments already
+                index_processor.clean(
+                    dataset,
+                    [document_segment.index_node_id for document_segment in document_segments],
+                    with_keywords=True,
+                    delete_child_chunks=True,
+                )
 
             for document_segment in document_segments:
                 db.session.delete(document_segment)
@@ -121,20 +152,14 @@ class IndexingRunner:
                     # delete child chunks
                     db.session.query(ChildChunk).where(ChildChunk.segment_id == document_segment.id).delete()
             db.session.commit()
-            # get the process rule
-            processing_rule = (
-                db.session.query(DatasetProcessRule)
-                .where(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
-                .first()
-            )
-            if not processing_rule:
-                raise ValueError("no process rule found")
-
-            index_type = dataset_document.doc_form
-            index_processor = IndexProcessorFactory(index_type).init_index_processor()
             # extract
             text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
 
+            if self._is_streaming_enabled(dataset_document, processing_rule.to_dict()):
+                # transform, save and load batch by batch
+                self._run_streaming(index_processor, dataset, dataset_document, text_docs, processing_rule.to_dict())
+                return
+
             # transform
             documents = self._transform(
                 index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
@@ -177,36 +202,15 @@ class IndexingRunner:
             )
 
             documents = []
+            # segments are marked completed batch by batch, resume after the last completed batch
+            completed_tokens = 0
             if document_segments:
                 for document_segment in document_segments:
+                    if document_segment.status == "completed":
+                        completed_tokens += document_segment.tokens or 0
                     # transform segment to node
-                    if document_segment.status != "completed":
-                        document = Document(
-                            page_content=document_segment.content,
-                            metadata={
-                                "doc_id": document_segment.index_node_id,
-                                "doc_hash": document_segment.index_node_hash,
-                                "document_id": document_segment.document_id,
-                                "dataset_id": document_segment.dataset_id,
-                            },
-                        )
-                        if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
-                            child_chunks = document_segment.get_child_chunks()
-                            if child_chunks:
-                                child_documents = []
-                                for child_chunk in child_chunks:
-                                    child_document = ChildDocument(
-                                        page_content=child_chunk.content,
-                                        metadata={
-                                            "doc_id": child_chunk.index_node_id,
-                                            "doc_hash": child_chunk.index_node_hash,
-                                            "document_id": document_segment.document_id,
-                                            "dataset_id": document_segment.dataset_id,
-                                        },
-                                    )
-                                    child_documents.append(child_document)
-                                document.children = child_documents
-                        documents.append(document)
+                    else:
+                        documents.append(self._segment_to_document(dataset_document, document_segment))
 
             # build index
             # get the process rule
@@ -218,8 +222,109 @@ class IndexingRunner:
 
             index_type = dataset_document.doc_form
             index_processor = IndexProcessorFactory(index_type).init_index_processor()
+            if documents:
+                # drop vectors the interrupted batch may have written before it was marked completed
+                index_processor.clean(
+                    dataset, [document.metadata["doc_id"] for document in documents], with_keywords=False
+                )
             self._load(
-                index_processor=index_processor, dataset=dataset, dataset_document=dataset_document, documents=documents
+                index_processor=index_processor,
+                dataset=dataset,
+                dataset_document=dataset_document,
+                documents=documents,
+                completed_tokens=completed_tokens,
+            )
+        except DocumentIsPausedError:
+            raise DocumentIsPausedError(f"Document paused, document id: {dataset_document.id}")
+        except ProviderTokenNotInitError as e:
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e.description)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+        except Exception as e:
+            logging.exception("consume document failed")
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+
+    def run_in_streaming_status(self, dataset_document: DatasetDocument):
+        """
+        Resume a streaming run that stopped before the whole document was split.
+
+        Segments of the batches split up to the last split checkpoint are kept and the ones not completed yet
+        are loaded again, the rest of the document is extracted, split and loaded from there.
+        """
+        try:
+            # get dataset
+            dataset = db.session.query(Dataset).filter_by(id=dataset_document.dataset_id).first()
+
+            if not dataset:
+                raise ValueError("no dataset found")
+
+            checkpoint = self.get_split_checkpoint(dataset_document.id)
+            if not checkpoint:
+                raise ValueError("no split checkpoint found")
+            split_text_docs, max_position = checkpoint
+
+            # get the process rule
+            processing_rule = (
+                db.session.query(DatasetProcessRule)
+                .where(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
+                .first()
+            )
+            if not processing_rule:
+                raise ValueError("no process rule found")
+
+            index_type = dataset_document.doc_form
+            index_processor = IndexProcessorFactory(index_type).init_index_processor()
+
+            document_segments = (
+                db.session.query(DocumentSegment)
+                .filter_by(dataset_id=dataset.id, document_id=dataset_document.id)
+                .all()
+            )
+            # segments saved after the checkpoint belong to a batch that is split again
+            stale_segments = [segment for segment in document_segments if segment.position > max_position]
+            if stale_segments:
+                index_processor.clean(
+                    dataset,
+                    [segment.index_node_id for segment in stale_segments],
+                    with_keywords=True,
+                    delete_child_chunks=True,
+                )
+                for segment in stale_segments:
+                    db.session.delete(segment)
+                db.session.commit()
+
+            completed_tokens = 0
+            pending_documents = []
+            for document_segment in document_segments:
+                if document_segment.position > max_position:
+                    continue
+                if document_segment.status == "completed":
+                    completed_tokens += document_segment.tokens or 0
+                else:
+                    pending_documents.append(self._segment_to_document(dataset_document, document_segment))
+            if pending_documents:
+                # drop vectors the interrupted batch may have written before it was marked completed
+                index_processor.clean(
+                    dataset, [document.metadata["doc_id"] for document in pending_documents], with_keywords=False
+                )
+
+            # extract
+            text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
+
+            # transform, save and load the rest batch by batch
+            self._run_streaming(
+                index_processor,
+                dataset,
+                dataset_document,
+                text_docs,
+                processing_rule.to_dict(),
+                split_text_docs=split_text_docs,
+                pending_documents=pending_documents,
+                completed_tokens=completed_tokens,
             )
         except DocumentIsPausedError:
             raise DocumentIsPausedError(f"Document paused, document id: {dataset_document.id}")
@@ -235,6 +340,35 @@ class IndexingRunner:
             dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
 
+    @staticmethod
+    def _segment_to_document(dataset_document: DatasetDocument, document_segment: DocumentSegment) -> Document:
+        document = Document(
+            page_content=document_segment.content,
+            metadata={
+                "doc_id": document_segment.index_node_id,
+                "doc_hash": document_segment.index_node_hash,
+                "document_id": document_segment.document_id,
+                "dataset_id": document_segment.dataset_id,
+            },
+        )
+        if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+            child_chunks = document_segment.get_child_chunks()
+            if child_chunks:
+                child_documents = []
+                for child_chunk in child_chunks:
+                    child_document = ChildDocument(
+                        page_content=child_chunk.content,
+                        metadata={
+                            "doc_id": child_chunk.index_node_id,
+                            "doc_hash": child_chunk.index_node_hash,
+                            "document_id": document_segment.document_id,
+                            "dataset_id": document_segment.dataset_id,
+                        },
+                    )
+                    child_documents.append(child_document)
+                document.children = child_documents
+        return document
+
     def indexing_estimate(
         self,
         tenant_id: str,
@@ -519,11 +653,37 @@ class IndexingRunner:
         dataset: Dataset,
         dataset_document: DatasetDocument,
         documents: list[Document],
+        completed_tokens: int = 0,
     ) -> None:
         """
         insert index and update document/segment status to completed
         """
+        indexing_start_at = time.perf_counter()
+        tokens = completed_tokens + self._index_documents(index_processor, dataset, dataset_document, documents)
+        indexing_end_at = time.perf_counter()
+
+        # update document status to completed
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="completed",
+            extra_update_params={
+                DatasetDocument.tokens: tokens,
+                DatasetDocument.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
+                DatasetDocument.error: None,
+            },
+        )
 
+    def _index_documents(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        documents: list[Document],
+    ) -> int:
+        """
+        insert index of the saved segments and update their status to completed, return the embedding tokens
+        """
         embedding_model_instance = None
         if dataset.indexing_technique == "high_quality":
             embedding_model_instance = self.model_manager.get_model_instance(
@@ -534,7 +694,6 @@ class IndexingRunner:
             )
 
         # chunk nodes by chunk size
-        indexing_start_at = time.perf_counter()
         tokens = 0
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX and dataset.indexing_technique == "economy":
             # create keyword index
@@ -576,6 +735,81 @@ class IndexingRunner:
                     tokens += future.result()
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX and dataset.indexing_technique == "economy":
             create_keyword_thread.join()
+        return tokens
+
+    @staticmethod
+    def _is_streaming_enabled(dataset_document: DatasetDocument, process_rule: dict) -> bool:
+        if dify_config.INDEXING_STREAMING_BATCH_SIZE <= 0:
+            return False
+        if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+            # a full-doc parent chunk is built from every text document, it cannot be split batch by batch
+            rules = process_rule.get("rules") or {}
+            return rules.get("parent_mode") != ParentMode.FULL_DOC
+        return True
+
+    def _run_streaming(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        text_docs: list[Document],
+        process_rule: dict,
+        split_text_docs: int = 0,
+        pending_documents: Optional[list[Document]] = None,
+        completed_tokens: int = 0,
+    ) -> None:
+        """
+        Transform, save and load the extracted text documents in batches of INDEXING_STREAMING_BATCH_SIZE.
+
+        A splitting thread transforms the batches and saves their segments while the current thread loads the
+        previous ones. At most INDEXING_STREAMING_MAX_PENDING_BATCHES transformed batches wait to be loaded, so
+        memory no longer grows with the document size and the first segments are searchable early.
+
+        After the segments of each batch are saved, the number of text documents split so far is recorded as
+        the split checkpoint, which `run_in_streaming_status` resumes from.
+        :param split_text_docs: number of leading text documents already split by a previous run
+        :param pending_documents: saved segments of a previous run that are not loaded yet
+        :param completed_tokens: tokens of the segments a previous run completed
+        """
+        if not split_text_docs:
+            self._clear_split_checkpoint(dataset_document.id)
+        pending_text_docs = deque(text_docs[split_text_docs:])
+        # the splitting thread pops from the deque, drop the other reference so transformed texts can be freed
+        text_docs.clear()
+        batches: queue.Queue[Any] = queue.Queue(maxsize=dify_config.INDEXING_STREAMING_MAX_PENDING_BATCHES)
+        stopped = threading.Event()
+        splitting_thread = threading.Thread(
+            target=self._split_batches,
+            args=(
+                current_app._get_current_object(),  # type: ignore
+                index_processor,
+                dataset.id,
+                dataset_document.id,
+                pending_text_docs,
+                split_text_docs,
+                process_rule,
+                batches,
+                stopped,
+            ),
+            daemon=True,
+        )
+        splitting_thread.start()
+
+        indexing_start_at = time.perf_counter()
+        tokens = completed_tokens
+        try:
+            if pending_documents:
+                tokens += self._index_documents(index_processor, dataset, dataset_document, pending_documents)
+            while True:
+                batch = batches.get()
+                if batch is _STREAM_END:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                tokens += self._index_documents(index_processor, dataset, dataset_document, batch)
+        finally:
+            stopped.set()
+            splitting_thread.join()
         indexing_end_at = time.perf_counter()
 
         # update document status to completed
@@ -590,6 +824,121 @@ class IndexingRunner:
             },
         )
 
+    def _split_batches(
+        self,
+        flask_app,
+        index_processor: BaseIndexProcessor,
+        dataset_id: str,
+        dataset_document_id: str,
+        text_docs: deque[Document],
+        split_text_docs: int,
+        process_rule: dict,
+        batches: queue.Queue,
+        stopped: threading.Event,
+    ) -> None:
+        with flask_app.app_context():
+            try:
+                dataset = db.session.query(Dataset).filter_by(id=dataset_id).first()
+                if not dataset:
+                    raise ValueError("no dataset found")
+                dataset_document = db.session.query(DatasetDocument).filter_by(id=dataset_document_id).first()
+                if not dataset_document:
+                    raise DocumentIsDeletedPausedError()
+
+                batch_size = dify_config.INDEXING_STREAMING_BATCH_SIZE
+                while text_docs:
+                    batch_text_docs = [text_docs.popleft() for _ in range(min(batch_size, len(text_docs)))]
+                    documents = self._transform(
+                        index_processor, dataset, batch_text_docs, dataset_document.doc_language, process_rule
+                    )
+                    split_text_docs += len(batch_text_docs)
+                    if not documents:
+                        continue
+                    self._save_segments(dataset, dataset_document, documents)
+                    self._save_split_checkpoint(dataset_document_id, split_text_docs)
+                    if not self._put_batch(batches, documents, stopped):
+                        return
+
+                # update document status to indexing
+                cur_time = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+                self._update_document_index_status(
+                    document_id=dataset_document_id,
+                    after_indexing_status="indexing",
+                    extra_update_params={
+                        DatasetDocument.cleaning_completed_at: cur_time,
+                        DatasetDocument.splitting_completed_at: cur_time,
+                    },
+                )
+                self._clear_split_checkpoint(dataset_document_id)
+                self._put_batch(batches, _STREAM_END, stopped)
+            except BaseException as e:
+                self._put_batch(batches, e, stopped)
+
+    @staticmethod
+    def get_split_checkpoint(document_id: str) -> Optional[tuple[int, int]]:
+        """
+        Get the split checkpoint of a streaming run that has not split the whole document yet.
+
+        :return: number of text documents split and the last segment position saved for them, or None
+        """
+        checkpoint = redis_client.get(f"document_{document_id}_split_checkpoint")
+        if not checkpoint:
+            return None
+        split_text_docs, max_position = json.loads(checkpoint)
+        return int(split_text_docs), int(max_position)
+
+    @staticmethod
+    def _save_split_checkpoint(document_id: str, split_text_docs: int) -> None:
+        max_position = (
+            db.session.query(func.max(DocumentSegment.position))
+            .where(DocumentSegment.document_id == document_id)
+            .scalar()
+        )
+        redis_client.setex(
+            f"document_{document_id}_split_checkpoint",
+            _SPLIT_CHECKPOINT_TTL,
+            json.dumps([split_text_docs, max_position or 0]),
+        )
+
+    @staticmethod
+    def _clear_split_checkpoint(document_id: str) -> None:
+        redis_client.delete(f"document_{document_id}_split_checkpoint")
+
+    @staticmethod
+    def _put_batch(batches: queue.Queue, item: Any, stopped: threading.Event) -> bool:
+        """
+        Wait for room in the queue, return False when the loading side stopped and will not take the item.
+        """
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _save_segments(dataset: Dataset, dataset_document: DatasetDocument, documents: list[Document]) -> None:
+        # save node to document segment
+        doc_store = DatasetDocumentStore(
+            dataset=dataset, user_id=dataset_document.created_by, document_id=dataset_document.id
+        )
+        doc_store.add_documents(docs=documents, save_child=dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX)
+
+        # update segment status of the batch to indexing
+        document_ids = [document.metadata["doc_id"] for document in documents]
+        db.session.query(DocumentSegment).where(
+            DocumentSegment.document_id == dataset_document.id,
+            DocumentSegment.dataset_id == dataset.id,
+            DocumentSegment.index_node_id.in_(document_ids),
+        ).update(
+            {
+                DocumentSegment.status: "indexing",
+                DocumentSegment.indexing_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+            }
+        )
+        db.session.commit()
+
     @staticmethod
     def _process_keyword_index(flask_app, dataset_id, document_id, documents):
         with flask_app.app_context():
@@ -619,32 +968,36 @@ class IndexingRunner:
         self, flask_app, index_processor, chunk_documents, dataset, dataset_document, embedding_model_instance
     ):
         with flask_app.app_context():
-            # check document is paused
-            self._check_document_paused_status(dataset_document.id)
-
             tokens = 0
-            if embedding_model_instance:
-                page_content_list = [document.page_content for document in chunk_documents]
-                tokens += sum(embedding_model_instance.get_text_embedding_num_tokens(page_content_list))
-
-            # load index
-            index_processor.load(dataset, chunk_documents, with_keywords=False)
-
-            document_ids = [document.metadata["doc_id"] for document in chunk_documents]
-            db.session.query(DocumentSegment).where(
-                DocumentSegment.document_id == dataset_document.id,
-                DocumentSegment.dataset_id == dataset.id,
-                DocumentSegment.index_node_id.in_(document_ids),
-                DocumentSegment.status == "indexing",
-            ).update(
-                {
-                    DocumentSegment.status: "completed",
-                    DocumentSegment.enabled: True,
-                    DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-                }
-            )
+            batch_size = dify_config.INDEXING_CHECKPOINT_BATCH_SIZE
+            for i in range(0, len(chunk_documents), batch_size):
+                batch_documents = chunk_documents[i : i + batch_size]
+                # check document is paused
+                self._check_document_paused_status(dataset_document.id)
 
-            db.session.commit()
+                if embedding_model_instance:
+                    page_content_list = [document.page_content for document in batch_documents]
+                    tokens += sum(embedding_model_instance.get_text_embedding_num_tokens(page_content_list))
+
+                # load index
+                index_processor.load(dataset, batch_documents, with_keywords=False)
+
+                # commit the batch as a checkpoint, a resumed run only loads segments that are not completed
+                document_ids = [document.metadata["doc_id"] for document in batch_documents]
+                db.session.query(DocumentSegment).where(
+                    DocumentSegment.document_id == dataset_document.id,
+                    DocumentSegment.dataset_id == dataset.id,
+                    DocumentSegment.index_node_id.in_(document_ids),
+                    DocumentSegment.status == "indexing",
+                ).update(
+                    {
+                        DocumentSegment.status: "completed",
+                        DocumentSegment.enabled: True,
+                        DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+                    }
+                )
+
+                db.session.commit()
 
             return tokens
 
@@ -749,6 +1102,13 @@ class IndexingRunner:
         pass
 
 
+# marks the last batch of a streaming run
+_STREAM_END = object()
+
+# seconds a failed streaming run can be resumed from its split checkpoint
+_SPLIT_CHECKPOINT_TTL = 7 * 24 * 60 * 60
+
+
 class DocumentIsPausedError(Exception):
     pass
 
@@ -1,10 +1,12 @@
+import threading
 from collections.abc import Sequence
 from typing import Optional
 
+from cachetools import LRUCache
 from sqlalchemy import select
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -23,6 +25,11 @@ from models.workflow import Workflow, WorkflowRun
 
 
 class TokenBufferMemory:
+    # token counts of history prompt messages, keyed by (provider, model, message id, role);
+    # answered messages never change, so counts are reused across requests of a conversation
+    _message_tokens_cache: LRUCache = LRUCache(maxsize=10000)
+    _message_tokens_lock = threading.Lock()
+
     def __init__(
         self,
         conversation: Conversation,
@@ -66,24 +73,13 @@ class TokenBufferMemory:
         messages = list(reversed(thread_messages))
 
         prompt_messages: list[PromptMessage] = []
+        message_ids: list[str] = []
+        message_files = self._get_message_files(messages)
+        file_extra_configs = self._get_file_extra_configs([m for m in messages if m.id in message_files])
         for message in messages:
-            files = db.session.query(MessageFile).where(MessageFile.message_id == message.id).all()
+            files = message_files.get(message.id)
             if files:
-                file_extra_config = None
-                if self.conversation.mode in {AppMode.AGENT_CHAT, AppMode.COMPLETION, AppMode.CHAT}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                elif self.conversation.mode in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    workflow_run = db.session.scalar(
-                        select(WorkflowRun).where(WorkflowRun.id == message.workflow_run_id)
-                    )
-                    if not workflow_run:
-                        raise ValueError(f"Workflow run not found: {message.workflow_run_id}")
-                    workflow = db.session.scalar(select(Workflow).where(Workflow.id == workflow_run.workflow_id))
-                    if not workflow:
-                        raise ValueError(f"Workflow not found: {workflow_run.workflow_id}")
-                    file_extra_config = FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
-                else:
-                    raise AssertionError(f"Invalid app mode: {self.conversation.mode}")
+                file_extra_config = file_extra_configs.get(message.id)
 
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
@@ -113,21 +109,113 @@ class TokenBufferMemory:
                 prompt_messages.append(UserPromptMessage(content=message.query))
 
             prompt_messages.append(AssistantPromptMessage(content=message.answer))
+            message_ids.extend([message.id, message.id])
 
         if not prompt_messages:
             return []
 
         # prune the chat message if it exceeds the max token limit
         curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
-
         if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+            prompt_messages = self._prune_prompt_messages(
+                prompt_messages, message_ids, curr_message_tokens, max_token_limit
+            )
+
+        return prompt_messages
+
+    @staticmethod
+    def _get_message_files(messages: Sequence[Message]) -> dict[str, list[MessageFile]]:
+        """Load the files of all history messages in one query, grouped by message id."""
+        if not messages:
+            return {}
+        message_files: dict[str, list[MessageFile]] = {}
+        stmt = select(MessageFile).where(MessageFile.message_id.in_([message.id for message in messages]))
+        for message_file in db.session.scalars(stmt):
+            message_files.setdefault(message_file.message_id, []).append(message_file)
+        return message_files
+
+    def _get_file_extra_configs(self, messages: Sequence[Message]) -> dict[str, Optional[FileUploadConfig]]:
+        """
+        Resolve the file upload config of messages with files.
+        Workflow apps read it from the workflow that answered each message, so every distinct workflow
+        run and workflow is loaded and converted once.
+        """
+        if not messages:
+            return {}
+        if self.conversation.mode in {AppMode.AGENT_CHAT, AppMode.COMPLETION, AppMode.CHAT}:
+            file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+            return {message.id: file_extra_config for message in messages}
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            raise AssertionError(f"Invalid app mode: {self.conversation.mode}")
+
+        workflow_run_ids = {message.workflow_run_id for message in messages if message.workflow_run_id}
+        workflow_ids_by_run: dict[str, str] = {}
+        if workflow_run_ids:
+            stmt = select(WorkflowRun.id, WorkflowRun.workflow_id).where(WorkflowRun.id.in_(workflow_run_ids))
+            workflow_ids_by_run = dict(db.session.execute(stmt).tuples().all())
+        workflows: dict[str, Workflow] = {}
+        if workflow_ids_by_run:
+            workflow_stmt = select(Workflow).where(Workflow.id.in_(set(workflow_ids_by_run.values())))
+            workflows = {workflow.id: workflow for workflow in db.session.scalars(workflow_stmt)}
+
+        configs_by_workflow: dict[str, Optional[FileUploadConfig]] = {}
+        file_extra_configs: dict[str, Optional[FileUploadConfig]] = {}
+        for message in messages:
+            workflow_id = workflow_ids_by_run.get(message.workflow_run_id or "")
+            if not workflow_id:
+                raise ValueError(f"Workflow run not found: {message.workflow_run_id}")
+            if workflow_id not in configs_by_workflow:
+                workflow = workflows.get(workflow_id)
+                if not workflow:
+                    raise ValueError(f"Workflow not found: {workflow_id}")
+                configs_by_workflow[workflow_id] = FileUploadConfigManager.convert(
+                    workflow.features_dict, is_vision=False
+                )
+            file_extra_configs[message.id] = configs_by_workflow[workflow_id]
+        return file_extra_configs
+
+    def _prune_prompt_messages(
+        self,
+        prompt_messages: list[PromptMessage],
+        message_ids: list[str],
+        curr_message_tokens: int,
+        max_token_limit: int,
+    ) -> list[PromptMessage]:
+        """
+        Drop the oldest prompt messages until the rest fits into max_token_limit.
+
+        Messages are counted one at a time (and cached) from the oldest, only until the dropped ones cover
+        the excess, instead of recounting the remaining history after every drop.
+        :param prompt_messages: history prompt messages, oldest first
+        :param message_ids: id of the conversation message every prompt message comes from
+        :param curr_message_tokens: tokens of all prompt messages
+        :param max_token_limit: max token limit
+        :return: the remaining prompt messages
+        """
+        start = 0
+        while curr_message_tokens > max_token_limit and start < len(prompt_messages) - 1:
+            curr_message_tokens -= self._get_message_tokens(prompt_messages[start], message_ids[start])
+            start += 1
+        prompt_messages = prompt_messages[start:]
+
+        # per message counts may miss tokens a model adds around the whole conversation, recount to be sure
+        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
+            prompt_messages.pop(0)
+            curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
 
         return prompt_messages
 
+    def _get_message_tokens(self, prompt_message: PromptMessage, message_id: str) -> int:
+        key = (self.model_instance.provider, self.model_instance.model, message_id, prompt_message.role.value)
+        with self._message_tokens_lock:
+            tokens = self._message_tokens_cache.get(key)
+        if tokens is None:
+            tokens = self.model_instance.get_llm_num_tokens([prompt_message])
+            with self._message_tokens_lock:
+                self._message_tokens_cache[key] = tokens
+        return int(tokens)
+
     def get_history_prompt_text(
         self,
         human_prefix: str = "Human",
@@ -6,6 +6,7 @@ from typing import Optional
 from pydantic import BaseModel, ConfigDict, Field
 
 import contexts
+from core.helper.plugin_declaration_cache import PluginDeclarationCache, PluginDeclarationCacheType
 from core.model_runtime.entities.common_entities import I18nObject
 from core.model_runtime.entities.defaults import PARAMETER_RULE_TEMPLATE
 from core.model_runtime.entities.model_entities import (
@@ -156,15 +157,22 @@ class AIModel(BaseModel):
             if cache_key in contexts.plugin_model_schemas.get():
                 return contexts.plugin_model_schemas.get()[cache_key]
 
-            schema = plugin_model_manager.get_model_schema(
-                tenant_id=self.tenant_id,
-                user_id="unknown",
-                plugin_id=self.plugin_id,
-                provider=self.provider_name,
-                model_type=self.model_type.value,
-                model=model,
-                credentials=credentials or {},
+            declaration_cache = PluginDeclarationCache(
+                self.tenant_id, PluginDeclarationCacheType.MODEL_SCHEMA, cache_key, AIModelEntity
             )
+            schema = declaration_cache.get()
+            if schema is None:
+                schema = plugin_model_manager.get_model_schema(
+                    tenant_id=self.tenant_id,
+                    user_id="unknown",
+                    plugin_id=self.plugin_id,
+                    provider=self.provider_name,
+                    model_type=self.model_type.value,
+                    model=model,
+                    credentials=credentials or {},
+                )
+                if schema:
+                    declaration_cache.set(schema)
 
             if schema:
                 contexts.plugin_model_schemas.get()[cache_key] = schema
@@ -8,6 +8,7 @@ from typing import Optional
 from pydantic import BaseModel
 
 import contexts
+from core.helper.plugin_declaration_cache import PluginDeclarationCache, PluginDeclarationCacheType
 from core.helper.position_helper import get_provider_position_map, sort_to_dict_by_position_map
 from core.model_runtime.entities.model_entities import AIModelEntity, ModelType
 from core.model_runtime.entities.provider_entities import ProviderConfig, ProviderEntity, SimpleProviderEntity
@@ -88,16 +89,23 @@ class ModelProviderFactory:
             if plugin_model_providers is not None:
                 return plugin_model_providers
 
-            plugin_model_providers = []
-            contexts.plugin_model_providers.set(plugin_model_providers)
+            declaration_cache = PluginDeclarationCache(
+                self.tenant_id, PluginDeclarationCacheType.MODEL_PROVIDERS, "", list[PluginModelProviderEntity]
+            )
+            plugin_model_providers = declaration_cache.get()
+            if plugin_model_providers is None:
+                plugin_model_providers = []
 
-            # Fetch plugin model providers
-            plugin_providers = self.plugin_model_manager.fetch_model_providers(self.tenant_id)
+                # Fetch plugin model providers
+                plugin_providers = self.plugin_model_manager.fetch_model_providers(self.tenant_id)
 
-            for provider in plugin_providers:
-                provider.declaration.provider = provider.plugin_id + "/" + provider.declaration.provider
-                plugin_model_providers.append(provider)
+                for provider in plugin_providers:
+                    provider.declaration.provider = provider.plugin_id + "/" + provider.declaration.provider
+                    plugin_model_providers.append(provider)
 
+                declaration_cache.set(plugin_model_providers)
+
+            contexts.plugin_model_providers.set(plugin_model_providers)
             return plugin_model_providers
 
     def get_provider_schema(self, provider: str) -> ProviderEntity:
@@ -222,15 +230,22 @@ class ModelProviderFactory:
             if cache_key in contexts.plugin_model_schemas.get():
                 return contexts.plugin_model_schemas.get()[cache_key]
 
-            schema = self.plugin_model_manager.get_model_schema(
-                tenant_id=self.tenant_id,
-                user_id="unknown",
-                plugin_id=plugin_id,
-                provider=provider_name,
-                model_type=model_type.value,
-                model=model,
-                credentials=credentials or {},
+            declaration_cache = PluginDeclarationCache(
+                self.tenant_id, PluginDeclarationCacheType.MODEL_SCHEMA, cache_key, AIModelEntity
             )
+            schema = declaration_cache.get()
+            if schema is None:
+                schema = self.plugin_model_manager.get_model_schema(
+                    tenant_id=self.tenant_id,
+                    user_id="unknown",
+                    plugin_id=plugin_id,
+                    provider=provider_name,
+                    model_type=model_type.value,
+                    model=model,
+                    credentials=credentials or {},
+                )
+                if schema:
+                    declaration_cache.set(schema)
 
             if schema:
                 contexts.plugin_model_schemas.get()[cache_key] = schema
@@ -7,7 +7,7 @@ from core.plugin.entities.plugin_daemon import (
     PluginAgentProviderEntity,
 )
 from core.plugin.entities.request import PluginInvokeContext
-from core.plugin.impl.base import BasePluginClient
+from core.plugin.impl.base import BasePluginClient, long_running_timeout
 
 
 class PluginAgentClient(BasePluginClient):
@@ -112,5 +112,6 @@ class PluginAgentClient(BasePluginClient):
                 "X-Plugin-ID": agent_provider_id.plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
         return response
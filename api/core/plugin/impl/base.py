@@ -1,12 +1,17 @@
 import inspect
 import json
 import logging
-from collections.abc import Callable, Generator
-from typing import TypeVar
+import os
+import threading
+from collections.abc import Callable, Generator, Iterable
+from typing import Optional, TypeVar, Union
 
 import requests
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from urllib3 import HTTPConnectionPool
 from yarl import URL
 
 from configs import dify_config
@@ -37,6 +42,53 @@ T = TypeVar("T", bound=(BaseModel | dict | list | bool | str))
 
 logger = logging.getLogger(__name__)
 
+# seconds, or a (connect, read) tuple as accepted by requests, a read timeout of None waits indefinitely
+Timeout = Union[float, tuple[float, float], tuple[float, None]]
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    Get the session shared by all plugin daemon clients of this process.
+
+    The session keeps up to PLUGIN_DAEMON_POOL_MAXSIZE connections to the daemon alive between requests. A forked
+    process creates its own, the connections of the parent must not be shared.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=dify_config.PLUGIN_DAEMON_POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def long_running_timeout() -> Timeout:
+    """
+    Timeout of endpoints that take as long as the plugin code or package they run, like installing or uploading
+    packages and invoking models, tools and agent strategies. Only connecting is bounded, the response is awaited
+    as long as it takes.
+    """
+    return dify_config.PLUGIN_DAEMON_CONNECT_TIMEOUT, None
+
+
+def _connection_pools() -> list[HTTPConnectionPool]:
+    if _session is None or _session_pid != os.getpid():
+        return []
+    pools: list[HTTPConnectionPool] = []
+    for adapter in {id(adapter): adapter for adapter in _session.adapters.values()}.values():
+        if isinstance(adapter, HTTPAdapter):
+            # the pool container of urllib3 cannot be iterated directly
+            pools.extend(adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys())  # noqa: SIM118
+    return pools
+
 
 class BasePluginClient:
     def _request(
@@ -48,9 +100,13 @@ class BasePluginClient:
         params: dict | None = None,
         files: dict | None = None,
         stream: bool = False,
+        timeout: Timeout | None = None,
     ) -> requests.Response:
         """
         Make a request to the plugin daemon inner API.
+
+        The request uses a pooled keep-alive connection, `timeout` overrides the default
+        (PLUGIN_DAEMON_CONNECT_TIMEOUT, PLUGIN_DAEMON_READ_TIMEOUT) for endpoints that need a different one.
         """
         url = plugin_daemon_inner_api_baseurl / path
         headers = headers or {}
@@ -60,13 +116,26 @@ class BasePluginClient:
         if headers.get("Content-Type") == "application/json" and isinstance(data, dict):
             data = json.dumps(data)
 
+        if timeout is None:
+            timeout = (dify_config.PLUGIN_DAEMON_CONNECT_TIMEOUT, dify_config.PLUGIN_DAEMON_READ_TIMEOUT)
+
         try:
-            response = requests.request(
-                method=method, url=str(url), headers=headers, data=data, params=params, stream=stream, files=files
+            response = _get_session().request(
+                method=method,
+                url=str(url),
+                headers=headers,
+                data=data,
+                params=params,
+                stream=stream,
+                files=files,
+                timeout=timeout,
             )
         except requests.exceptions.ConnectionError:
             logger.exception("Request to Plugin Daemon Service failed")
             raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service failed")
+        except requests.exceptions.Timeout:
+            logger.exception("Request to Plugin Daemon Service timed out")
+            raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service timed out")
 
         return response
 
@@ -78,17 +147,22 @@ class BasePluginClient:
         headers: dict | None = None,
         data: bytes | dict | None = None,
         files: dict | None = None,
+        timeout: Timeout | None = None,
     ) -> Generator[bytes, None, None]:
         """
         Make a stream request to the plugin daemon inner API
         """
-        response = self._request(method, path, headers, data, params, files, stream=True)
-        for line in response.iter_lines(chunk_size=1024 * 8):
-            line = line.decode("utf-8").strip()
-            if line.startswith("data:"):
-                line = line[5:].strip()
-            if line:
-                yield line
+        response = self._request(method, path, headers, data, params, files, stream=True, timeout=timeout)
+        try:
+            for line in response.iter_lines(chunk_size=1024 * 8):
+                line = line.decode("utf-8").strip()
+                if line.startswith("data:"):
+                    line = line[5:].strip()
+                if line:
+                    yield line
+        finally:
+            # give the connection back to the pool even if the consumer stops early
+            response.close()
 
     def _stream_request_with_model(
         self,
@@ -99,11 +173,12 @@ class BasePluginClient:
         data: bytes | dict | None = None,
         params: dict | None = None,
         files: dict | None = None,
+        timeout: Timeout | None = None,
     ) -> Generator[T, None, None]:
         """
         Make a stream request to the plugin daemon inner API and yield the response as a model.
         """
-        for line in self._stream_request(method, path, params, headers, data, files):
+        for line in self._stream_request(method, path, params, headers, data, files, timeout):
             yield type(**json.loads(line))  # type: ignore
 
     def _request_with_model(
@@ -115,11 +190,12 @@ class BasePluginClient:
         data: bytes | None = None,
         params: dict | None = None,
         files: dict | None = None,
+        timeout: Timeout | None = None,
     ) -> T:
         """
         Make a request to the plugin daemon inner API and return the response as a model.
         """
-        response = self._request(method, path, headers, data, params, files)
+        response = self._request(method, path, headers, data, params, files, timeout=timeout)
         return type(**response.json())  # type: ignore
 
     def _request_with_plugin_daemon_response(
@@ -132,12 +208,13 @@ class BasePluginClient:
         params: dict | None = None,
         files: dict | None = None,
         transformer: Callable[[dict], dict] | None = None,
+        timeout: Timeout | None = None,
     ) -> T:
         """
         Make a request to the plugin daemon inner API and return the response as a model.
         """
         try:
-            response = self._request(method, path, headers, data, params, files)
+            response = self._request(method, path, headers, data, params, files, timeout=timeout)
             response.raise_for_status()
         except HTTPError as e:
             msg = f"Failed to request plugin daemon, status: {e.response.status_code}, url: {path}"
@@ -183,11 +260,12 @@ class BasePluginClient:
         data: bytes | dict | None = None,
         params: dict | None = None,
         files: dict | None = None,
+        timeout: Timeout | None = None,
     ) -> Generator[T, None, None]:
         """
         Make a stream request to the plugin daemon inner API and yield the response as a model.
         """
-        for line in self._stream_request(method, path, params, headers, data, files):
+        for line in self._stream_request(method, path, params, headers, data, files, timeout):
             try:
                 rep = PluginDaemonBasicResponse[type].model_validate_json(line)  # type: ignore
             except (ValueError, TypeError):
@@ -259,3 +337,43 @@ class BasePluginClient:
                 raise PluginPermissionDeniedError(description=message)
             case _:
                 raise Exception(f"got unknown error from plugin daemon: {error_type}, message: {message}")
+
+
+_meter = get_meter("plugin_daemon_client")
+
+
+def _observe_idle_connections(options: CallbackOptions) -> Iterable[Observation]:
+    idle_connections = 0
+    for pool in _connection_pools():
+        # the queue of a pool is filled with None for connections it has not opened yet, a closed pool has none
+        if pool.pool is not None:
+            idle_connections += sum(conn is not None for conn in list(pool.pool.queue))
+    yield Observation(idle_connections)
+
+
+def _observe_opened_connections(options: CallbackOptions) -> Iterable[Observation]:
+    yield Observation(sum(pool.num_connections for pool in _connection_pools()))
+
+
+def _observe_requests(options: CallbackOptions) -> Iterable[Observation]:
+    yield Observation(sum(pool.num_requests for pool in _connection_pools()))
+
+
+_meter.create_observable_gauge(
+    "plugin_daemon.connections.idle",
+    callbacks=[_observe_idle_connections],
+    description="Keep-alive connections to the plugin daemon waiting in the pool",
+    unit="{connection}",
+)
+_meter.create_observable_counter(
+    "plugin_daemon.connections.opened",
+    callbacks=[_observe_opened_connections],
+    description="Connections opened to the plugin daemon",
+    unit="{connection}",
+)
+_meter.create_observable_counter(
+    "plugin_daemon.requests",
+    callbacks=[_observe_requests],
+    description="Requests sent to the plugin daemon",
+    unit="{request}",
+)
@@ -18,7 +18,7 @@ from core.plugin.entities.plugin_daemon import (
     PluginTextEmbeddingNumTokensResponse,
     PluginVoicesResponse,
 )
-from core.plugin.impl.base import BasePluginClient
+from core.plugin.impl.base import BasePluginClient, long_running_timeout
 
 
 class PluginModelClient(BasePluginClient):
@@ -183,6 +183,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         try:
@@ -268,6 +269,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         for resp in response:
@@ -354,6 +356,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         for resp in response:
@@ -397,6 +400,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         try:
@@ -483,6 +487,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         for resp in response:
@@ -523,6 +528,7 @@ class PluginModelClient(BasePluginClient):
                 "X-Plugin-ID": plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         for resp in response:
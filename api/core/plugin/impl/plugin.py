@@ -1,5 +1,6 @@
 from collections.abc import Sequence
 
+from core.helper.plugin_declaration_cache import PluginDeclarationCache
 from core.plugin.entities.bundle import PluginBundleDependency
 from core.plugin.entities.plugin import (
     GenericProviderID,
@@ -13,9 +14,10 @@ from core.plugin.entities.plugin_daemon import (
     PluginDecodeResponse,
     PluginInstallTask,
     PluginInstallTaskStartResponse,
+    PluginInstallTaskStatus,
     PluginListResponse,
 )
-from core.plugin.impl.base import BasePluginClient
+from core.plugin.impl.base import BasePluginClient, long_running_timeout
 
 
 class PluginInstaller(BasePluginClient):
@@ -71,6 +73,7 @@ class PluginInstaller(BasePluginClient):
             PluginDecodeResponse,
             files=body,
             data=data,
+            timeout=long_running_timeout(),
         )
 
     def upload_bundle(
@@ -88,6 +91,7 @@ class PluginInstaller(BasePluginClient):
             list[PluginBundleDependency],
             files={"dify_bundle": ("dify_bundle", bundle, "application/octet-stream")},
             data={"verify_signature": "true" if verify_signature else "false"},
+            timeout=long_running_timeout(),
         )
 
     def install_from_identifiers(
@@ -101,7 +105,7 @@ class PluginInstaller(BasePluginClient):
         Install a plugin from an identifier.
         """
         # exception will be raised if the request failed
-        return self._request_with_plugin_daemon_response(
+        response = self._request_with_plugin_daemon_response(
             "POST",
             f"plugin/{tenant_id}/management/install/identifiers",
             PluginInstallTaskStartResponse,
@@ -111,28 +115,40 @@ class PluginInstaller(BasePluginClient):
                 "metas": metas,
             },
             headers={"Content-Type": "application/json"},
+            timeout=long_running_timeout(),
         )
+        PluginDeclarationCache.invalidate(tenant_id)
+        return response
 
     def fetch_plugin_installation_tasks(self, tenant_id: str, page: int, page_size: int) -> Sequence[PluginInstallTask]:
         """
         Fetch plugin installation tasks.
         """
-        return self._request_with_plugin_daemon_response(
+        tasks = self._request_with_plugin_daemon_response(
             "GET",
             f"plugin/{tenant_id}/management/install/tasks",
             list[PluginInstallTask],
             params={"page": page, "page_size": page_size},
         )
+        for task in tasks:
+            self._invalidate_declarations_if_finished(tenant_id, task)
+        return tasks
 
     def fetch_plugin_installation_task(self, tenant_id: str, task_id: str) -> PluginInstallTask:
         """
         Fetch a plugin installation task.
         """
-        return self._request_with_plugin_daemon_response(
+        task = self._request_with_plugin_daemon_response(
             "GET",
             f"plugin/{tenant_id}/management/install/tasks/{task_id}",
             PluginInstallTask,
         )
+        self._invalidate_declarations_if_finished(tenant_id, task)
+        return task
+
+    def _invalidate_declarations_if_finished(self, tenant_id: str, task: PluginInstallTask) -> None:
+        if task.status in (PluginInstallTaskStatus.Success, PluginInstallTaskStatus.Failed):
+            PluginDeclarationCache.invalidate_for_finished_task(tenant_id, task.id)
 
     def delete_plugin_installation_task(self, tenant_id: str, task_id: str) -> bool:
         """
@@ -220,7 +236,7 @@ class PluginInstaller(BasePluginClient):
         """
         Uninstall a plugin.
         """
-        return self._request_with_plugin_daemon_response(
+        response = self._request_with_plugin_daemon_response(
             "POST",
             f"plugin/{tenant_id}/management/uninstall",
             bool,
@@ -229,6 +245,8 @@ class PluginInstaller(BasePluginClient):
             },
             headers={"Content-Type": "application/json"},
         )
+        PluginDeclarationCache.invalidate(tenant_id)
+        return response
 
     def upgrade_plugin(
         self,
@@ -241,7 +259,7 @@ class PluginInstaller(BasePluginClient):
         """
         Upgrade a plugin.
         """
-        return self._request_with_plugin_daemon_response(
+        response = self._request_with_plugin_daemon_response(
             "POST",
             f"plugin/{tenant_id}/management/install/upgrade",
             PluginInstallTaskStartResponse,
@@ -252,7 +270,10 @@ class PluginInstaller(BasePluginClient):
                 "meta": meta,
             },
             headers={"Content-Type": "application/json"},
+            timeout=long_running_timeout(),
         )
+        PluginDeclarationCache.invalidate(tenant_id)
+        return response
 
     def check_tools_existence(self, tenant_id: str, provider_ids: Sequence[GenericProviderID]) -> Sequence[bool]:
         """
@@ -5,7 +5,7 @@ from pydantic import BaseModel
 
 from core.plugin.entities.plugin import GenericProviderID, ToolProviderID
 from core.plugin.entities.plugin_daemon import PluginBasicBooleanResponse, PluginToolProviderEntity
-from core.plugin.impl.base import BasePluginClient
+from core.plugin.impl.base import BasePluginClient, long_running_timeout
 from core.tools.entities.tool_entities import CredentialType, ToolInvokeMessage, ToolParameter
 
 
@@ -111,6 +111,7 @@ class PluginToolManager(BasePluginClient):
                 "X-Plugin-ID": tool_provider_id.plugin_id,
                 "Content-Type": "application/json",
             },
+            timeout=long_running_timeout(),
         )
 
         class FileChunk:
@@ -0,0 +1,159 @@
+from typing import Any
+
+from sqlalchemy import delete, desc, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from core.rag.datasource.keyword.jieba.jieba import KeywordTableConfig
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.keyword_base import BaseKeyword
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from extensions.ext_storage import storage
+from models.dataset import Dataset, DatasetKeywordPosting, DatasetKeywordTable, DocumentSegment
+
+# Maximum number of posting rows written per INSERT statement.
+POSTING_INSERT_BATCH_SIZE = 1000
+
+
+class JiebaInvertedIndex(BaseKeyword):
+    """
+    Jieba keyword store backed by the `dataset_keyword_postings` table.
+
+    Unlike `Jieba`, which keeps the whole keyword table of a dataset in one JSON document, every
+    (keyword, segment) pair is a row, so adding or deleting segments only touches their own postings
+    and a search only reads the postings of the query keywords.
+    """
+
+    def __init__(self, dataset: Dataset):
+        super().__init__(dataset)
+        self._config = KeywordTableConfig()
+
+    def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
+        self.add_texts(texts, **kwargs)
+        return self
+
+    def add_texts(self, texts: list[Document], **kwargs):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords_list = kwargs.get("keywords_list")
+        node_keywords: dict[str, list[str]] = {}
+        for i, text in enumerate(texts):
+            if text.metadata is None:
+                continue
+            keywords = keywords_list[i] if keywords_list else None
+            if not keywords:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            node_keywords[text.metadata["doc_id"]] = list(keywords)
+
+        self._update_segment_keywords(node_keywords)
+        self._add_postings(node_keywords)
+        db.session.commit()
+
+    def text_exists(self, id: str) -> bool:
+        stmt = select(
+            exists().where(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.index_node_id == id,
+            )
+        )
+        return bool(db.session.scalar(stmt))
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        if not ids:
+            return
+        db.session.execute(
+            delete(DatasetKeywordPosting).where(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.index_node_id.in_(ids),
+            )
+        )
+        db.session.commit()
+
+    def delete(self) -> None:
+        db.session.execute(delete(DatasetKeywordPosting).where(DatasetKeywordPosting.dataset_id == self.dataset.id))
+        db.session.commit()
+
+    def search(self, query: str, **kwargs: Any) -> list[Document]:
+        k = kwargs.get("top_k", 4)
+        document_ids_filter = kwargs.get("document_ids_filter")
+
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords = {keyword[:255] for keyword in keyword_table_handler.extract_keywords(query)}
+        if not keywords:
+            return []
+
+        # rank segments by the number of query keywords they contain
+        hits = func.count().label("hits")
+        stmt = (
+            select(DatasetKeywordPosting.index_node_id, hits)
+            .where(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.keyword.in_(keywords),
+            )
+            .group_by(DatasetKeywordPosting.index_node_id)
+            .order_by(desc(hits), DatasetKeywordPosting.index_node_id)
+            .limit(k)
+        )
+        if document_ids_filter:
+            stmt = stmt.join(
+                DocumentSegment,
+                (DocumentSegment.dataset_id == DatasetKeywordPosting.dataset_id)
+                & (DocumentSegment.index_node_id == DatasetKeywordPosting.index_node_id),
+            ).where(DocumentSegment.document_id.in_(document_ids_filter))
+        sorted_chunk_indices = list(db.session.scalars(stmt))
+        return self._get_documents_by_index_node_ids(sorted_chunk_indices, document_ids_filter)
+
+    def _add_postings(self, node_keywords: dict[str, list[str]]) -> None:
+        rows = [
+            {"dataset_id": self.dataset.id, "keyword": keyword[:255], "index_node_id": node_id}
+            for node_id, keywords in node_keywords.items()
+            for keyword in set(keywords)
+            if keyword
+        ]
+        for i in range(0, len(rows), POSTING_INSERT_BATCH_SIZE):
+            stmt = insert(DatasetKeywordPosting).values(rows[i : i + POSTING_INSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_nothing(index_elements=["dataset_id", "keyword", "index_node_id"])
+            db.session.execute(stmt)
+
+    def _update_segment_keywords(self, node_keywords: dict[str, list[str]]) -> None:
+        if not node_keywords:
+            return
+        segments = db.session.scalars(
+            select(DocumentSegment).where(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(list(node_keywords.keys())),
+            )
+        )
+        for segment in segments:
+            segment.keywords = node_keywords[segment.index_node_id]
+
+    def migrate_legacy_keyword_table(self, delete_legacy: bool = False) -> None:
+        """
+        Copy the keyword table written by the `jieba` store into postings, see the `migrate-keyword-postings`
+        command. Postings already copied are skipped, so it can run again for keywords the `jieba` store added since.
+
+        :param delete_legacy: delete the keyword table afterwards, the `jieba` store then no longer finds the
+            keywords of the dataset
+        """
+        lock_name = f"keyword_indexing_lock_{self.dataset.id}"
+        with redis_client.lock(lock_name, timeout=600):
+            dataset_keyword_table = db.session.scalar(
+                select(DatasetKeywordTable).where(DatasetKeywordTable.dataset_id == self.dataset.id)
+            )
+            if not dataset_keyword_table:
+                return
+            keyword_table_dict = dataset_keyword_table.keyword_table_dict
+            keyword_table = dict(keyword_table_dict["__data__"]["table"]) if keyword_table_dict else {}
+            node_keywords: dict[str, list[str]] = {}
+            for keyword, node_ids in keyword_table.items():
+                for node_id in node_ids:
+                    node_keywords.setdefault(node_id, []).append(keyword)
+            self._add_postings(node_keywords)
+
+            if delete_legacy:
+                db.session.delete(dataset_keyword_table)
+            db.session.commit()
+            if delete_legacy and dataset_keyword_table.data_source_type != "database":
+                storage.delete("keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt")
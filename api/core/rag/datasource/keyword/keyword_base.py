@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
+
+from sqlalchemy import select
 
 from core.rag.models.document import Document
-from models.dataset import Dataset
+from extensions.ext_database import db
+from models.dataset import Dataset, DocumentSegment
 
 
 class BaseKeyword(ABC):
@@ -48,3 +51,33 @@ class BaseKeyword(ABC):
 
     def _get_uuids(self, texts: list[Document]) -> list[str]:
         return [text.metadata["doc_id"] for text in texts if text.metadata]
+
+    def _get_documents_by_index_node_ids(
+        self, index_node_ids: list[str], document_ids_filter: Optional[list[str]] = None
+    ) -> list[Document]:
+        """Load the segments of ranked index node ids with a single query, keeping the ranking order."""
+        if not index_node_ids:
+            return []
+        segment_query = select(DocumentSegment).where(
+            DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(index_node_ids)
+        )
+        if document_ids_filter:
+            segment_query = segment_query.where(DocumentSegment.document_id.in_(document_ids_filter))
+        segments = {segment.index_node_id: segment for segment in db.session.scalars(segment_query)}
+
+        documents = []
+        for index_node_id in index_node_ids:
+            segment = segments.get(index_node_id)
+            if segment:
+                documents.append(
+                    Document(
+                        page_content=segment.content,
+                        metadata={
+                            "doc_id": index_node_id,
+                            "doc_hash": segment.index_node_hash,
+                            "document_id": segment.document_id,
+                            "dataset_id": segment.dataset_id,
+                        },
+                    )
+                )
+        return documents
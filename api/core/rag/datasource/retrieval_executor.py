@@ -0,0 +1,167 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+_meter = get_meter("retrieval_executor")
+_queue_wait_histogram = _meter.create_histogram(
+    "retrieval.executor.queue_wait",
+    description="Time retrieval tasks spend queued before a worker picks them up",
+    unit="s",
+)
+
+
+@dataclass
+class _RetrievalTask:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class RetrievalExecutor:
+    """
+    Bounded, long-lived thread pool shared by all retrievals of the process.
+
+    Tasks are queued per tenant and workers take them round-robin across tenants, so one tenant
+    fanning out over many datasets cannot starve the others. Workers are started on demand up to
+    `max_workers` and then reused, which keeps the thread count of the process predictable.
+    """
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max(max_workers, 1)
+        self._queues: OrderedDict[str, deque[_RetrievalTask]] = OrderedDict()
+        self._condition = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        self._idle_workers = 0
+        # queued tasks not yet taken by a worker, an idle worker is only counted as free for the ones beyond it
+        self._queued_tasks = 0
+        self._active_tasks = 0
+
+    def submit(self, tenant_id: str, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._queues.setdefault(tenant_id, deque()).append(_RetrievalTask(fn, args, kwargs, future))
+            self._queued_tasks += 1
+            # a notified idle worker only takes its task once it wakes up, so tasks submitted meanwhile
+            # must not count on the same worker
+            if self._queued_tasks > self._idle_workers and len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"{self.name}-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+        return future
+
+    def wait(self, futures: Iterable[Future], timeout: Optional[float] = None) -> tuple[set[Future], set[Future]]:
+        """
+        Wait for futures, cancelling the ones not done before the timeout.
+
+        Queued tasks are dropped before they start. Tasks already running cannot be interrupted, but their
+        futures are reported as not done, so callers must ignore whatever those branches produce later.
+        """
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        if not_done:
+            cancelled = sum(1 for future in not_done if future.cancel())
+            logger.warning(
+                "%s: %s retrieval tasks did not finish within %ss, %s of them were cancelled before starting",
+                self.name,
+                len(not_done),
+                timeout,
+                cancelled,
+            )
+        return done, not_done
+
+    def stats(self) -> dict[str, Any]:
+        with self._condition:
+            return {
+                "max_workers": self.max_workers,
+                "workers": len(self._workers),
+                "active_tasks": self._active_tasks,
+                "queue_depth": self._queued_tasks,
+                "queued_tenants": len(self._queues),
+            }
+
+    def _next_task(self) -> _RetrievalTask:
+        # take one task of the first tenant in line and move the tenant to the back
+        tenant_id, queue = self._queues.popitem(last=False)
+        task = queue.popleft()
+        self._queued_tasks -= 1
+        if queue:
+            self._queues[tenant_id] = queue
+        return task
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                self._idle_workers += 1
+                while not self._queues:
+                    self._condition.wait()
+                self._idle_workers -= 1
+                task = self._next_task()
+
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            _queue_wait_histogram.record(time.perf_counter() - task.enqueued_at, {"executor": self.name})
+            with self._condition:
+                self._active_tasks += 1
+            try:
+                task.future.set_result(task.fn(*task.args, **task.kwargs))
+            except BaseException as e:
+                logger.exception("%s: retrieval task failed", self.name)
+                task.future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._active_tasks -= 1
+
+
+_executors: dict[str, RetrievalExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str, max_workers: int) -> RetrievalExecutor:
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = RetrievalExecutor(name, max_workers)
+        return _executors[name]
+
+
+def get_search_executor() -> RetrievalExecutor:
+    """Executor for the keyword, semantic and full-text search branches of a single dataset."""
+    return _get_executor("retrieval-search", dify_config.RETRIEVAL_SERVICE_EXECUTORS)
+
+
+def get_dataset_executor() -> RetrievalExecutor:
+    """
+    Executor for per-dataset retrievals of multi-dataset queries.
+
+    It is separate from the search executor because dataset tasks wait on search tasks; sharing one
+    bounded pool could deadlock once all workers are waiting.
+    """
+    return _get_executor("retrieval-dataset", dify_config.RETRIEVAL_DATASET_EXECUTORS)
+
+
+def _observe_queue_depth(options: CallbackOptions) -> Iterable[Observation]:
+    for executor in list(_executors.values()):
+        stats = executor.stats()
+        yield Observation(stats["queue_depth"], {"executor": executor.name})
+
+
+_meter.create_observable_gauge(
+    "retrieval.executor.queue_depth",
+    callbacks=[_observe_queue_depth],
+    description="Number of retrieval tasks waiting for a worker",
+    unit="{task}",
+)
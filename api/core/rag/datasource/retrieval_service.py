@@ -1,5 +1,4 @@
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
 from typing import Optional
 
 from flask import Flask, current_app
@@ -8,6 +7,7 @@ from sqlalchemy.orm import Session, load_only
 from configs import dify_config
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.retrieval_executor import get_search_executor
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.embedding.retrieval import RetrievalSegments
 from core.rag.entities.metadata_entities import MetadataCondition
@@ -43,65 +43,68 @@ class RetrievalService:
         reranking_mode: str = "reranking_model",
         weights: Optional[dict] = None,
         document_ids_filter: Optional[list[str]] = None,
+        query_vector: Optional[list[float]] = None,
     ):
+        """
+        :param query_vector: embedding of the query by the dataset's embedding model, when the caller
+            already has it; semantic search then skips embedding the query again
+        """
         if not query:
             return []
         dataset = cls._get_dataset(dataset_id)
         if not dataset:
             return []
 
+        # every branch collects into its own lists, so branches that miss the timeout are dropped as a whole
+        executor = get_search_executor()
+        flask_app = current_app._get_current_object()  # type: ignore
+        branches: list[tuple[Future, list[Document], list[str]]] = []
+
+        def submit_branch(search, **kwargs):
+            branch_documents: list[Document] = []
+            branch_exceptions: list[str] = []
+            future = executor.submit(
+                dataset.tenant_id,
+                search,
+                flask_app=flask_app,
+                dataset_id=dataset_id,
+                query=query,
+                top_k=top_k,
+                all_documents=branch_documents,
+                exceptions=branch_exceptions,
+                document_ids_filter=document_ids_filter,
+                **kwargs,
+            )
+            branches.append((future, branch_documents, branch_exceptions))
+
+        if retrieval_method == "keyword_search":
+            submit_branch(cls.keyword_search)
+        if RetrievalMethod.is_support_semantic_search(retrieval_method):
+            submit_branch(
+                cls.embedding_search,
+                score_threshold=score_threshold,
+                reranking_model=reranking_model,
+                retrieval_method=retrieval_method,
+                query_vector=query_vector,
+            )
+        if RetrievalMethod.is_support_fulltext_search(retrieval_method):
+            submit_branch(
+                cls.full_text_index_search,
+                score_threshold=score_threshold,
+                reranking_model=reranking_model,
+                retrieval_method=retrieval_method,
+            )
+        done, _ = executor.wait([future for future, _, _ in branches], timeout=dify_config.RETRIEVAL_SERVICE_TIMEOUT)
+
         all_documents: list[Document] = []
         exceptions: list[str] = []
-
-        # Optimize multithreading with thread pools
-        with ThreadPoolExecutor(max_workers=dify_config.RETRIEVAL_SERVICE_EXECUTORS) as executor:  # type: ignore
-            futures = []
-            if retrieval_method == "keyword_search":
-                futures.append(
-                    executor.submit(
-                        cls.keyword_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        all_documents=all_documents,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            if RetrievalMethod.is_support_semantic_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.embedding_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            if RetrievalMethod.is_support_fulltext_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.full_text_index_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            concurrent.futures.wait(futures, timeout=30, return_when=concurrent.futures.ALL_COMPLETED)
+        for future, branch_documents, branch_exceptions in branches:
+            if future not in done:
+                continue
+            if future.exception() is not None:
+                exceptions.append(str(future.exception()))
+            all_documents.extend(branch_documents)
+            exceptions.extend(branch_exceptions)
 
         if exceptions:
             raise ValueError(";\n".join(exceptions))
@@ -186,6 +189,7 @@ class RetrievalService:
         retrieval_method: str,
         exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
+        query_vector: Optional[list[float]] = None,
     ):
         with flask_app.app_context():
             try:
@@ -194,14 +198,17 @@ class RetrievalService:
                     raise ValueError("dataset not found")
 
                 vector = Vector(dataset=dataset)
-                documents = vector.search_by_vector(
-                    query,
-                    search_type="similarity_score_threshold",
-                    top_k=top_k,
-                    score_threshold=score_threshold,
-                    filter={"group_id": [dataset.id]},
-                    document_ids_filter=document_ids_filter,
-                )
+                search_kwargs = {
+                    "search_type": "similarity_score_threshold",
+                    "top_k": top_k,
+                    "score_threshold": score_threshold,
+                    "filter": {"group_id": [dataset.id]},
+                    "document_ids_filter": document_ids_filter,
+                }
+                if query_vector is not None:
+                    documents = vector.search_by_query_vector(query_vector, **search_kwargs)
+                else:
+                    documents = vector.search_by_vector(query, **search_kwargs)
 
                 if documents:
                     if (
@@ -299,6 +306,59 @@ class RetrievalService:
                 .all()
             }
 
+            # Collect the index node ids of all retrieved chunks, split by index type
+            child_index_node_ids = set()
+            index_node_ids = set()
+            dataset_ids = set()
+            for document in documents:
+                dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+                index_node_id = document.metadata.get("doc_id")
+                if not dataset_document or not index_node_id:
+                    continue
+                if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                    child_index_node_ids.add(index_node_id)
+                else:
+                    index_node_ids.add(index_node_id)
+                    dataset_ids.add(dataset_document.dataset_id)
+
+            # Batch query child chunks and their parent segments
+            child_chunks_by_index_node_id = {}
+            parent_segments = {}
+            if child_index_node_ids:
+                child_chunks_by_index_node_id = {
+                    child_chunk.index_node_id: child_chunk
+                    for child_chunk in db.session.query(ChildChunk)
+                    .where(ChildChunk.index_node_id.in_(child_index_node_ids))
+                    .all()
+                }
+                parent_segment_ids = {child_chunk.segment_id for child_chunk in child_chunks_by_index_node_id.values()}
+                if parent_segment_ids:
+                    parent_segments = {
+                        segment.id: segment
+                        for segment in db.session.query(DocumentSegment)
+                        .where(
+                            DocumentSegment.enabled == True,
+                            DocumentSegment.status == "completed",
+                            DocumentSegment.id.in_(parent_segment_ids),
+                        )
+                        .all()
+                    }
+
+            # Batch query segments of normal documents
+            segments_by_index_node_id = {}
+            if index_node_ids:
+                segments_by_index_node_id = {
+                    (segment.dataset_id, segment.index_node_id): segment
+                    for segment in db.session.query(DocumentSegment)
+                    .where(
+                        DocumentSegment.dataset_id.in_(dataset_ids),
+                        DocumentSegment.enabled == True,
+                        DocumentSegment.status == "completed",
+                        DocumentSegment.index_node_id.in_(index_node_ids),
+                    )
+                    .all()
+                }
+
             records = []
             include_segment_ids = set()
             segment_child_map = {}
@@ -317,42 +377,22 @@ class RetrievalService:
                     # Handle parent-child documents
                     child_index_node_id = document.metadata.get("doc_id")
 
-                    child_chunk = (
-                        db.session.query(ChildChunk).where(ChildChunk.index_node_id == child_index_node_id).first()
-                    )
-
+                    child_chunk = child_chunks_by_index_node_id.get(child_index_node_id)
                     if not child_chunk:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .where(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.id == child_chunk.segment_id,
-                        )
-                        .options(
-                            load_only(
-                                DocumentSegment.id,
-                                DocumentSegment.content,
-                                DocumentSegment.answer,
-                            )
-                        )
-                        .first()
-                    )
-
-                    if not segment:
+                    segment = parent_segments.get(child_chunk.segment_id)
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
+                    child_chunk_detail = {
+                        "id": child_chunk.id,
+                        "content": child_chunk.content,
+                        "position": child_chunk.position,
+                        "score": document.metadata.get("score", 0.0),
+                    }
                     if segment.id not in include_segment_ids:
                         include_segment_ids.add(segment.id)
-                        child_chunk_detail = {
-                            "id": child_chunk.id,
-                            "content": child_chunk.content,
-                            "position": child_chunk.position,
-                            "score": document.metadata.get("score", 0.0),
-                        }
                         map_detail = {
                             "max_score": document.metadata.get("score", 0.0),
                             "child_chunks": [child_chunk_detail],
@@ -363,12 +403,6 @@ class RetrievalService:
                         }
                         records.append(record)
                     else:
-                        child_chunk_detail = {
-                            "id": child_chunk.id,
-                            "content": child_chunk.content,
-                            "position": child_chunk.position,
-                            "score": document.metadata.get("score", 0.0),
-                        }
                         segment_child_map[segment.id]["child_chunks"].append(child_chunk_detail)
                         segment_child_map[segment.id]["max_score"] = max(
                             segment_child_map[segment.id]["max_score"], document.metadata.get("score", 0.0)
@@ -379,17 +413,7 @@ class RetrievalService:
                     if not index_node_id:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .where(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
-
+                    segment = segments_by_index_node_id.get((dataset_document.dataset_id, index_node_id))
                     if not segment:
                         continue
 
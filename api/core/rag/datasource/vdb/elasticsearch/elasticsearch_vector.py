@@ -174,6 +174,17 @@ class ElasticSearchVector(BaseVector):
     def text_exists(self, id: str) -> bool:
         return bool(self._client.exists(index=self._collection_name, id=id))
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        existing_ids: set[str] = set()
+        for i in range(0, len(ids), self.EXISTING_IDS_BATCH_SIZE):
+            response = self._client.mget(
+                index=self._collection_name, ids=ids[i : i + self.EXISTING_IDS_BATCH_SIZE], source=False
+            )
+            existing_ids.update(doc["_id"] for doc in response["docs"] if doc.get("found"))
+        return existing_ids
+
     def delete_by_ids(self, ids: list[str]) -> None:
         if not ids:
             return
@@ -203,6 +203,29 @@ class MilvusVector(BaseVector):
 
         return len(result) > 0
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids or not self._client.has_collection(self._collection_name):
+            return set()
+
+        existing_ids: set[str] = set()
+        for i in range(0, len(ids), self.EXISTING_IDS_BATCH_SIZE):
+            batch_ids = ids[i : i + self.EXISTING_IDS_BATCH_SIZE]
+            # a doc_id can be stored more than once, so page until every matching row is seen
+            offset = 0
+            while True:
+                result = self._client.query(
+                    collection_name=self._collection_name,
+                    filter=f'metadata["doc_id"] in {json.dumps(batch_ids)}',
+                    output_fields=[Field.METADATA_KEY.value],
+                    limit=len(batch_ids),
+                    offset=offset,
+                )
+                existing_ids.update(item[Field.METADATA_KEY.value]["doc_id"] for item in result)
+                if len(result) < len(batch_ids):
+                    break
+                offset += len(batch_ids)
+        return existing_ids
+
     def field_exists(self, field: str) -> bool:
         """
         Check if a field exists in the collection.
@@ -0,0 +1,68 @@
+import io
+import json
+import struct
+import uuid
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any, Optional
+
+import numpy as np
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+
+# JSONB binary input is a version byte followed by the JSON text
+JSONB_VERSION = b"\x01"
+
+
+def to_vector_literal(vector: Sequence[float] | np.ndarray) -> str:
+    """
+    Format a vector as a `[x,y,...]` literal with the shortest digits that round-trip float32.
+    psycopg2 sends parameters as text only; this is about half the size of `json.dumps` and parses to the
+    same values the server stores.
+    """
+    return "[" + ",".join(map(str, np.asarray(vector, dtype=np.float32))) + "]"
+
+
+def encode_uuid(value: str | uuid.UUID) -> bytes:
+    return value.bytes if isinstance(value, uuid.UUID) else uuid.UUID(value).bytes
+
+
+def encode_text(value: str) -> bytes:
+    return value.encode()
+
+
+def encode_jsonb(value: Any) -> bytes:
+    return JSONB_VERSION + json.dumps(value).encode()
+
+
+def copy_rows_binary(
+    cursor: Any,
+    table_name: str,
+    columns: Sequence[str],
+    encoders: Sequence[Callable[[Any], bytes]],
+    rows: Iterable[Sequence[Any]],
+) -> None:
+    """
+    Insert rows with a single binary COPY.
+
+    :param cursor: psycopg2 cursor
+    :param table_name: target table
+    :param columns: target columns
+    :param encoders: binary encoder of each column, values of None are sent as NULL
+    :param rows: rows of column values
+    """
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    field_count = struct.pack("!h", len(columns))
+    for row in rows:
+        buffer.write(field_count)
+        for encode, value in zip(encoders, row):
+            data: Optional[bytes] = None if value is None else encode(value)
+            if data is None:
+                buffer.write(struct.pack("!i", -1))
+            else:
+                buffer.write(struct.pack("!i", len(data)))
+                buffer.write(data)
+    buffer.write(PGCOPY_TRAILER)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT BINARY)", buffer)
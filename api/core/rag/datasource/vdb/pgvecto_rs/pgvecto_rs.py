@@ -1,19 +1,29 @@
 import json
 import logging
-from typing import Any
+from typing import Any, cast
 from uuid import UUID, uuid4
 
 from numpy import ndarray
 from pgvecto_rs.sqlalchemy import VECTOR  # type: ignore
+from pgvecto_rs.types import Vector  # type: ignore
 from pydantic import BaseModel, model_validator
-from sqlalchemy import Float, create_engine, insert, select, text
+from sqlalchemy import Engine, Float, String, create_engine, select, text, type_coerce
 from sqlalchemy import text as sql_text
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, Session, mapped_column
+from sqlalchemy.pool import QueuePool
 
 from configs import dify_config
+from core.rag.datasource.vdb.pg_vector_codec import (
+    copy_rows_binary,
+    encode_jsonb,
+    encode_text,
+    encode_uuid,
+    to_vector_literal,
+)
 from core.rag.datasource.vdb.pgvecto_rs.collection import CollectionORM
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -54,10 +64,13 @@ class PGVectoRS(BaseVector):
         self._url = (
             f"postgresql+psycopg2://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}"
         )
-        self._client = create_engine(self._url)
-        with Session(self._client) as session:
-            session.execute(text("CREATE EXTENSION IF NOT EXISTS vectors"))
-            session.commit()
+        self._client = vector_client_registry.get_or_create(
+            VectorType.PGVECTO_RS,
+            self._url,
+            lambda: self._create_engine(self._url),
+            close=Engine.dispose,
+            usage=lambda engine: cast(QueuePool, engine.pool).checkedout(),
+        )
         self._fields: list[str] = []
 
         class _Table(CollectionORM):
@@ -74,6 +87,14 @@ class PGVectoRS(BaseVector):
         self._table = _Table
         self._distance_op = "<=>"
 
+    @staticmethod
+    def _create_engine(url: str) -> Engine:
+        engine = create_engine(url, pool_pre_ping=True)
+        with Session(engine) as session:
+            session.execute(text("CREATE EXTENSION IF NOT EXISTS vectors"))
+            session.commit()
+        return engine
+
     def get_type(self) -> str:
         return VectorType.PGVECTO_RS
 
@@ -115,20 +136,28 @@ class PGVectoRS(BaseVector):
             redis_client.set(collection_exist_cache_key, 1, ex=3600)
 
     def add_texts(self, documents: list[Document], embeddings: list[list[float]], **kwargs):
-        pks = []
-        with Session(self._client) as session:
-            for document, embedding in zip(documents, embeddings):
-                pk = uuid4()
-                session.execute(
-                    insert(self._table).values(
-                        id=pk,
-                        text=document.page_content,
-                        meta=document.metadata,
-                        vector=embedding,
-                    ),
+        pks = [uuid4() for _ in documents]
+        rows = [
+            (pk, document.page_content, document.metadata, embedding)
+            for pk, document, embedding in zip(pks, documents, embeddings)
+        ]
+        # one binary COPY instead of an INSERT with a text formatted vector per document
+        conn = self._client.raw_connection()
+        try:
+            cur = conn.cursor()
+            try:
+                copy_rows_binary(
+                    cur,
+                    self._collection_name,
+                    ("id", "text", "meta", "vector"),
+                    (encode_uuid, encode_text, encode_jsonb, lambda embedding: Vector(embedding).to_binary()),
+                    rows,
                 )
-                pks.append(pk)
-            session.commit()
+            finally:
+                cur.close()
+            conn.commit()
+        finally:
+            conn.close()
 
         return pks
 
@@ -183,7 +212,7 @@ class PGVectoRS(BaseVector):
                 select(
                     self._table,
                     self._table.vector.op(self._distance_op, return_type=Float)(
-                        query_vector,
+                        type_coerce(to_vector_literal(query_vector), String),
                     ).label("distance"),
                 )
                 .limit(kwargs.get("top_k", 4))
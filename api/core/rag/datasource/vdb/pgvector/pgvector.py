@@ -6,12 +6,19 @@ from contextlib import contextmanager
 from typing import Any
 
 import psycopg2.errors
-import psycopg2.extras  # type: ignore
-import psycopg2.pool  # type: ignore
+from pgvector.utils import to_db_binary  # type: ignore
 from pydantic import BaseModel, model_validator
 
 from configs import dify_config
+from core.rag.datasource.vdb.pg_vector_codec import (
+    copy_rows_binary,
+    encode_jsonb,
+    encode_text,
+    encode_uuid,
+    to_vector_literal,
+)
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import get_shared_connection_pool
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -84,7 +91,8 @@ class PGVector(BaseVector):
         return VectorType.PGVECTOR
 
     def _create_connection_pool(self, config: PGVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
+        return get_shared_connection_pool(
+            VectorType.PGVECTOR,
             config.min_connection,
             config.max_connection,
             host=config.host,
@@ -101,9 +109,11 @@ class PGVector(BaseVector):
         try:
             yield cur
         finally:
-            cur.close()
-            conn.commit()
-            self.pool.putconn(conn)
+            try:
+                cur.close()
+                conn.commit()
+            finally:
+                self.pool.putconn(conn)
 
     def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
         dimension = len(embeddings[0])
@@ -121,13 +131,18 @@ class PGVector(BaseVector):
                     (
                         doc_id,
                         doc.page_content,
-                        json.dumps(doc.metadata),
+                        doc.metadata,
                         embeddings[i],
                     )
                 )
+        # binary COPY skips formatting every embedding as text and parsing it again on the server
         with self._get_cursor() as cur:
-            psycopg2.extras.execute_values(
-                cur, f"INSERT INTO {self.table_name} (id, text, meta, embedding) VALUES %s", values
+            copy_rows_binary(
+                cur,
+                self.table_name,
+                ("id", "text", "meta", "embedding"),
+                (encode_uuid, encode_text, encode_jsonb, to_db_binary),
+                values,
             )
         return pks
 
@@ -136,6 +151,17 @@ class PGVector(BaseVector):
             cur.execute(f"SELECT id FROM {self.table_name} WHERE id = %s", (id,))
             return cur.fetchone() is not None
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        existing_ids: set[str] = set()
+        with self._get_cursor() as cur:
+            for i in range(0, len(ids), self.EXISTING_IDS_BATCH_SIZE):
+                batch_ids = tuple(ids[i : i + self.EXISTING_IDS_BATCH_SIZE])
+                cur.execute(f"SELECT id FROM {self.table_name} WHERE id IN %s", (batch_ids,))
+                existing_ids.update(str(record[0]) for record in cur)
+        return existing_ids
+
     def get_by_ids(self, ids: list[str]) -> list[Document]:
         with self._get_cursor() as cur:
             cur.execute(f"SELECT meta, text FROM {self.table_name} WHERE id IN %s", (tuple(ids),))
@@ -185,7 +211,7 @@ class PGVector(BaseVector):
                 f"SELECT meta, text, embedding <=> %s AS distance FROM {self.table_name}"
                 f" {where_clause}"
                 f" ORDER BY distance LIMIT {top_k}",
-                (json.dumps(query_vector),),
+                (to_vector_literal(query_vector),),
             )
             docs = []
             score_threshold = float(kwargs.get("score_threshold") or 0.0)
@@ -4,11 +4,12 @@ from contextlib import contextmanager
 from typing import Any
 
 import psycopg2.extras  # type: ignore
-import psycopg2.pool  # type: ignore
 from pydantic import BaseModel, model_validator
 
 from configs import dify_config
+from core.rag.datasource.vdb.pg_vector_codec import to_vector_literal
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import get_shared_connection_pool
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -73,7 +74,8 @@ class VastbaseVector(BaseVector):
         return VectorType.VASTBASE
 
     def _create_connection_pool(self, config: VastbaseVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
+        return get_shared_connection_pool(
+            VectorType.VASTBASE,
             config.min_connection,
             config.max_connection,
             host=config.host,
@@ -90,9 +92,11 @@ class VastbaseVector(BaseVector):
         try:
             yield cur
         finally:
-            cur.close()
-            conn.commit()
-            self.pool.putconn(conn)
+            try:
+                cur.close()
+                conn.commit()
+            finally:
+                self.pool.putconn(conn)
 
     def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
         dimension = len(embeddings[0])
@@ -111,7 +115,7 @@ class VastbaseVector(BaseVector):
                         doc_id,
                         doc.page_content,
                         json.dumps(doc.metadata),
-                        embeddings[i],
+                        to_vector_literal(embeddings[i]),
                     )
                 )
         with self._get_cursor() as cur:
@@ -162,7 +166,7 @@ class VastbaseVector(BaseVector):
             cur.execute(
                 f"SELECT meta, text, embedding <=> %s AS distance FROM {self.table_name}"
                 f" ORDER BY distance LIMIT {top_k}",
-                (json.dumps(query_vector),),
+                (to_vector_literal(query_vector),),
             )
             docs = []
             score_threshold = float(kwargs.get("score_threshold") or 0.0)
@@ -328,6 +328,20 @@ class QdrantVector(BaseVector):
 
         return len(response) > 0
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        if not ids or not self._client.collection_exists(self._collection_name):
+            return set()
+        existing_ids: set[str] = set()
+        for i in range(0, len(ids), self.EXISTING_IDS_BATCH_SIZE):
+            response = self._client.retrieve(
+                collection_name=self._collection_name,
+                ids=ids[i : i + self.EXISTING_IDS_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False,
+            )
+            existing_ids.update(str(point.id) for point in response)
+        return existing_ids
+
     def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
         from qdrant_client.http import models
 
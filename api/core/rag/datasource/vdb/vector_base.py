@@ -7,6 +7,9 @@ from core.rag.models.document import Document
 
 
 class BaseVector(ABC):
+    # doc ids looked up per request when checking which documents already exist
+    EXISTING_IDS_BATCH_SIZE = 100
+
     def __init__(self, collection_name: str):
         self._collection_name = collection_name
 
@@ -49,15 +52,25 @@ class BaseVector(ABC):
     def delete(self) -> None:
         raise NotImplementedError
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        """
+        Return the subset of the given doc ids that already exist in the collection.
+        Backends should override this with bulk lookups of EXISTING_IDS_BATCH_SIZE ids; the default checks ids
+        one by one.
+        """
+        return {id for id in ids if self.text_exists(id)}
+
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata and "doc_id" in text.metadata:
-                doc_id = text.metadata["doc_id"]
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        doc_ids = [text.metadata["doc_id"] for text in texts if text.metadata and "doc_id" in text.metadata]
+        existing_ids = self.get_existing_ids(list(dict.fromkeys(doc_ids))) if doc_ids else set()
+        if not existing_ids:
+            return texts
+
+        return [
+            text
+            for text in texts
+            if not (text.metadata and "doc_id" in text.metadata and text.metadata["doc_id"] in existing_ids)
+        ]
 
     def _get_uuids(self, texts: list[Document]) -> list[str]:
         return [text.metadata["doc_id"] for text in texts if text.metadata and "doc_id" in text.metadata]
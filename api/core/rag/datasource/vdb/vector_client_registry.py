@@ -0,0 +1,280 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Optional, TypeVar, cast
+
+import psycopg2.pool  # type: ignore
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class _ClientEntry:
+    backend: str
+    client: Any
+    health_check: Optional[Callable[[Any], bool]] = None
+    close: Optional[Callable[[Any], None]] = None
+    usage: Optional[Callable[[Any], int]] = None
+    last_used_at: float = field(default_factory=time.monotonic)
+    last_checked_at: float = field(default_factory=time.monotonic)
+
+
+class VectorClientRegistry:
+    """
+    Process-wide registry of vector store clients and connection pools.
+
+    Vector instances are created per query, but the clients behind them only depend on the backend
+    config, so they are created once per config and shared by all requests and tasks of the process.
+    A client is health checked before reuse when it was not checked for
+    VECTOR_CLIENT_HEALTH_CHECK_INTERVAL seconds and replaced when the check fails, and clients unused
+    for VECTOR_CLIENT_IDLE_TIMEOUT seconds are closed and dropped.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, Hashable], _ClientEntry] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_evicted_at = time.monotonic()
+
+    def get_or_create(
+        self,
+        backend: str,
+        key: Hashable,
+        create: Callable[[], T],
+        *,
+        health_check: Optional[Callable[[T], bool]] = None,
+        close: Optional[Callable[[T], None]] = None,
+        usage: Optional[Callable[[T], int]] = None,
+    ) -> T:
+        """
+        Get the shared client of a backend config, creating it on first use.
+
+        :param backend: vector store type, used in logs and metrics
+        :param key: hashable backend config the client is created from
+        :param create: creates the client
+        :param health_check: returns whether a client can still be used
+        :param close: releases the resources of an evicted client
+        :param usage: number of connections a client currently has in use
+        """
+        self._reset_after_fork()
+        self._evict_idle()
+        stale: list[_ClientEntry] = []
+        with self._lock:
+            entry = self._entries.get((backend, key))
+            now = time.monotonic()
+            check_health = bool(
+                entry
+                and entry.health_check
+                and now - entry.last_checked_at >= dify_config.VECTOR_CLIENT_HEALTH_CHECK_INTERVAL
+            )
+            if entry:
+                entry.last_used_at = now
+            if entry and check_health:
+                # only one caller checks a client, the others keep using it meanwhile
+                entry.last_checked_at = now
+
+        # checks can be slow, do not block lookups of other clients meanwhile
+        if entry and check_health and not self._is_healthy(entry):
+            logger.warning("%s client failed its health check, creating a new one", backend)
+            with self._lock:
+                if self._entries.get((backend, key)) is entry:
+                    del self._entries[(backend, key)]
+                    stale.append(entry)
+            entry = None
+
+        if entry is None:
+            # connecting can be slow, do not block lookups of other clients meanwhile
+            created = _ClientEntry(backend, create(), health_check=health_check, close=close, usage=usage)
+            with self._lock:
+                entry = self._entries.get((backend, key))
+                if entry is None:
+                    entry = self._entries[(backend, key)] = created
+                else:
+                    stale.append(created)
+                entry.last_used_at = time.monotonic()
+
+        for stale_entry in stale:
+            self._close(stale_entry)
+        return cast(T, entry.client)
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def stats(self) -> list[tuple[str, int]]:
+        """Backend and connections in use of every registered client."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [(entry.backend, entry.usage(entry.client) if entry.usage else 0) for entry in entries]
+
+    def _reset_after_fork(self) -> None:
+        # clients hold sockets of the parent process, a forked worker must not use or close them
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._entries = {}
+                    self._pid = os.getpid()
+
+    def _evict_idle(self) -> None:
+        idle_timeout = dify_config.VECTOR_CLIENT_IDLE_TIMEOUT
+        now = time.monotonic()
+        if idle_timeout <= 0 or now - self._last_evicted_at < min(idle_timeout, 60):
+            return
+        with self._lock:
+            self._last_evicted_at = now
+            idle_keys = [
+                key
+                for key, entry in self._entries.items()
+                if now - entry.last_used_at >= idle_timeout and not (entry.usage and entry.usage(entry.client))
+            ]
+            idle_entries = [self._entries.pop(key) for key in idle_keys]
+        for entry in idle_entries:
+            logger.info("closing %s client idle for more than %ss", entry.backend, idle_timeout)
+            self._close(entry)
+
+    @staticmethod
+    def _is_healthy(entry: _ClientEntry) -> bool:
+        try:
+            return bool(entry.health_check and entry.health_check(entry.client))
+        except Exception:
+            logger.exception("%s client health check failed", entry.backend)
+            return False
+
+    @staticmethod
+    def _close(entry: _ClientEntry) -> None:
+        if not entry.close:
+            return
+        try:
+            entry.close(entry.client)
+        except Exception:
+            logger.exception("failed to close %s client", entry.backend)
+
+
+vector_client_registry = VectorClientRegistry()
+
+
+class SharedConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    Thread-safe psycopg2 pool shared by all vector instances of a backend config.
+
+    `getconn` waits up to VECTOR_POOL_CONNECTION_TIMEOUT seconds while all `maxconn` connections are in
+    use before raising `PoolError`, and connections that were closed by the server are replaced instead of
+    being handed out again.
+    """
+
+    # set by psycopg2's pool, which has no type hints
+    _lock: threading.Lock
+    _pool: list[Any]
+    _used: dict[Any, Any]
+
+    def __init__(self, minconn: int, maxconn: int, *args: Any, **kwargs: Any) -> None:
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key: Any = None) -> Any:
+        if not self._slots.acquire(timeout=dify_config.VECTOR_POOL_CONNECTION_TIMEOUT):
+            raise psycopg2.pool.PoolError(
+                f"connection pool exhausted, no connection was free for {dify_config.VECTOR_POOL_CONNECTION_TIMEOUT}s"
+            )
+        try:
+            conn = super().getconn(key)
+            if conn.closed:
+                super().putconn(conn, key, close=True)
+                conn = super().getconn(key)
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn: Any = None, key: Any = None, close: bool = False) -> None:
+        try:
+            super().putconn(conn, key, close=close or bool(conn is not None and conn.closed))
+        finally:
+            self._slots.release()
+
+    def used_connections(self) -> int:
+        return len(self._used)
+
+    def ping(self) -> bool:
+        if not self._slots.acquire(blocking=False):
+            # every connection is checked out, so the pool is evidently in use
+            return True
+        try:
+            conn = super().getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+        finally:
+            self.putconn(conn, close=bool(conn.closed))
+
+    def close_idle(self) -> None:
+        """Close connections not in use. The pool stays usable and reconnects on demand."""
+        with self._lock:
+            for conn in self._pool:
+                conn.close()
+            self._pool.clear()
+
+
+def get_shared_connection_pool(backend: str, minconn: int, maxconn: int, **connect_kwargs: Any) -> SharedConnectionPool:
+    """Shared psycopg2 pool of a Postgres-compatible vector store, keyed by its connection settings."""
+    key = (minconn, maxconn, tuple(sorted(connect_kwargs.items())))
+    return vector_client_registry.get_or_create(
+        backend,
+        key,
+        lambda: SharedConnectionPool(minconn, maxconn, **connect_kwargs),
+        health_check=SharedConnectionPool.ping,
+        # holders of the pool keep working after eviction, so only idle connections are closed
+        close=SharedConnectionPool.close_idle,
+        usage=SharedConnectionPool.used_connections,
+    )
+
+
+_meter = get_meter("vector_client_registry")
+
+
+def _observe_clients(options: CallbackOptions) -> Iterable[Observation]:
+    counts: dict[str, int] = {}
+    for backend, _ in vector_client_registry.stats():
+        counts[backend] = counts.get(backend, 0) + 1
+    for backend, count in counts.items():
+        yield Observation(count, {"backend": backend})
+
+
+def _observe_connections_in_use(options: CallbackOptions) -> Iterable[Observation]:
+    in_use: dict[str, int] = {}
+    for backend, used in vector_client_registry.stats():
+        in_use[backend] = in_use.get(backend, 0) + used
+    for backend, used in in_use.items():
+        yield Observation(used, {"backend": backend})
+
+
+_meter.create_observable_gauge(
+    "vector_store.clients",
+    callbacks=[_observe_clients],
+    description="Number of shared vector store clients",
+    unit="{client}",
+)
+_meter.create_observable_gauge(
+    "vector_store.connections_in_use",
+    callbacks=[_observe_connections_in_use],
+    description="Connections of shared vector store pools currently checked out",
+    unit="{connection}",
+)
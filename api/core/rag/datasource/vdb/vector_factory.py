@@ -202,6 +202,9 @@ class Vector:
     def text_exists(self, id: str) -> bool:
         return self._vector_processor.text_exists(id)
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        return self._vector_processor.get_existing_ids(ids)
+
     def delete_by_ids(self, ids: list[str]) -> None:
         self._vector_processor.delete_by_ids(ids)
 
@@ -212,6 +215,10 @@ class Vector:
         query_vector = self._embeddings.embed_query(query)
         return self._vector_processor.search_by_vector(query_vector, **kwargs)
 
+    def search_by_query_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
+        """Search with a query already embedded by this dataset's embedding model."""
+        return self._vector_processor.search_by_vector(query_vector, **kwargs)
+
     def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
         return self._vector_processor.search_by_full_text(query, **kwargs)
 
@@ -234,16 +241,12 @@ class Vector:
         return CacheEmbedding(embedding_model)
 
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata is None:
-                continue
-            doc_id = text.metadata["doc_id"]
-            if doc_id:
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        doc_ids = [text.metadata["doc_id"] for text in texts if text.metadata and text.metadata["doc_id"]]
+        existing_ids = self.get_existing_ids(list(dict.fromkeys(doc_ids))) if doc_ids else set()
+        if not existing_ids:
+            return texts
+
+        return [text for text in texts if not (text.metadata and text.metadata["doc_id"] in existing_ids)]
 
     def __getattr__(self, name):
         if self._vector_processor is not None:
@@ -171,6 +171,36 @@ class WeaviateVector(BaseVector):
 
         return True
 
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        collection_name = self._collection_name
+        schema = self._default_schema(self._collection_name)
+
+        # check whether the index already exists
+        if not ids or not self._client.schema.contains(schema):
+            return set()
+        existing_ids: set[str] = set()
+        for i in range(0, len(ids), self.EXISTING_IDS_BATCH_SIZE):
+            batch_ids = ids[i : i + self.EXISTING_IDS_BATCH_SIZE]
+            operands = [{"path": ["doc_id"], "operator": "Equal", "valueText": id} for id in batch_ids]
+            # a doc_id can be stored more than once, so page until every matching object is seen
+            offset = 0
+            while True:
+                result = (
+                    self._client.query.get(collection_name, ["doc_id"])
+                    .with_where({"operator": "Or", "operands": operands})
+                    .with_limit(len(batch_ids))
+                    .with_offset(offset)
+                    .do()
+                )
+                if "errors" in result:
+                    raise ValueError(f"Error during query: {result['errors']}")
+                entries = result["data"]["Get"][collection_name]
+                existing_ids.update(entry["doc_id"] for entry in entries)
+                if len(entries) < len(batch_ids):
+                    break
+                offset += len(batch_ids)
+        return existing_ids
+
     def delete_by_ids(self, ids: list[str]) -> None:
         # check whether the index already exists
         schema = self._default_schema(self._collection_name)
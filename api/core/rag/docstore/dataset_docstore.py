@@ -1,7 +1,8 @@
+import uuid
 from collections.abc import Sequence
 from typing import Any, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
 
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
@@ -9,6 +10,9 @@ from core.rag.models.document import Document
 from extensions.ext_database import db
 from models.dataset import ChildChunk, Dataset, DocumentSegment
 
+# Maximum number of segments looked up or written per statement.
+SEGMENT_BATCH_SIZE = 1000
+
 
 class DatasetDocumentStore:
     def __init__(
@@ -85,92 +89,122 @@ class DatasetDocumentStore:
         else:
             tokens_list = [0] * len(docs)
 
-        for doc, tokens in zip(docs, tokens_list):
+        for doc in docs:
             if not isinstance(doc, Document):
                 raise ValueError("doc must be a Document")
 
             if doc.metadata is None:
                 raise ValueError("doc.metadata must be a dict")
 
-            segment_document = self.get_document_segment(doc_id=doc.metadata["doc_id"])
+        existing_segments = self._get_document_segments([doc.metadata["doc_id"] for doc in docs])
+        if not allow_update and existing_segments:
+            raise ValueError(
+                f"doc_id {next(iter(existing_segments))} already exists. Set allow_update to True to overwrite."
+            )
 
+        segment_rows: dict[str, dict[str, Any]] = {}
+        child_rows: dict[str, list[dict[str, Any]]] = {}
+        updated_segment_ids = []
+        for doc, tokens in zip(docs, tokens_list):
+            doc_id = doc.metadata["doc_id"]
+            segment_document = existing_segments.get(doc_id)
             # NOTE: doc could already exist in the store, but we overwrite it
-            if not allow_update and segment_document:
-                raise ValueError(
-                    f"doc_id {doc.metadata['doc_id']} already exists. Set allow_update to True to overwrite."
-                )
-
-            if not segment_document:
-                max_position += 1
-
-                segment_document = DocumentSegment(
-                    tenant_id=self._dataset.tenant_id,
-                    dataset_id=self._dataset.id,
-                    document_id=self._document_id,
-                    index_node_id=doc.metadata["doc_id"],
-                    index_node_hash=doc.metadata["doc_hash"],
-                    position=max_position,
-                    content=doc.page_content,
-                    word_count=len(doc.page_content),
-                    tokens=tokens,
-                    enabled=False,
-                    created_by=self._user_id,
-                )
-                if doc.metadata.get("answer"):
-                    segment_document.answer = doc.metadata.pop("answer", "")
-
-                db.session.add(segment_document)
-                db.session.flush()
-                if save_child:
-                    if doc.children:
-                        for position, child in enumerate(doc.children, start=1):
-                            child_segment = ChildChunk(
-                                tenant_id=self._dataset.tenant_id,
-                                dataset_id=self._dataset.id,
-                                document_id=self._document_id,
-                                segment_id=segment_document.id,
-                                position=position,
-                                index_node_id=child.metadata.get("doc_id"),
-                                index_node_hash=child.metadata.get("doc_hash"),
-                                content=child.page_content,
-                                word_count=len(child.page_content),
-                                type="automatic",
-                                created_by=self._user_id,
-                            )
-                            db.session.add(child_segment)
-            else:
+            if segment_document:
                 segment_document.content = doc.page_content
                 if doc.metadata.get("answer"):
                     segment_document.answer = doc.metadata.pop("answer", "")
                 segment_document.index_node_hash = doc.metadata.get("doc_hash")
                 segment_document.word_count = len(doc.page_content)
                 segment_document.tokens = tokens
-                if save_child and doc.children:
-                    # delete the existing child chunks
-                    db.session.query(ChildChunk).where(
-                        ChildChunk.tenant_id == self._dataset.tenant_id,
-                        ChildChunk.dataset_id == self._dataset.id,
-                        ChildChunk.document_id == self._document_id,
-                        ChildChunk.segment_id == segment_document.id,
-                    ).delete()
-                    # add new child chunks
-                    for position, child in enumerate(doc.children, start=1):
-                        child_segment = ChildChunk(
-                            tenant_id=self._dataset.tenant_id,
-                            dataset_id=self._dataset.id,
-                            document_id=self._document_id,
-                            segment_id=segment_document.id,
-                            position=position,
-                            index_node_id=child.metadata.get("doc_id"),
-                            index_node_hash=child.metadata.get("doc_hash"),
-                            content=child.page_content,
-                            word_count=len(child.page_content),
-                            type="automatic",
-                            created_by=self._user_id,
-                        )
-                        db.session.add(child_segment)
-
-            db.session.commit()
+                segment_id = segment_document.id
+            elif doc_id in segment_rows:
+                if not allow_update:
+                    raise ValueError(f"doc_id {doc_id} already exists. Set allow_update to True to overwrite.")
+                # the same doc appears again in this batch, the last one wins like an update would
+                segment_row = segment_rows[doc_id]
+                segment_row.update(
+                    content=doc.page_content,
+                    index_node_hash=doc.metadata["doc_hash"],
+                    word_count=len(doc.page_content),
+                    tokens=tokens,
+                )
+                if doc.metadata.get("answer"):
+                    segment_row["answer"] = doc.metadata.pop("answer", "")
+                segment_id = segment_row["id"]
+            else:
+                max_position += 1
+                segment_id = str(uuid.uuid4())
+                segment_rows[doc_id] = {
+                    "id": segment_id,
+                    "tenant_id": self._dataset.tenant_id,
+                    "dataset_id": self._dataset.id,
+                    "document_id": self._document_id,
+                    "index_node_id": doc_id,
+                    "index_node_hash": doc.metadata["doc_hash"],
+                    "position": max_position,
+                    "content": doc.page_content,
+                    "answer": doc.metadata.pop("answer", "") if doc.metadata.get("answer") else None,
+                    "word_count": len(doc.page_content),
+                    "tokens": tokens,
+                    "hit_count": 0,
+                    "enabled": False,
+                    "created_by": self._user_id,
+                }
+
+            if save_child and doc.children:
+                if segment_document and segment_id not in child_rows:
+                    # only the children of segments that bring new ones are replaced
+                    updated_segment_ids.append(segment_id)
+                child_rows[segment_id] = [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "tenant_id": self._dataset.tenant_id,
+                        "dataset_id": self._dataset.id,
+                        "document_id": self._document_id,
+                        "segment_id": segment_id,
+                        "position": position,
+                        "index_node_id": child.metadata.get("doc_id"),
+                        "index_node_hash": child.metadata.get("doc_hash"),
+                        "content": child.page_content,
+                        "word_count": len(child.page_content),
+                        "type": "automatic",
+                        "created_by": self._user_id,
+                    }
+                    for position, child in enumerate(doc.children, start=1)
+                ]
+
+        if save_child and updated_segment_ids:
+            # delete the existing child chunks
+            for i in range(0, len(updated_segment_ids), SEGMENT_BATCH_SIZE):
+                db.session.query(ChildChunk).where(
+                    ChildChunk.tenant_id == self._dataset.tenant_id,
+                    ChildChunk.dataset_id == self._dataset.id,
+                    ChildChunk.document_id == self._document_id,
+                    ChildChunk.segment_id.in_(updated_segment_ids[i : i + SEGMENT_BATCH_SIZE]),
+                ).delete(synchronize_session=False)
+
+        self._bulk_insert(DocumentSegment, list(segment_rows.values()))
+        self._bulk_insert(ChildChunk, [row for rows in child_rows.values() for row in rows])
+        db.session.commit()
+
+    @staticmethod
+    def _bulk_insert(model: type[DocumentSegment] | type[ChildChunk], rows: list[dict[str, Any]]) -> None:
+        for i in range(0, len(rows), SEGMENT_BATCH_SIZE):
+            db.session.execute(insert(model).values(rows[i : i + SEGMENT_BATCH_SIZE]))
+
+    def _get_document_segments(self, doc_ids: list[str]) -> dict[str, DocumentSegment]:
+        """Segments of the dataset by index node id, looked up in batches."""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        segments: dict[str, DocumentSegment] = {}
+        for i in range(0, len(doc_ids), SEGMENT_BATCH_SIZE):
+            for segment in db.session.scalars(
+                select(DocumentSegment).where(
+                    DocumentSegment.dataset_id == self._dataset.id,
+                    DocumentSegment.index_node_id.in_(doc_ids[i : i + SEGMENT_BATCH_SIZE]),
+                )
+            ):
+                segments.setdefault(segment.index_node_id, segment)
+        return segments
 
     def document_exists(self, doc_id: str) -> bool:
         """Check if document exists."""
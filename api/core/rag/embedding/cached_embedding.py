@@ -1,14 +1,24 @@
 import base64
+import contextvars
 import logging
+import random
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Optional, cast
 
 import numpy as np
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
+from core.model_runtime.errors.invoke import InvokeRateLimitError
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
 from extensions.ext_database import db
@@ -18,6 +28,37 @@ from models.dataset import Embedding
 
 logger = logging.getLogger(__name__)
 
+# In-process LRU tier in front of the `embeddings` table, keyed by (provider, model, text hash).
+# Disabled unless EMBEDDING_CACHE_LRU_SIZE is set.
+_embedding_lru_cache: Optional[LRUCache] = (
+    LRUCache(maxsize=dify_config.EMBEDDING_CACHE_LRU_SIZE) if dify_config.EMBEDDING_CACHE_LRU_SIZE > 0 else None
+)
+_embedding_lru_lock = threading.Lock()
+
+# Concurrent document embedding requests run on one pool per process, and each (tenant, provider, model) has at
+# most EMBEDDING_CONCURRENT_BATCHES of them in flight across all indexing calls of the process.
+_embedding_executor: Optional[ThreadPoolExecutor] = None
+_embedding_semaphores: dict[tuple[str, str, str], threading.BoundedSemaphore] = {}
+_embedding_lock = threading.Lock()
+
+
+def _get_embedding_executor() -> ThreadPoolExecutor:
+    global _embedding_executor
+    with _embedding_lock:
+        if _embedding_executor is None:
+            _embedding_executor = ThreadPoolExecutor(
+                max_workers=dify_config.EMBEDDING_EXECUTOR_WORKERS, thread_name_prefix="embedding"
+            )
+        return _embedding_executor
+
+
+def _get_embedding_semaphore(tenant_id: str, provider: str, model: str) -> threading.BoundedSemaphore:
+    with _embedding_lock:
+        key = (tenant_id, provider, model)
+        if key not in _embedding_semaphores:
+            _embedding_semaphores[key] = threading.BoundedSemaphore(dify_config.EMBEDDING_CONCURRENT_BATCHES)
+        return _embedding_semaphores[key]
+
 
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
@@ -28,18 +69,12 @@ class CacheEmbedding(Embeddings):
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._get_cached_embeddings(text_hashes)
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(text_hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
@@ -55,14 +90,9 @@ class CacheEmbedding(Embeddings):
                     if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties
                     else 1
                 )
-                for i in range(0, len(embedding_queue_texts), max_chunks):
-                    batch_texts = embedding_queue_texts[i : i + max_chunks]
-
-                    embedding_result = self._model_instance.invoke_text_embedding(
-                        texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
-                    )
-
-                    for vector in embedding_result.embeddings:
+                batches = self._build_embedding_batches(embedding_queue_texts, max_chunks)
+                for batch_embeddings in self._embed_batches(batches):
+                    for vector in batch_embeddings:
                         try:
                             # FIXME: type ignore for numpy here
                             normalized_embedding = (vector / np.linalg.norm(vector)).tolist()  # type: ignore
@@ -76,21 +106,12 @@ class CacheEmbedding(Embeddings):
                             db.session.rollback()
                         except Exception:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
+                new_embeddings: dict[str, list[float]] = {}
+                for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
+                    text_embeddings[i] = n_embedding
+                    new_embeddings.setdefault(text_hashes[i], n_embedding)
                 try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
+                    self._store_embeddings(new_embeddings)
                 except IntegrityError:
                     db.session.rollback()
             except Exception as ex:
@@ -100,6 +121,145 @@ class CacheEmbedding(Embeddings):
 
         return text_embeddings
 
+    def _build_embedding_batches(self, texts: list[str], max_chunks: int) -> list[list[str]]:
+        """
+        Split texts into request batches.
+
+        Batches never exceed the model's MAX_CHUNKS. When EMBEDDING_BATCH_MAX_TOKENS is set they are
+        additionally packed by token budget, so short chunks share a request and long ones do not overflow it.
+        """
+        max_tokens = dify_config.EMBEDDING_BATCH_MAX_TOKENS
+        if max_tokens <= 0:
+            return [texts[i : i + max_chunks] for i in range(0, len(texts), max_chunks)]
+
+        batches: list[list[str]] = []
+        current_batch: list[str] = []
+        current_tokens = 0
+        for text, num_tokens in zip(texts, self._model_instance.get_text_embedding_num_tokens(texts)):
+            if current_batch and (len(current_batch) >= max_chunks or current_tokens + num_tokens > max_tokens):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            current_batch.append(text)
+            current_tokens += num_tokens
+        if current_batch:
+            batches.append(current_batch)
+        return batches
+
+    def _embed_batches(self, batches: list[list[str]]) -> list[list[list[float]]]:
+        """
+        Embed batches, output order is preserved.
+
+        With EMBEDDING_CONCURRENT_BATCHES above 1 the batches are sent on the shared embedding pool, and the tenant
+        keeps at most that many requests to the model in flight across all concurrent calls of the process.
+        """
+        if dify_config.EMBEDDING_CONCURRENT_BATCHES <= 1 or len(batches) <= 1:
+            return [self._invoke_embedding_batch(batch_texts) for batch_texts in batches]
+
+        semaphore = _get_embedding_semaphore(
+            self._model_instance.provider_model_bundle.configuration.tenant_id,
+            self._model_instance.provider,
+            self._model_instance.model,
+        )
+        executor = _get_embedding_executor()
+        futures: list[Future[list[list[float]]]] = []
+        try:
+            for batch_texts in batches:
+                # taken here rather than on the pool, so waiting for a slot never holds a pool thread
+                semaphore.acquire()
+                if any(future.done() and future.exception() for future in futures):
+                    # do not keep calling the model once a batch has failed
+                    semaphore.release()
+                    break
+                future = executor.submit(contextvars.copy_context().run, self._invoke_embedding_batch, batch_texts)
+                future.add_done_callback(lambda _: semaphore.release())
+                futures.append(future)
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _invoke_embedding_batch(self, batch_texts: list[str]) -> list[list[float]]:
+        """Invoke the embedding model for one batch, backing off exponentially on rate limit errors."""
+        retries = 0
+        while True:
+            try:
+                embedding_result = self._model_instance.invoke_text_embedding(
+                    texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
+                )
+                return embedding_result.embeddings
+            except InvokeRateLimitError:
+                if retries >= dify_config.EMBEDDING_RATE_LIMIT_MAX_RETRIES:
+                    raise
+            delay = min(2**retries, 30) + random.uniform(0, 1)  # noqa: S311
+            retries += 1
+            logger.warning(
+                "Embedding rate limited by %s, retrying in %.1fs (%s/%s)",
+                self._model_instance.provider,
+                delay,
+                retries,
+                dify_config.EMBEDDING_RATE_LIMIT_MAX_RETRIES,
+            )
+            time.sleep(delay)
+
+    def _get_cached_embeddings(self, text_hashes: Iterable[str]) -> dict[str, list[float]]:
+        """Resolve cached document embeddings for the given hashes, using one `IN` query per batch."""
+        provider_name = self._model_instance.provider
+        model_name = self._model_instance.model
+        cached_embeddings: dict[str, list[float]] = {}
+        missing_hashes = []
+        for hash in dict.fromkeys(text_hashes):
+            if _embedding_lru_cache is not None:
+                with _embedding_lru_lock:
+                    embedding = _embedding_lru_cache.get((provider_name, model_name, hash))
+                if embedding is not None:
+                    cached_embeddings[hash] = embedding
+                    continue
+            missing_hashes.append(hash)
+
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        for i in range(0, len(missing_hashes), batch_size):
+            stmt = select(Embedding.hash, Embedding.embedding).where(
+                Embedding.model_name == model_name,
+                Embedding.provider_name == provider_name,
+                Embedding.hash.in_(missing_hashes[i : i + batch_size]),
+            )
+            for hash, data in db.session.execute(stmt):
+                embedding = Embedding.decode_embedding(data)
+                cached_embeddings[hash] = embedding
+                self._put_lru_cache(hash, embedding)
+        return cached_embeddings
+
+    def _store_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        """Persist new document embeddings with multi-row upserts, ignoring rows another worker already wrote."""
+        if not embeddings:
+            return
+        items = list(embeddings.items())
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        for i in range(0, len(items), batch_size):
+            stmt = insert(Embedding).values(
+                [
+                    {
+                        "model_name": self._model_instance.model,
+                        "hash": hash,
+                        "provider_name": self._model_instance.provider,
+                        "embedding": Embedding.encode_embedding(embedding),
+                    }
+                    for hash, embedding in items[i : i + batch_size]
+                ]
+            )
+            stmt = stmt.on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+            db.session.execute(stmt)
+        db.session.commit()
+        for hash, embedding in items:
+            self._put_lru_cache(hash, embedding)
+
+    def _put_lru_cache(self, hash: str, embedding: list[float]) -> None:
+        if _embedding_lru_cache is None:
+            return
+        with _embedding_lru_lock:
+            _embedding_lru_cache[(self._model_instance.provider, self._model_instance.model, hash)] = embedding
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
@@ -0,0 +1,139 @@
+import json
+import threading
+from collections.abc import Sequence
+from typing import Optional
+
+from cachetools import LRUCache
+from sqlalchemy import select
+
+from configs import dify_config
+from core.rag.datasource.keyword.jieba.jieba import KeywordTableConfig
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client, redis_fallback
+from models.dataset import DocumentSegment
+
+
+class KeywordFeatureCache:
+    """
+    Keyword features of retrieved documents, so reranking does not run Jieba over the same chunks on every query.
+
+    Keywords are resolved in order from:
+    1. the keywords persisted on the document's segment (`DocumentSegment.keywords`)
+    2. an in-process LRU cache keyed by the chunk's `index_node_hash`
+    3. Redis, keyed by the chunk's `index_node_hash`
+    4. Jieba extraction, whose result is written back to both caches
+
+    Extraction keeps the same number of keywords as are stored on segments, so stored and extracted candidates
+    are scored on the same footing.
+    """
+
+    _lru_cache: LRUCache = LRUCache(maxsize=max(dify_config.KEYWORD_FEATURE_CACHE_SIZE, 1))
+    _lru_lock = threading.Lock()
+
+    def __init__(self, keyword_table_handler: Optional[JiebaKeywordTableHandler] = None) -> None:
+        self._keyword_table_handler = keyword_table_handler
+        self._config = KeywordTableConfig()
+
+    def get_documents_keywords(self, documents: Sequence[Document]) -> list[set[str]]:
+        documents_keywords: list[Optional[set[str]]] = [None] * len(documents)
+
+        stored_keywords = self._get_stored_segment_keywords(documents)
+        pending_hashes: dict[str, list[int]] = {}
+        for i, document in enumerate(documents):
+            metadata = document.metadata or {}
+            dataset_id, doc_id = metadata.get("dataset_id"), metadata.get("doc_id")
+            keywords = stored_keywords.get((dataset_id, doc_id)) if dataset_id and doc_id else None
+            if keywords:
+                documents_keywords[i] = keywords
+                continue
+            doc_hash = metadata.get("doc_hash")
+            if not doc_hash:
+                continue
+            keywords = self._get_lru_cache(doc_hash)
+            if keywords is not None:
+                documents_keywords[i] = keywords
+            else:
+                pending_hashes.setdefault(doc_hash, []).append(i)
+
+        cached_keywords = self._get_redis_cache(list(pending_hashes.keys())) or {}
+        new_keywords: dict[str, set[str]] = {}
+        for doc_hash, indices in pending_hashes.items():
+            keywords = cached_keywords.get(doc_hash)
+            if keywords is None:
+                keywords = self._extract_keywords(documents[indices[0]].page_content)
+                new_keywords[doc_hash] = keywords
+            self._set_lru_cache(doc_hash, keywords)
+            for i in indices:
+                documents_keywords[i] = keywords
+        self._set_redis_cache(new_keywords)
+
+        # documents without a content hash, e.g. from external knowledge bases, are always extracted
+        return [
+            keywords if keywords is not None else self._extract_keywords(document.page_content)
+            for document, keywords in zip(documents, documents_keywords)
+        ]
+
+    def _extract_keywords(self, text: str) -> set[str]:
+        if self._keyword_table_handler is None:
+            self._keyword_table_handler = JiebaKeywordTableHandler()
+        return self._keyword_table_handler.extract_keywords(text, self._config.max_keywords_per_chunk)
+
+    @staticmethod
+    def _get_stored_segment_keywords(documents: Sequence[Document]) -> dict[tuple[str, str], set[str]]:
+        dataset_ids = set()
+        index_node_ids = set()
+        for document in documents:
+            if document.metadata and document.metadata.get("dataset_id") and document.metadata.get("doc_id"):
+                dataset_ids.add(document.metadata["dataset_id"])
+                index_node_ids.add(document.metadata["doc_id"])
+        if not index_node_ids:
+            return {}
+
+        stmt = select(DocumentSegment.dataset_id, DocumentSegment.index_node_id, DocumentSegment.keywords).where(
+            DocumentSegment.dataset_id.in_(dataset_ids),
+            DocumentSegment.index_node_id.in_(index_node_ids),
+            DocumentSegment.keywords.is_not(None),
+        )
+        return {
+            (dataset_id, index_node_id): set(keywords)
+            for dataset_id, index_node_id, keywords in db.session.execute(stmt)
+            if keywords
+        }
+
+    @classmethod
+    def _get_lru_cache(cls, doc_hash: str) -> Optional[set[str]]:
+        if dify_config.KEYWORD_FEATURE_CACHE_SIZE <= 0:
+            return None
+        with cls._lru_lock:
+            return cls._lru_cache.get(doc_hash)
+
+    @classmethod
+    def _set_lru_cache(cls, doc_hash: str, keywords: set[str]) -> None:
+        if dify_config.KEYWORD_FEATURE_CACHE_SIZE <= 0:
+            return
+        with cls._lru_lock:
+            cls._lru_cache[doc_hash] = keywords
+
+    @staticmethod
+    @redis_fallback(default_return=None)
+    def _get_redis_cache(doc_hashes: list[str]) -> Optional[dict[str, set[str]]]:
+        if not doc_hashes or dify_config.KEYWORD_FEATURE_CACHE_TTL <= 0:
+            return None
+        values = redis_client.mget([f"keyword_features:{doc_hash}" for doc_hash in doc_hashes])
+        return {doc_hash: set(json.loads(value)) for doc_hash, value in zip(doc_hashes, values) if value}
+
+    @staticmethod
+    @redis_fallback(default_return=None)
+    def _set_redis_cache(keywords_by_hash: dict[str, set[str]]) -> None:
+        if not keywords_by_hash or dify_config.KEYWORD_FEATURE_CACHE_TTL <= 0:
+            return
+        pipeline = redis_client.pipeline(transaction=False)
+        for doc_hash, keywords in keywords_by_hash.items():
+            pipeline.setex(
+                f"keyword_features:{doc_hash}",
+                dify_config.KEYWORD_FEATURE_CACHE_TTL,
+                json.dumps(sorted(keywords), ensure_ascii=False),
+            )
+        pipeline.execute()
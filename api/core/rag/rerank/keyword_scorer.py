@@ -0,0 +1,145 @@
+import math
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from enum import StrEnum
+from typing import cast
+
+import numpy as np
+
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from core.rag.rerank.keyword_feature_cache import KeywordFeatureCache
+
+
+class KeywordScoreMethod(StrEnum):
+    TFIDF_COSINE = "tfidf_cosine"
+    BM25 = "bm25"
+
+
+class KeywordScorer:
+    """
+    Scores candidate documents against a query by their Jieba keywords.
+
+    All candidates are scored at once: keywords are mapped to columns of a sparse (COO) term matrix,
+    and document frequencies, term weights and similarities are computed with NumPy reductions over it
+    instead of per keyword and per document Python loops.
+    """
+
+    # BM25 free parameters, using the common Lucene defaults
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+
+    def __init__(self, method: KeywordScoreMethod = KeywordScoreMethod.TFIDF_COSINE) -> None:
+        self.method = method
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """
+        Resolve keywords of the query and documents and score every document.
+        Document keywords come from `KeywordFeatureCache` and are stored in each document's metadata
+        under "keywords".
+
+        :param query: search query
+        :param documents: candidate documents
+        :return: one score per document, in document order
+        """
+        keyword_table_handler = JiebaKeywordTableHandler()
+        query_keywords = keyword_table_handler.extract_keywords(query, None)
+        documents_keywords = KeywordFeatureCache(keyword_table_handler).get_documents_keywords(documents)
+        for document, document_keywords in zip(documents, documents_keywords):
+            if document.metadata is not None:
+                document.metadata["keywords"] = document_keywords
+
+        return self.score_keywords(query_keywords, documents_keywords)
+
+    def score_keywords(self, query_keywords: Iterable[str], documents_keywords: Sequence[Iterable[str]]) -> list[float]:
+        if not documents_keywords:
+            return []
+        if self.method == KeywordScoreMethod.BM25:
+            scores = self.bm25(query_keywords, documents_keywords)
+        else:
+            scores = self.tfidf_cosine(query_keywords, documents_keywords)
+        return cast(list[float], scores.tolist())
+
+    @staticmethod
+    def _build_term_matrix(
+        documents_keywords: Sequence[Iterable[str]],
+    ) -> tuple[dict[str, int], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Build the document-term matrix in coordinate form.
+
+        :return: vocabulary (keyword -> column), row indices, column indices and term frequencies
+        """
+        vocabulary: dict[str, int] = {}
+        rows: list[int] = []
+        cols: list[int] = []
+        term_frequencies: list[int] = []
+        for row, document_keywords in enumerate(documents_keywords):
+            for keyword, count in Counter(document_keywords).items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(keyword, len(vocabulary)))
+                term_frequencies.append(count)
+        return (
+            vocabulary,
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(cols, dtype=np.int64),
+            np.asarray(term_frequencies, dtype=np.float64),
+        )
+
+    @classmethod
+    def tfidf_cosine(cls, query_keywords: Iterable[str], documents_keywords: Sequence[Iterable[str]]) -> np.ndarray:
+        """Cosine similarity between the TF-IDF vectors of the query and of each document."""
+        total_documents = len(documents_keywords)
+        vocabulary, rows, cols, term_frequencies = cls._build_term_matrix(documents_keywords)
+
+        # smoothed IDF: log((1 + N) / (1 + df)) + 1
+        document_frequencies = np.bincount(cols, minlength=len(vocabulary))
+        idf = np.log((1 + total_documents) / (1 + document_frequencies)) + 1
+
+        # query keywords unseen in the candidates have zero weight
+        query_vector = np.zeros(len(vocabulary))
+        for keyword, count in Counter(query_keywords).items():
+            column = vocabulary.get(keyword)
+            if column is not None:
+                query_vector[column] = count * idf[column]
+
+        document_weights = term_frequencies * idf[cols]
+        dot_products = np.bincount(rows, weights=document_weights * query_vector[cols], minlength=total_documents)
+        document_norms = np.sqrt(np.bincount(rows, weights=document_weights**2, minlength=total_documents))
+        denominators = document_norms * np.linalg.norm(query_vector)
+
+        similarities = np.zeros(total_documents)
+        np.divide(dot_products, denominators, out=similarities, where=denominators > 0)
+        return similarities
+
+    @classmethod
+    def bm25(cls, query_keywords: Iterable[str], documents_keywords: Sequence[Iterable[str]]) -> np.ndarray:
+        """Okapi BM25 over the candidate set, scaled to [0, 1] so it can be weighted against vector scores."""
+        total_documents = len(documents_keywords)
+        vocabulary, rows, cols, term_frequencies = cls._build_term_matrix(documents_keywords)
+
+        query_columns = [vocabulary[keyword] for keyword in set(query_keywords) if keyword in vocabulary]
+        if not query_columns:
+            return np.zeros(total_documents)
+
+        document_frequencies = np.bincount(cols, minlength=len(vocabulary))
+        idf = np.log(1 + (total_documents - document_frequencies + 0.5) / (document_frequencies + 0.5))
+
+        document_lengths = np.bincount(rows, weights=term_frequencies, minlength=total_documents)
+        average_length = document_lengths.mean() or 1.0
+        length_norms = cls.BM25_K1 * (1 - cls.BM25_B + cls.BM25_B * document_lengths / average_length)
+
+        in_query = np.zeros(len(vocabulary), dtype=bool)
+        in_query[query_columns] = True
+        mask = in_query[cols]
+        term_scores = (
+            idf[cols[mask]]
+            * term_frequencies[mask]
+            * (cls.BM25_K1 + 1)
+            / (term_frequencies[mask] + length_norms[rows[mask]])
+        )
+        scores = np.bincount(rows[mask], weights=term_scores, minlength=total_documents)
+
+        max_score = scores.max()
+        if max_score > 0 and not math.isnan(max_score):
+            scores = scores / max_score
+        return scores
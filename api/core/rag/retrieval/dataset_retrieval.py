@@ -1,9 +1,10 @@
+import heapq
 import json
-import math
+import logging
 import re
-import threading
-from collections import Counter, defaultdict
+from collections import defaultdict
 from collections.abc import Generator, Mapping
+from concurrent.futures import Future
 from typing import Any, Optional, Union, cast
 
 from flask import Flask, current_app
@@ -11,6 +12,7 @@ from sqlalchemy import Float, and_, or_, text
 from sqlalchemy import cast as sqlalchemy_cast
 from sqlalchemy.orm import Session
 
+from configs import dify_config
 from core.app.app_config.entities import (
     DatasetEntity,
     DatasetRetrieveConfigEntity,
@@ -34,13 +36,15 @@ from core.prompt.advanced_prompt_transform import AdvancedPromptTransform
 from core.prompt.entities.advanced_prompt_entities import ChatModelMessage, CompletionModelPromptTemplate
 from core.prompt.simple_prompt_transform import ModelMode
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.retrieval_executor import get_dataset_executor
 from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.entities.citation_metadata import RetrievalSourceMetadata
 from core.rag.entities.context_entities import DocumentContext
 from core.rag.entities.metadata_entities import Condition, MetadataCondition
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
+from core.rag.rerank.keyword_scorer import KeywordScoreMethod, KeywordScorer
 from core.rag.rerank.rerank_type import RerankMode
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from core.rag.retrieval.router.multi_dataset_function_call_router import FunctionCallMultiDatasetRouter
@@ -61,6 +65,8 @@ from models.dataset import ChildChunk, Dataset, DatasetMetadata, DatasetQuery, D
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -421,8 +427,8 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
-        all_documents: list[Document] = []
+        # every dataset collects into its own list, so datasets that miss the timeout are dropped as a whole
+        branches: list[tuple[str, Future, list[Document]]] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
             item.indexing_technique == available_datasets[0].indexing_technique for item in available_datasets
@@ -455,6 +461,7 @@ class DatasetRetrieval:
                     ].embedding_model_provider
                     weights["vector_setting"]["embedding_model_name"] = available_datasets[0].embedding_model
 
+        query_vectors = self._embed_query_for_datasets(tenant_id, available_datasets, query)
         for dataset in available_datasets:
             index_type = dataset.indexing_technique
             document_ids_filter = None
@@ -467,22 +474,33 @@ class DatasetRetrieval:
                         document_ids_filter = document_ids
                     else:
                         continue
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset.id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                    "document_ids_filter": document_ids_filter,
-                    "metadata_condition": metadata_condition,
-                },
+            dataset_documents: list[Document] = []
+            future = get_dataset_executor().submit(
+                tenant_id,
+                self._retriever,
+                flask_app=current_app._get_current_object(),  # type: ignore
+                dataset_id=dataset.id,
+                query=query,
+                top_k=top_k,
+                all_documents=dataset_documents,
+                document_ids_filter=document_ids_filter,
+                metadata_condition=metadata_condition,
+                query_vector=query_vectors.get((dataset.embedding_model_provider, dataset.embedding_model)),
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            branches.append((dataset.id, future, dataset_documents))
+        done, _ = get_dataset_executor().wait(
+            [future for _, future, _ in branches], timeout=dify_config.RETRIEVAL_DATASET_TIMEOUT
+        )
+        all_documents: list[Document] = []
+        for dataset_id, future, dataset_documents in branches:
+            if future in done:
+                all_documents.extend(dataset_documents)
+            else:
+                logger.warning(
+                    "Dataset %s was dropped from the retrieval after %ss",
+                    dataset_id,
+                    dify_config.RETRIEVAL_DATASET_TIMEOUT,
+                )
 
         with measure_time() as timer:
             if reranking_enable:
@@ -588,6 +606,40 @@ class DatasetRetrieval:
             db.session.add_all(dataset_queries)
         db.session.commit()
 
+    def _embed_query_for_datasets(
+        self, tenant_id: str, datasets: list[Dataset], query: str
+    ) -> dict[tuple[str, str], list[float]]:
+        """
+        Embed the query once per embedding model shared by several semantically searched datasets.
+
+        :return: query embedding by (embedding model provider, embedding model); datasets with a model of
+            their own are left out and embed the query in their own retrieval task
+        """
+        datasets_by_model: dict[tuple[str, str], int] = defaultdict(int)
+        for dataset in datasets:
+            if dataset.provider == "external" or dataset.indexing_technique != "high_quality":
+                continue
+            retrieval_model = dataset.retrieval_model or default_retrieval_model
+            if not RetrievalMethod.is_support_semantic_search(retrieval_model["search_method"]):
+                continue
+            if dataset.embedding_model_provider and dataset.embedding_model:
+                datasets_by_model[(dataset.embedding_model_provider, dataset.embedding_model)] += 1
+
+        query_vectors: dict[tuple[str, str], list[float]] = {}
+        model_manager = ModelManager()
+        for (provider, model), dataset_count in datasets_by_model.items():
+            if dataset_count < 2:
+                continue
+            try:
+                embedding_model = model_manager.get_model_instance(
+                    tenant_id=tenant_id, provider=provider, model_type=ModelType.TEXT_EMBEDDING, model=model
+                )
+                query_vectors[(provider, model)] = CacheEmbedding(embedding_model).embed_query(query)
+            except Exception:
+                # every dataset embeds the query itself again and reports the error there
+                logger.warning("Failed to embed query with %s/%s", provider, model, exc_info=True)
+        return query_vectors
+
     def _retriever(
         self,
         flask_app: Flask,
@@ -597,6 +649,7 @@ class DatasetRetrieval:
         all_documents: list,
         document_ids_filter: Optional[list[str]] = None,
         metadata_condition: Optional[MetadataCondition] = None,
+        query_vector: Optional[list[float]] = None,
     ):
         with flask_app.app_context():
             with Session(db.engine) as session:
@@ -657,6 +710,7 @@ class DatasetRetrieval:
                             reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
                             weights=retrieval_model.get("weights", None),
                             document_ids_filter=document_ids_filter,
+                            query_vector=query_vector,
                         )
 
                         all_documents.extend(documents)
@@ -765,69 +819,7 @@ class DatasetRetrieval:
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            if document.metadata is not None:
-                # get the document keywords
-                document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
+        similarities = KeywordScorer(KeywordScoreMethod(dify_config.KEYWORD_SCORE_METHOD)).score(query, documents)
 
         for document, score in zip(documents, similarities):
             # format document
@@ -846,10 +838,11 @@ class DatasetRetrieval:
 
         if not filter_documents:
             return []
-        filter_documents = sorted(
-            filter_documents, key=lambda x: x.metadata.get("score", 0) if x.metadata else 0, reverse=True
-        )
-        return filter_documents[:top_k] if top_k else filter_documents
+        if top_k:
+            return heapq.nlargest(
+                top_k, filter_documents, key=lambda x: x.metadata.get("score", 0) if x.metadata else 0
+            )
+        return sorted(filter_documents, key=lambda x: x.metadata.get("score", 0) if x.metadata else 0, reverse=True)
 
     def get_metadata_filter_condition(
         self,
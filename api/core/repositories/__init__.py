@@ -7,9 +7,11 @@ defined in the core.workflow.repository package.
 
 from core.repositories.factory import DifyCoreRepositoryFactory, RepositoryImportError
 from core.repositories.sqlalchemy_workflow_node_execution_repository import SQLAlchemyWorkflowNodeExecutionRepository
+from core.repositories.write_behind_workflow_node_execution_repository import WriteBehindWorkflowNodeExecutionRepository
 
 __all__ = [
     "DifyCoreRepositoryFactory",
     "RepositoryImportError",
     "SQLAlchemyWorkflowNodeExecutionRepository",
+    "WriteBehindWorkflowNodeExecutionRepository",
 ]
@@ -0,0 +1,216 @@
+"""
+Write-behind implementation of the WorkflowNodeExecutionRepository.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections.abc import Sequence
+from typing import Optional, Union
+
+from opentelemetry.metrics import get_meter
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from configs import dify_config
+from core.repositories.sqlalchemy_workflow_node_execution_repository import SQLAlchemyWorkflowNodeExecutionRepository
+from core.workflow.entities.workflow_node_execution import WorkflowNodeExecution
+from core.workflow.repositories.workflow_node_execution_repository import OrderConfig
+from models import Account, EndUser, WorkflowNodeExecutionModel, WorkflowNodeExecutionTriggeredFrom
+
+logger = logging.getLogger(__name__)
+
+# Upper bound in seconds of the delay between background retries of a repository that fails to write.
+MAX_RETRY_DELAY = 60
+
+_meter = get_meter("workflow_node_execution_repository")
+_dropped_counter = _meter.create_counter(
+    "workflow.node_execution.dropped",
+    description="Node executions dropped after the background writer failed to write them",
+    unit="{execution}",
+)
+
+
+class WriteBehindWorkflowNodeExecutionRepository(SQLAlchemyWorkflowNodeExecutionRepository):
+    """
+    WorkflowNodeExecutionRepository that persists the node executions of workflow runs in the background.
+
+    `save` converts and buffers the execution instead of committing it on the caller's thread. A background
+    writer upserts the buffered executions in one transaction per batch, every
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL seconds or as soon as WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE
+    executions are pending. Only the latest state of an execution is buffered and the batches of a repository
+    are written one at a time, so the stored state of an execution always follows the order of its saves.
+
+    `flush` persists everything saved so far, the workflow cycle manager calls it when the run completes and
+    reads flush first. Single-step executions are written synchronously since they are read back right away.
+
+    A failed background write is retried with an exponential backoff, after
+    WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS failed attempts the buffered executions are dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker | Engine,
+        user: Union[Account, EndUser],
+        app_id: Optional[str],
+        triggered_from: Optional[WorkflowNodeExecutionTriggeredFrom],
+    ):
+        super().__init__(session_factory=session_factory, user=user, app_id=app_id, triggered_from=triggered_from)
+        # Key: execution id, Value: latest unsaved state of the execution
+        self._pending: dict[str, WorkflowNodeExecutionModel] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def save(self, execution: WorkflowNodeExecution) -> None:
+        """
+        Buffer a NodeExecution to be saved by the background writer.
+
+        Args:
+            execution: The NodeExecution domain entity to persist
+        """
+        if self._triggered_from != WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN:
+            super().save(execution)
+            return
+
+        # convert now, the execution keeps changing after it is saved
+        db_model = self.to_db_model(execution)
+        with self._pending_lock:
+            self._pending[db_model.id] = db_model
+            pending_count = len(self._pending)
+
+        if db_model.node_execution_id:
+            self._node_execution_cache[db_model.node_execution_id] = db_model
+
+        _writer.schedule(self, urgent=pending_count >= dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE)
+
+    def flush(self) -> None:
+        """
+        Persist every NodeExecution saved so far.
+
+        Raises:
+            Exception: If the executions cannot be written, they stay buffered for the next flush.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            if not batch:
+                return
+
+            try:
+                self._write_batch(batch)
+            except Exception:
+                with self._pending_lock:
+                    # keep newer states saved while the batch was written
+                    for db_model in batch:
+                        self._pending.setdefault(db_model.id, db_model)
+                raise
+
+    def discard_pending(self) -> int:
+        """Drop the buffered NodeExecutions, return how many were dropped."""
+        with self._pending_lock:
+            dropped = len(self._pending)
+            self._pending.clear()
+        return dropped
+
+    def _write_batch(self, batch: Sequence[WorkflowNodeExecutionModel]) -> None:
+        with self._session_factory() as session:
+            # load the stored executions in one query, so merge does not select them one by one
+            session.scalars(
+                select(WorkflowNodeExecutionModel).where(
+                    WorkflowNodeExecutionModel.id.in_([db_model.id for db_model in batch])
+                )
+            ).all()
+            for db_model in batch:
+                session.merge(db_model)
+            session.commit()
+
+    def get_db_models_by_workflow_run(
+        self,
+        workflow_run_id: str,
+        order_config: Optional[OrderConfig] = None,
+    ) -> Sequence[WorkflowNodeExecutionModel]:
+        self.flush()
+        return super().get_db_models_by_workflow_run(workflow_run_id, order_config)
+
+
+class _NodeExecutionWriter:
+    """Background thread flushing the repositories with buffered node executions."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        # repositories to flush, in the order they were scheduled
+        self._repositories: dict[WriteBehindWorkflowNodeExecutionRepository, None] = {}
+        # Key: repository whose last write failed, Value: failed attempts and when to retry it
+        self._retries: dict[WriteBehindWorkflowNodeExecutionRepository, tuple[int, float]] = {}
+        self._urgent = False
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, repository: WriteBehindWorkflowNodeExecutionRepository, urgent: bool = False) -> None:
+        with self._condition:
+            self._repositories[repository] = None
+            # the thread of a parent process does not exist in a forked worker
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="node-execution-writer", daemon=True)
+                self._thread.start()
+            if urgent:
+                self._urgent = True
+                self._condition.notify()
+
+    def flush_all(self) -> None:
+        with self._condition:
+            repositories = list(self._repositories)
+            self._repositories.clear()
+        for repository in repositories:
+            try:
+                repository.flush()
+            except Exception:
+                logger.exception("Failed to write node executions")
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._urgent:
+                    self._condition.wait(dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL)
+                self._urgent = False
+            self._flush_scheduled()
+
+    def _flush_scheduled(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            # repositories backing off stay scheduled until their retry is due
+            repositories = [
+                repository
+                for repository in self._repositories
+                if repository not in self._retries or self._retries[repository][1] <= now
+            ]
+            for repository in repositories:
+                del self._repositories[repository]
+
+        for repository in repositories:
+            try:
+                repository.flush()
+            except Exception:
+                with self._condition:
+                    attempts = self._retries.pop(repository, (0, 0.0))[0] + 1
+                    delay = min(dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL * 2**attempts, MAX_RETRY_DELAY)
+                    retry = attempts < dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS
+                    if retry:
+                        self._retries[repository] = (attempts, time.monotonic() + delay)
+                        self._repositories[repository] = None
+                if retry:
+                    logger.exception("Failed to write node executions in the background, retrying in %.1fs", delay)
+                    continue
+                dropped = repository.discard_pending()
+                _dropped_counter.add(dropped)
+                logger.exception("Failed to write node executions %s times, dropped %s of them", attempts, dropped)
+            else:
+                with self._condition:
+                    # keep no reference to a repository whose executions are all written
+                    self._retries.pop(repository, None)
+
+
+_writer = _NodeExecutionWriter()
+atexit.register(_writer.flush_all)
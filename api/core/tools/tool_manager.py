@@ -12,8 +12,10 @@ from pydantic import TypeAdapter
 from yarl import URL
 
 import contexts
+from core.helper.plugin_declaration_cache import PluginDeclarationCache, PluginDeclarationCacheType
 from core.helper.provider_cache import ToolProviderCredentialsCache
 from core.plugin.entities.plugin import ToolProviderID
+from core.plugin.entities.plugin_daemon import PluginToolProviderEntity
 from core.plugin.impl.oauth import OAuthHandler
 from core.plugin.impl.tool import PluginToolManager
 from core.tools.__base.tool_provider import ToolProviderController
@@ -132,10 +134,16 @@ class ToolManager:
             if provider in plugin_tool_providers:
                 return plugin_tool_providers[provider]
 
-            manager = PluginToolManager()
-            provider_entity = manager.fetch_tool_provider(tenant_id, provider)
-            if not provider_entity:
-                raise ToolProviderNotFoundError(f"plugin provider {provider} not found")
+            declaration_cache = PluginDeclarationCache(
+                tenant_id, PluginDeclarationCacheType.TOOL_PROVIDER, provider, PluginToolProviderEntity
+            )
+            provider_entity = declaration_cache.get()
+            if provider_entity is None:
+                manager = PluginToolManager()
+                provider_entity = manager.fetch_tool_provider(tenant_id, provider)
+                if not provider_entity:
+                    raise ToolProviderNotFoundError(f"plugin provider {provider} not found")
+                declaration_cache.set(provider_entity)
 
             controller = PluginToolProviderController(
                 entity=provider_entity.declaration,
@@ -1,12 +1,15 @@
-import threading
+import logging
+from concurrent.futures import Future
 from typing import Any
 
 from flask import Flask, current_app
 from pydantic import BaseModel, Field
 
+from configs import dify_config
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
+from core.rag.datasource.retrieval_executor import get_dataset_executor
 from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.entities.citation_metadata import RetrievalSourceMetadata
 from core.rag.models.document import Document as RagDocument
@@ -16,6 +19,8 @@ from core.tools.utils.dataset_retriever.dataset_retriever_base_tool import Datas
 from extensions.ext_database import db
 from models.dataset import Dataset, Document, DocumentSegment
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -46,23 +51,33 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
         )
 
     def _run(self, query: str) -> str:
-        threads = []
-        all_documents: list[RagDocument] = []
+        # every dataset collects into its own list, so datasets that miss the timeout are dropped as a whole
+        branches: list[tuple[str, Future, list[RagDocument]]] = []
         for dataset_id in self.dataset_ids:
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "all_documents": all_documents,
-                    "hit_callbacks": self.hit_callbacks,
-                },
+            dataset_documents: list[RagDocument] = []
+            future = get_dataset_executor().submit(
+                self.tenant_id,
+                self._retriever,
+                flask_app=current_app._get_current_object(),  # type: ignore
+                dataset_id=dataset_id,
+                query=query,
+                all_documents=dataset_documents,
+                hit_callbacks=self.hit_callbacks,
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            branches.append((dataset_id, future, dataset_documents))
+        done, _ = get_dataset_executor().wait(
+            [future for _, future, _ in branches], timeout=dify_config.RETRIEVAL_DATASET_TIMEOUT
+        )
+        all_documents: list[RagDocument] = []
+        for dataset_id, future, dataset_documents in branches:
+            if future in done:
+                all_documents.extend(dataset_documents)
+            else:
+                logger.warning(
+                    "Dataset %s was dropped from the retrieval after %ss",
+                    dataset_id,
+                    dify_config.RETRIEVAL_DATASET_TIMEOUT,
+                )
         # do rerank for searched documents
         model_manager = ModelManager()
         rerank_model_instance = model_manager.get_model_instance(
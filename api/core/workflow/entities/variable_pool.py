@@ -1,9 +1,9 @@
 import re
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Annotated, Any, Union, cast
+from typing import Annotated, Any, Optional, Union, cast
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
@@ -46,6 +46,12 @@ class VariablePool(BaseModel):
         default_factory=list,
     )
 
+    # Set on child pools created by `create_child`. A child reads through to its parent and only stores its own
+    # writes, the removals of parent variables are recorded so they stay hidden without touching the parent.
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed_selectors: set[tuple[str, int]] = PrivateAttr(default_factory=set)
+    _removed_nodes: set[str] = PrivateAttr(default_factory=set)
+
     def model_post_init(self, context: Any, /) -> None:
         # Create a mapping from field names to SystemVariableKey enum values
         self._add_system_variables(self.system_variables)
@@ -88,6 +94,7 @@ class VariablePool(BaseModel):
         # Based on the definition of `VariableUnion`,
         # `list[Variable]` can be safely used as `list[VariableUnion]` since they are compatible.
         self.variable_dictionary[key][hash_key] = cast(VariableUnion, variable)
+        self._removed_selectors.discard((key, hash_key))
 
     @classmethod
     def _selector_to_keys(cls, selector: Sequence[str]) -> tuple[str, int]:
@@ -95,11 +102,19 @@ class VariablePool(BaseModel):
 
     def _has(self, selector: Sequence[str]) -> bool:
         key, hash_key = self._selector_to_keys(selector)
-        if key not in self.variable_dictionary:
-            return False
-        if hash_key not in self.variable_dictionary[key]:
-            return False
-        return True
+        return self._lookup(key, hash_key) is not None
+
+    def _lookup(self, key: str, hash_key: int) -> VariableUnion | None:
+        pool: VariablePool | None = self
+        while pool is not None:
+            # do not use `pool.variable_dictionary[key]`, it would insert the key into a parent shared by other threads
+            variables = pool.variable_dictionary.get(key)
+            if variables is not None and hash_key in variables:
+                return variables[hash_key]
+            if key in pool._removed_nodes or (key, hash_key) in pool._removed_selectors:
+                return None
+            pool = pool._parent
+        return None
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -118,7 +133,7 @@ class VariablePool(BaseModel):
             return None
 
         key, hash_key = self._selector_to_keys(selector)
-        value: Segment | None = self.variable_dictionary[key].get(hash_key)
+        value: Segment | None = self._lookup(key, hash_key)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -150,9 +165,53 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_nodes.add(selector[0])
             return
         key, hash_key = self._selector_to_keys(selector)
-        self.variable_dictionary[key].pop(hash_key, None)
+        self._remove_key(key, hash_key)
+
+    def _remove_key(self, key: str, hash_key: int) -> None:
+        variables = self.variable_dictionary.get(key)
+        if variables is not None:
+            variables.pop(hash_key, None)
+        if self._parent is not None:
+            self._removed_selectors.add((key, hash_key))
+
+    def create_child(self) -> "VariablePool":
+        """
+        Create a copy-on-write child of this pool.
+
+        The child sees every variable of this pool without copying it and keeps its own additions and removals
+        to itself, so runs that must not affect each other (e.g. parallel iterations) can share the upstream
+        variables. This pool must not be changed for the selectors a child reads while the child is in use.
+        Use `merge` to apply the changes of a child back to this pool.
+        """
+        # `model_copy` does not run `model_post_init`, the system, environment and conversation variables are
+        # read from this pool instead of being added again
+        child = self.model_copy(update={"variable_dictionary": defaultdict(dict)})
+        child._parent = self
+        child._removed_selectors = set()
+        child._removed_nodes = set()
+        return child
+
+    def merge(self, child: "VariablePool", /) -> None:
+        """
+        Apply the additions and removals of a child created by `create_child` to this pool.
+
+        Raises:
+            ValueError: If the pool is not a child of this pool.
+        """
+        if child._parent is not self:
+            raise ValueError("Only a child of this variable pool can be merged")
+        for key in child._removed_nodes:
+            self.remove([key])
+        for key, hash_key in child._removed_selectors:
+            self._remove_key(key, hash_key)
+        for key, variables in child.variable_dictionary.items():
+            for hash_key, variable in variables.items():
+                self.variable_dictionary[key][hash_key] = variable
+                self._removed_selectors.discard((key, hash_key))
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
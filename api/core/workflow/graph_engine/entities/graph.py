@@ -1,8 +1,10 @@
+import threading
 import uuid
 from collections import defaultdict
 from collections.abc import Mapping
 from typing import Any, Optional, cast
 
+from cachetools import LRUCache
 from pydantic import BaseModel, Field
 
 from configs import dify_config
@@ -12,6 +14,13 @@ from core.workflow.nodes.answer.answer_stream_generate_router import AnswerStrea
 from core.workflow.nodes.answer.entities import AnswerStreamGenerateRoute
 from core.workflow.nodes.end.end_stream_generate_router import EndStreamGeneratorRouter
 from core.workflow.nodes.end.entities import EndStreamParam
+from core.workflow.utils.graph_config import FrozenDict
+
+# Graphs initialized from frozen graph configs by (graph config id, root node id), with their graph config.
+_graph_cache: Optional[LRUCache] = (
+    LRUCache(maxsize=dify_config.WORKFLOW_GRAPH_CACHE_SIZE) if dify_config.WORKFLOW_GRAPH_CACHE_SIZE > 0 else None
+)
+_graph_cache_lock = threading.Lock()
 
 
 class GraphEdge(BaseModel):
@@ -58,10 +67,29 @@ class Graph(BaseModel):
         """
         Init graph
 
+        Graphs of a frozen graph config, as returned by `Workflow.graph_dict`, are initialized once and cached.
+        Every call gets its own deep copy of the cached graph, since running a graph modifies it.
+
         :param graph_config: graph config
         :param root_node_id: root node id
         :return: graph
         """
+        if _graph_cache is None or not isinstance(graph_config, FrozenDict):
+            return cls._init(graph_config, root_node_id)
+
+        cache_key = (id(graph_config), root_node_id)
+        with _graph_cache_lock:
+            cached = _graph_cache.get(cache_key)
+        # the cached entry keeps its graph config alive, so no other graph config can have the same id meanwhile
+        if cached is None or cached[0] is not graph_config:
+            cached = (graph_config, cls._init(graph_config, root_node_id))
+            with _graph_cache_lock:
+                _graph_cache[cache_key] = cached
+
+        return cached[1].model_copy(deep=True)
+
+    @classmethod
+    def _init(cls, graph_config: Mapping[str, Any], root_node_id: Optional[str]) -> "Graph":
         # edge configs
         edge_configs = graph_config.get("edges")
         if edge_configs is None:
@@ -4,8 +4,8 @@ import queue
 import time
 import uuid
 from collections.abc import Generator, Mapping
-from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from concurrent.futures import Future, wait
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -42,6 +42,7 @@ from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.graph_engine.workflow_scheduler import get_workflow_scheduler
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.agent.agent_node import AgentNode
 from core.workflow.nodes.agent.entities import AgentNodeData
@@ -59,24 +60,29 @@ from models.workflow import WorkflowType
 logger = logging.getLogger(__name__)
 
 
-class GraphEngineThreadPool(ThreadPoolExecutor):
+class GraphEngineThreadPool:
+    """
+    Parallel node executions of a workflow run or parallel iteration.
+
+    Tasks run on the process-wide workflow scheduler, at most `max_workers` of them at a time, and at most
+    `max_submit_count` of them may be submitted and not finished.
+    """
+
     def __init__(
         self,
-        max_workers=None,
-        thread_name_prefix="",
-        initializer=None,
-        initargs=(),
-        max_submit_count=dify_config.MAX_SUBMIT_COUNT,
+        tenant_id: str,
+        max_workers: int,
+        max_submit_count: int = dify_config.MAX_SUBMIT_COUNT,
     ) -> None:
-        super().__init__(max_workers, thread_name_prefix, initializer, initargs)
+        self.task_group = get_workflow_scheduler().create_group(tenant_id, max_workers)
         self.max_submit_count = max_submit_count
         self.submit_count = 0
 
-    def submit(self, fn, /, *args, **kwargs):
+    def submit(self, fn, /, *args, **kwargs) -> Future:
         self.submit_count += 1
         self.check_is_full()
 
-        return super().submit(fn, *args, **kwargs)
+        return self.task_group.submit(fn, *args, **kwargs)
 
     def task_done_callback(self, future):
         self.submit_count -= 1
@@ -107,7 +113,7 @@ class GraphEngine:
         thread_pool_id: Optional[str] = None,
     ) -> None:
         thread_pool_max_submit_count = dify_config.MAX_SUBMIT_COUNT
-        thread_pool_max_workers = 10
+        thread_pool_max_workers = dify_config.WORKFLOW_SCHEDULER_RUN_MAX_WORKERS
 
         # init thread pool
         if thread_pool_id:
@@ -119,7 +125,7 @@ class GraphEngine:
             self.is_main_thread_pool = False
         else:
             self.thread_pool = GraphEngineThreadPool(
-                max_workers=thread_pool_max_workers, max_submit_count=thread_pool_max_submit_count
+                tenant_id=tenant_id, max_workers=thread_pool_max_workers, max_submit_count=thread_pool_max_submit_count
             )
             self.thread_pool_id = str(uuid.uuid4())
             self.is_main_thread_pool = True
@@ -882,7 +888,8 @@ class GraphEngine:
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        # the copy reads the upstream variables through and only stores its own writes
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.create_child()
         new_instance.graph_runtime_state.total_tokens = 0
         return new_instance
 
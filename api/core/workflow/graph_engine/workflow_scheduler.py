@@ -0,0 +1,286 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
+
+from configs import dify_config
+
+# Seconds an idle worker waits for a task before it exits.
+WORKER_IDLE_TIMEOUT = 60
+
+_meter = get_meter("workflow_scheduler")
+_queue_wait_histogram = _meter.create_histogram(
+    "workflow.scheduler.queue_wait",
+    description="Time parallel workflow node executions spend queued before a worker picks them up",
+    unit="s",
+)
+
+
+@dataclass
+class _WorkflowTask:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
+    group: "WorkflowTaskGroup"
+    nested: bool
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class WorkflowTaskGroup:
+    """
+    Tasks of one workflow run or parallel iteration, of which at most `max_workers` run at a time.
+    """
+
+    def __init__(self, scheduler: "WorkflowScheduler", tenant_id: str, max_workers: int) -> None:
+        self.tenant_id = tenant_id
+        self.max_workers = max(max_workers, 1)
+        self.running = 0
+        self._scheduler = scheduler
+        # tasks submitted by running tasks are taken first, their submitters are waiting for them
+        self._nested_tasks: deque[_WorkflowTask] = deque()
+        self._tasks: deque[_WorkflowTask] = deque()
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return self._scheduler._submit(self, fn, args, kwargs)
+
+    def cancel_pending(self) -> int:
+        """Cancel the tasks that have not started, return how many were cancelled."""
+        return self._scheduler._cancel_pending(self)
+
+    @property
+    def pending(self) -> int:
+        return len(self._nested_tasks) + len(self._tasks)
+
+
+class WorkflowScheduler:
+    """
+    Process-wide scheduler running the parallel branches and iteration items of all workflow runs.
+
+    Every workflow run and parallel iteration submits to its own task group, and workers take tasks
+    round-robin across groups so a run with many parallel branches cannot starve the others. A group never
+    runs more than its own limit, a tenant never more than `tenant_max_workers` and the process never more
+    than `max_workers` tasks submitted by the threads running the workflows.
+
+    Tasks submitted by a task that is already running on the scheduler (nested parallel branches, iteration
+    items and their branches) are not held back for the tenant or process limit: the submitting task blocks
+    until they finish, so queueing them behind it could deadlock once every worker waits on its children.
+    Instead at most `nested_max_tasks` of them may be queued or running in the process, submitting more
+    raises an error, so the scheduler never runs more than `max_workers + nested_max_tasks` threads.
+    """
+
+    def __init__(self, max_workers: int, tenant_max_workers: int, nested_max_tasks: int) -> None:
+        self.max_workers = max(max_workers, 1)
+        self.tenant_max_workers = max(tenant_max_workers, 1)
+        self.nested_max_tasks = max(nested_max_tasks, 1)
+        self._condition = threading.Condition()
+        # groups with pending tasks, in the order they are served
+        self._ready_groups: OrderedDict[WorkflowTaskGroup, None] = OrderedDict()
+        self._running = 0
+        self._nested_running = 0
+        # nested tasks queued or running
+        self._nested_in_flight = 0
+        self._tenant_running: dict[str, int] = {}
+        self._workers = 0
+        self._idle_workers = 0
+        # wakeups handed to idle workers that no waiting worker has taken yet
+        self._wakeups = 0
+        self._local = threading.local()
+
+    def create_group(self, tenant_id: str, max_workers: int) -> WorkflowTaskGroup:
+        return WorkflowTaskGroup(self, tenant_id, max_workers)
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "workers": self._workers,
+                "running_tasks": self._running,
+                "nested_running_tasks": self._nested_running,
+                "queue_depth": sum(len(group._tasks) for group in self._ready_groups),
+                "nested_queue_depth": sum(len(group._nested_tasks) for group in self._ready_groups),
+                "queued_groups": len(self._ready_groups),
+            }
+
+    def _submit(self, group: WorkflowTaskGroup, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Future:
+        future: Future = Future()
+        nested = getattr(self._local, "in_task", False)
+        task = _WorkflowTask(fn, args, kwargs, future, group, nested)
+        with self._condition:
+            if nested:
+                if self._nested_in_flight >= self.nested_max_tasks:
+                    raise ValueError(f"Max nested task count {self.nested_max_tasks} of workflow scheduler reached.")
+                self._nested_in_flight += 1
+            (group._nested_tasks if nested else group._tasks).append(task)
+            self._ready_groups[group] = None
+            # otherwise a running task of the same group or tenant picks it up once it finishes
+            if self._is_runnable(task):
+                self._start_worker()
+        return future
+
+    def _cancel_pending(self, group: WorkflowTaskGroup) -> int:
+        with self._condition:
+            tasks = [*group._nested_tasks, *group._tasks]
+            self._nested_in_flight -= len(group._nested_tasks)
+            group._nested_tasks.clear()
+            group._tasks.clear()
+            self._ready_groups.pop(group, None)
+        return sum(1 for task in tasks if task.future.cancel())
+
+    def _is_runnable(self, task: _WorkflowTask) -> bool:
+        group = task.group
+        if group.running >= group.max_workers:
+            return False
+        if task.nested:
+            return True
+        return (
+            self._running < self.max_workers and self._tenant_running.get(group.tenant_id, 0) < self.tenant_max_workers
+        )
+
+    def _next_task(self) -> Optional[_WorkflowTask]:
+        task = self._find_runnable_task()
+        if task is None:
+            return None
+        group = task.group
+        (group._nested_tasks if task.nested else group._tasks).popleft()
+        # move the group to the back of the line
+        del self._ready_groups[group]
+        if group.pending:
+            self._ready_groups[group] = None
+        self._acquire(task)
+        return task
+
+    def _find_runnable_task(self) -> Optional[_WorkflowTask]:
+        for group in self._ready_groups:
+            for tasks in (group._nested_tasks, group._tasks):
+                if tasks and self._is_runnable(tasks[0]):
+                    return tasks[0]
+        return None
+
+    def _start_worker(self) -> None:
+        """Wake an idle worker or start a new one, must be called with the condition held."""
+        if self._idle_workers > 0:
+            # the woken worker is no longer idle, so the next call wakes or starts another one
+            self._idle_workers -= 1
+            self._wakeups += 1
+            self._condition.notify()
+            return
+        self._workers += 1
+        threading.Thread(target=self._work, name=f"workflow-scheduler-{self._workers}", daemon=True).start()
+
+    def _acquire(self, task: _WorkflowTask) -> None:
+        task.group.running += 1
+        if task.nested:
+            self._nested_running += 1
+        else:
+            self._running += 1
+            self._tenant_running[task.group.tenant_id] = self._tenant_running.get(task.group.tenant_id, 0) + 1
+
+    def _release(self, task: _WorkflowTask) -> None:
+        task.group.running -= 1
+        if task.nested:
+            self._nested_running -= 1
+            self._nested_in_flight -= 1
+            return
+        self._running -= 1
+        tenant_running = self._tenant_running[task.group.tenant_id] - 1
+        if tenant_running:
+            self._tenant_running[task.group.tenant_id] = tenant_running
+        else:
+            del self._tenant_running[task.group.tenant_id]
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    self._idle_workers += 1
+                    notified = self._condition.wait(WORKER_IDLE_TIMEOUT)
+                    if self._wakeups:
+                        # take a wakeup handed out by _start_worker, it already took one worker off the idle
+                        # count, even if the notified worker is another one or this wait timed out meanwhile
+                        self._wakeups -= 1
+                    else:
+                        self._idle_workers -= 1
+                        if not notified:
+                            task = self._next_task()
+                            if task is None:
+                                self._workers -= 1
+                                return
+                            break
+                    task = self._next_task()
+                # slots released meanwhile may have made more tasks runnable than there are workers taking them
+                if self._find_runnable_task() is not None:
+                    self._start_worker()
+
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    _queue_wait_histogram.record(time.perf_counter() - task.enqueued_at, {"nested": task.nested})
+                    self._run(task)
+            finally:
+                with self._condition:
+                    self._release(task)
+
+    def _run(self, task: _WorkflowTask) -> None:
+        self._local.in_task = True
+        try:
+            task.future.set_result(task.fn(*task.args, **task.kwargs))
+        except BaseException as e:
+            task.future.set_exception(e)
+        finally:
+            self._local.in_task = False
+
+
+_scheduler: Optional[WorkflowScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_workflow_scheduler() -> WorkflowScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = WorkflowScheduler(
+                    max_workers=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS,
+                    tenant_max_workers=dify_config.WORKFLOW_SCHEDULER_TENANT_MAX_WORKERS,
+                    nested_max_tasks=dify_config.WORKFLOW_SCHEDULER_NESTED_MAX_TASKS,
+                )
+    return _scheduler
+
+
+def _observe(stat: str, nested_stat: Optional[str] = None) -> Callable[[CallbackOptions], Iterable[Observation]]:
+    def callback(options: CallbackOptions) -> Iterable[Observation]:
+        if _scheduler is None:
+            return
+        stats = _scheduler.stats()
+        if nested_stat is None:
+            yield Observation(stats[stat])
+            return
+        yield Observation(stats[stat], {"nested": False})
+        yield Observation(stats[nested_stat], {"nested": True})
+
+    return callback
+
+
+_meter.create_observable_gauge(
+    "workflow.scheduler.queue_depth",
+    callbacks=[_observe("queue_depth", "nested_queue_depth")],
+    description="Number of parallel workflow node executions waiting for a worker",
+    unit="{task}",
+)
+_meter.create_observable_gauge(
+    "workflow.scheduler.running_tasks",
+    callbacks=[_observe("running_tasks", "nested_running_tasks")],
+    description="Number of parallel workflow node executions running",
+    unit="{task}",
+)
+_meter.create_observable_gauge(
+    "workflow.scheduler.workers",
+    callbacks=[_observe("workers")],
+    description="Number of worker threads of the workflow scheduler",
+    unit="{thread}",
+)
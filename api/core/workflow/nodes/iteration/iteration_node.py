@@ -208,7 +208,9 @@ class IterationNode(BaseNode):
                 futures: list[Future] = []
                 q: Queue = Queue()
                 thread_pool = GraphEngineThreadPool(
-                    max_workers=self._node_data.parallel_nums, max_submit_count=dify_config.MAX_SUBMIT_COUNT
+                    tenant_id=self.tenant_id,
+                    max_workers=self._node_data.parallel_nums,
+                    max_submit_count=dify_config.MAX_SUBMIT_COUNT,
                 )
                 for index, item in enumerate(iterator_list_value):
                     future: Future = thread_pool.submit(
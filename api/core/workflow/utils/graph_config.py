@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+from collections.abc import Mapping
+from typing import Any, NoReturn, Optional, cast
+
+from cachetools import LRUCache
+
+from configs import dify_config
+
+
+def _immutable(self, *args: Any, **kwargs: Any) -> NoReturn:
+    raise TypeError(f"{type(self).__name__} is immutable, modify a copy made with copy.deepcopy instead")
+
+
+class FrozenDict(dict):
+    """
+    A dict that cannot be modified, so it can be shared between requests and threads.
+
+    It still is a dict for json, pydantic and isinstance checks. `copy.deepcopy` and pickling return plain,
+    mutable dicts and lists.
+    """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _immutable
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return cast(dict, thaw(self))
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FrozenList(list):
+    """A list that cannot be modified, see `FrozenDict`."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = extend = insert = pop = remove = clear = sort = (
+        reverse
+    ) = _immutable
+
+    def __deepcopy__(self, memo: dict) -> list:
+        return cast(list, thaw(self))
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Convert the dicts and lists of a parsed JSON value to `FrozenDict` and `FrozenList`."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Copy a frozen value into plain dicts and lists."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+# Parsed graphs by (workflow id, graph hash), a workflow version is parsed once per process.
+# Disabled unless WORKFLOW_GRAPH_CACHE_SIZE is set.
+_graph_config_cache: Optional[LRUCache] = (
+    LRUCache(maxsize=dify_config.WORKFLOW_GRAPH_CACHE_SIZE) if dify_config.WORKFLOW_GRAPH_CACHE_SIZE > 0 else None
+)
+_graph_config_lock = threading.Lock()
+
+
+def load_graph_config(workflow_id: str, graph: Optional[str]) -> Mapping[str, Any]:
+    """
+    Parse the graph of a workflow.
+
+    The parsed graph is cached and shared, so it is frozen: callers that need to modify it must
+    `copy.deepcopy` it first. Without the cache it is parsed on every call into plain dicts and lists.
+
+    :param workflow_id: workflow id
+    :param graph: graph of the workflow in JSON
+    :return: graph config
+    """
+    if not graph:
+        return {}
+    if _graph_config_cache is None:
+        return cast(Mapping[str, Any], json.loads(graph))
+
+    cache_key = (workflow_id, hashlib.sha256(graph.encode()).hexdigest())
+    with _graph_config_lock:
+        graph_config = _graph_config_cache.get(cache_key)
+    if graph_config is None:
+        graph_config = freeze(json.loads(graph))
+        with _graph_config_lock:
+            _graph_config_cache[cache_key] = graph_config
+
+    return cast(Mapping[str, Any], graph_config)
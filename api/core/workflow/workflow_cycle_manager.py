@@ -88,6 +88,7 @@ class WorkflowCycleManager:
         external_trace_id: Optional[str] = None,
     ) -> WorkflowExecution:
         workflow_execution = self._get_workflow_execution_or_raise_error(workflow_run_id)
+        self._flush_node_executions()
 
         self._update_workflow_execution_completion(
             workflow_execution,
@@ -115,6 +116,7 @@ class WorkflowCycleManager:
         external_trace_id: Optional[str] = None,
     ) -> WorkflowExecution:
         execution = self._get_workflow_execution_or_raise_error(workflow_run_id)
+        self._flush_node_executions()
 
         self._update_workflow_execution_completion(
             execution,
@@ -157,6 +159,7 @@ class WorkflowCycleManager:
         )
 
         self._fail_running_node_executions(workflow_execution.id_, error_message, now)
+        self._flush_node_executions()
         self._add_trace_task_if_needed(trace_manager, workflow_execution, conversation_id, external_trace_id)
 
         self._workflow_execution_repository.save(workflow_execution)
@@ -351,6 +354,12 @@ class WorkflowCycleManager:
                 node_execution.elapsed_time = (now - node_execution.created_at).total_seconds()
                 self._workflow_node_execution_repository.save(node_execution)
 
+    def _flush_node_executions(self) -> None:
+        """Persist node executions buffered by a write-behind repository before the run is reported complete."""
+        flush = getattr(self._workflow_node_execution_repository, "flush", None)
+        if callable(flush):
+            flush()
+
     def _create_node_execution_from_event(
         self,
         *,
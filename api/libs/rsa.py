@@ -1,15 +1,46 @@
 import hashlib
 import os
-from typing import Union
+import threading
+from typing import Optional, Union
 
+from cachetools import TTLCache
 from Crypto.Cipher import AES
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
 
+from configs import dify_config
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
 from libs import gmpy2_pkcs10aep_cipher
 
+# Parsed private keys and their ciphers by tenant id, with the key generation they were loaded at,
+# parsing a key takes longer than a decryption.
+_decoding_cache: TTLCache[str, tuple[int, RSA.RsaKey, object]] = TTLCache(
+    maxsize=10000, ttl=dify_config.TENANT_PRIVATE_KEY_CACHE_TTL
+)
+# Decrypted secrets by (key modulus, ciphertext digest), so the same secret is decrypted once per TTL.
+# Disabled if DECRYPTED_SECRET_CACHE_TTL is 0.
+_decrypted_cache: Optional[TTLCache] = (
+    TTLCache(maxsize=dify_config.DECRYPTED_SECRET_CACHE_SIZE, ttl=dify_config.DECRYPTED_SECRET_CACHE_TTL)
+    if dify_config.DECRYPTED_SECRET_CACHE_TTL > 0
+    else None
+)
+_cache_lock = threading.Lock()
+
+
+def _get_privkey_cache_key(tenant_id: str) -> str:
+    filepath = os.path.join("privkeys", tenant_id, "private.pem")
+    return f"tenant_privkey:{hashlib.sha3_256(filepath.encode()).hexdigest()}"
+
+
+def _get_key_generation_cache_key(tenant_id: str) -> str:
+    return f"tenant_privkey_generation:{tenant_id}"
+
+
+def _get_key_generation(tenant_id: str) -> int:
+    generation = redis_client.get(_get_key_generation_cache_key(tenant_id))
+    return int(generation) if generation else 0
+
 
 def generate_key_pair(tenant_id: str) -> str:
     private_key = RSA.generate(2048)
@@ -21,10 +52,33 @@ def generate_key_pair(tenant_id: str) -> str:
     filepath = os.path.join("privkeys", tenant_id, "private.pem")
 
     storage.save(filepath, pem_private)
+    invalidate_decrypt_cache(tenant_id)
 
     return pem_public.decode()
 
 
+def invalidate_decrypt_cache(tenant_id: str) -> None:
+    """
+    Drop the cached private key of the tenant and the secrets decrypted with it, after the key was replaced.
+
+    The key generation of the tenant is bumped in Redis, so other processes, like the api workers when the key is
+    reset from the command line, load the new key on their next decryption.
+    """
+    redis_client.incr(_get_key_generation_cache_key(tenant_id))
+    redis_client.delete(_get_privkey_cache_key(tenant_id))
+    with _cache_lock:
+        _drop_decoding(tenant_id)
+
+
+def _drop_decoding(tenant_id: str) -> None:
+    """Drop the cached key of the tenant and the secrets decrypted with it, must be called with the lock held."""
+    decoding = _decoding_cache.pop(tenant_id, None)
+    if decoding is not None and _decrypted_cache is not None:
+        modulus = decoding[1].n
+        for key in [key for key in _decrypted_cache if key[0] == modulus]:
+            _decrypted_cache.pop(key, None)
+
+
 prefix_hybrid = b"HYBRID:"
 
 
@@ -48,9 +102,19 @@ def encrypt(text: str, public_key: Union[str, bytes]) -> bytes:
 
 
 def get_decrypt_decoding(tenant_id: str) -> tuple[RSA.RsaKey, object]:
+    # read before the key, a key replaced meanwhile is then cached under an outdated generation and reloaded
+    generation = _get_key_generation(tenant_id)
+    with _cache_lock:
+        decoding = _decoding_cache.get(tenant_id)
+        if decoding is not None:
+            if decoding[0] == generation:
+                return decoding[1], decoding[2]
+            # the key was replaced by another process
+            _drop_decoding(tenant_id)
+
     filepath = os.path.join("privkeys", tenant_id, "private.pem")
 
-    cache_key = f"tenant_privkey:{hashlib.sha3_256(filepath.encode()).hexdigest()}"
+    cache_key = _get_privkey_cache_key(tenant_id)
     private_key = redis_client.get(cache_key)
     if not private_key:
         try:
@@ -63,10 +127,28 @@ def get_decrypt_decoding(tenant_id: str) -> tuple[RSA.RsaKey, object]:
     rsa_key = RSA.import_key(private_key)
     cipher_rsa = gmpy2_pkcs10aep_cipher.new(rsa_key)
 
+    with _cache_lock:
+        _decoding_cache[tenant_id] = (generation, rsa_key, cipher_rsa)
+
     return rsa_key, cipher_rsa
 
 
 def decrypt_token_with_decoding(encrypted_text: bytes, rsa_key: RSA.RsaKey, cipher_rsa) -> str:
+    if _decrypted_cache is None:
+        return _decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa)
+
+    cache_key = (rsa_key.n, hashlib.sha256(encrypted_text).digest())
+    with _cache_lock:
+        decrypted_text = _decrypted_cache.get(cache_key)
+    if decrypted_text is None:
+        decrypted_text = _decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa)
+        with _cache_lock:
+            _decrypted_cache[cache_key] = decrypted_text
+
+    return decrypted_text
+
+
+def _decrypt_token_with_decoding(encrypted_text: bytes, rsa_key: RSA.RsaKey, cipher_rsa) -> str:
     if encrypted_text.startswith(prefix_hybrid):
         encrypted_text = encrypted_text[len(prefix_hybrid) :]
 
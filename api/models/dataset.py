@@ -12,6 +12,7 @@ from datetime import datetime
 from json import JSONDecodeError
 from typing import Any, Optional, cast
 
+import numpy as np
 import sqlalchemy as sa
 from sqlalchemy import DateTime, String, func, select
 from sqlalchemy.dialects.postgresql import JSONB
@@ -918,6 +919,24 @@ class DatasetKeywordTable(Base):
                 return None
 
 
+class DatasetKeywordPosting(Base):
+    """
+    One row per (keyword, segment) pair of a dataset's inverted keyword index.
+
+    Used by the `jieba_inverted_index` keyword store instead of the single JSON blob in `dataset_keyword_tables`.
+    """
+
+    __tablename__ = "dataset_keyword_postings"
+    __table_args__ = (
+        sa.PrimaryKeyConstraint("dataset_id", "keyword", "index_node_id", name="dataset_keyword_posting_pkey"),
+        sa.Index("dataset_keyword_posting_node_idx", "dataset_id", "index_node_id"),
+    )
+
+    dataset_id: Mapped[str] = mapped_column(StringUUID, nullable=False)
+    keyword: Mapped[str] = mapped_column(String(255), nullable=False)
+    index_node_id: Mapped[str] = mapped_column(String(255), nullable=False)
+
+
 class Embedding(Base):
     __tablename__ = "embeddings"
     __table_args__ = (
@@ -935,11 +954,29 @@ class Embedding(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.current_timestamp())
     provider_name = mapped_column(String(255), nullable=False, server_default=sa.text("''::character varying"))
 
+    # Prefix marking embeddings stored as raw little-endian float64 arrays, which decode to the same vector that
+    # was stored. Pickled lists are read as well, and still written until EMBEDDING_CACHE_BINARY_FORMAT_ENABLED is
+    # turned on, so versions that only read pickles can share the cache during an upgrade or after a rollback.
+    BINARY_EMBEDDING_PREFIX = b"DFYF64:"
+
     def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.embedding = self.encode_embedding(embedding_data)
 
     def get_embedding(self) -> list[float]:
-        return cast(list[float], pickle.loads(self.embedding))  # noqa: S301
+        return self.decode_embedding(self.embedding)
+
+    @classmethod
+    def encode_embedding(cls, embedding_data: list[float]) -> bytes:
+        if not dify_config.EMBEDDING_CACHE_BINARY_FORMAT_ENABLED:
+            return pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+        return cls.BINARY_EMBEDDING_PREFIX + np.asarray(embedding_data, dtype="<f8").tobytes()
+
+    @classmethod
+    def decode_embedding(cls, data: bytes) -> list[float]:
+        data = bytes(data)
+        if data.startswith(cls.BINARY_EMBEDDING_PREFIX):
+            return cast(list[float], np.frombuffer(data, dtype="<f8", offset=len(cls.BINARY_EMBEDDING_PREFIX)).tolist())
+        return cast(list[float], pickle.loads(data))  # noqa: S301
 
 
 class DatasetCollectionBinding(Base):
@@ -1,3 +1,4 @@
+import copy
 import json
 import logging
 from collections.abc import Mapping, Sequence
@@ -16,6 +17,7 @@ from core.variables import utils as variable_utils
 from core.variables.variables import FloatVariable, IntegerVariable, StringVariable
 from core.workflow.constants import CONVERSATION_VARIABLE_NODE_ID, SYSTEM_VARIABLE_NODE_ID
 from core.workflow.nodes.enums import NodeType
+from core.workflow.utils.graph_config import load_graph_config
 from factories.variable_factory import TypeMismatchError, build_segment_with_type
 from libs.datetime_utils import naive_utc_now
 from libs.helper import extract_tenant_id
@@ -191,25 +193,13 @@ class Workflow(Base):
 
     @property
     def graph_dict(self) -> Mapping[str, Any]:
-        # TODO(QuantumGhost): Consider caching `graph_dict` to avoid repeated JSON decoding.
-        #
-        # Using `functools.cached_property` could help, but some code in the codebase may
-        # modify the returned dict, which can cause issues elsewhere.
-        #
-        # For example, changing this property to a cached property led to errors like the
-        # following when single stepping an `Iteration` node:
-        #
-        #     Root node id 1748401971780start not found in the graph
-        #
-        # There is currently no standard way to make a dict deeply immutable in Python,
-        # and tracking modifications to the returned dict is difficult. For now, we leave
-        # the code as-is to avoid these issues.
-        #
-        # Currently, the following functions / methods would mutate the returned dict:
-        #
-        # - `_get_graph_and_variable_pool_of_single_iteration`.
-        # - `_get_graph_and_variable_pool_of_single_loop`.
-        return json.loads(self.graph) if self.graph else {}
+        """
+        The parsed graph, shared by every access to the same workflow version.
+
+        It is frozen: mutating it raises `TypeError`, callers that need to modify the graph
+        must `copy.deepcopy` it first.
+        """
+        return load_graph_config(self.id, self.graph)
 
     def get_node_config_by_id(self, node_id: str) -> Mapping[str, Any]:
         """Extract a node configuration from the workflow graph by node ID.
@@ -422,7 +412,8 @@ class Workflow(Base):
         ]
 
         result = {
-            "graph": self.graph_dict,
+            # callers filter the nodes of the exported graph
+            "graph": copy.deepcopy(self.graph_dict),
             "features": self.features_dict,
             "environment_variables": [var.model_dump(mode="json") for var in environment_variables],
             "conversation_variables": [var.model_dump(mode="json") for var in self.conversation_variables],
@@ -1,15 +1,26 @@
 import datetime
+import logging
 import time
+from typing import Optional
 
 import click
-from sqlalchemy import text
-from werkzeug.exceptions import NotFound
+from opentelemetry.metrics import get_meter
+from sqlalchemy import literal, tuple_
 
 import app
 from configs import dify_config
 from extensions.ext_database import db
 from models.dataset import Embedding
 
+_logger = logging.getLogger(__name__)
+
+_meter = get_meter("clean_embedding_cache")
+_deleted_embeddings_counter = _meter.create_counter(
+    "clean_embedding_cache.deleted_embeddings",
+    unit="{embedding}",
+    description="Cached embeddings deleted by the clean embedding cache task.",
+)
+
 
 @app.celery.task(queue="dataset")
 def clean_embedding_cache_task():
@@ -17,26 +28,46 @@ def clean_embedding_cache_task():
     clean_days = int(dify_config.PLAN_SANDBOX_CLEAN_DAY_SETTING)
     start_at = time.perf_counter()
     thirty_days_ago = datetime.datetime.now() - datetime.timedelta(days=clean_days)
+    deleted_count = 0
+    cursor: Optional[tuple[datetime.datetime, str]] = None
     while True:
-        try:
-            embedding_ids = (
-                db.session.query(Embedding.id)
-                .where(Embedding.created_at < thirty_days_ago)
-                .order_by(Embedding.created_at.desc())
-                .limit(100)
-                .all()
+        # walk the embeddings from the newest to the oldest by (created_at, id), the rows
+        # deleted by earlier batches are not scanned again
+        query = (
+            db.session.query(Embedding.id, Embedding.created_at)
+            .where(Embedding.created_at < thirty_days_ago)
+            .order_by(Embedding.created_at.desc(), Embedding.id.desc())
+            .limit(dify_config.CLEAN_EMBEDDING_CACHE_BATCH_SIZE)
+        )
+        if cursor:
+            query = query.where(
+                Embedding.created_at <= cursor[0],
+                tuple_(Embedding.created_at, Embedding.id) < tuple_(literal(cursor[0]), literal(cursor[1])),
             )
-            embedding_ids = [embedding_id[0] for embedding_id in embedding_ids]
-        except NotFound:
+        embeddings = query.all()
+        if not embeddings:
             break
-        if embedding_ids:
-            for embedding_id in embedding_ids:
-                db.session.execute(
-                    text("DELETE FROM embeddings WHERE id = :embedding_id"), {"embedding_id": embedding_id}
-                )
+        cursor = (embeddings[-1].created_at, embeddings[-1].id)
 
+        try:
+            db.session.query(Embedding).where(Embedding.id.in_([embedding.id for embedding in embeddings])).delete(
+                synchronize_session=False
+            )
             db.session.commit()
-        else:
-            break
+        except Exception:
+            db.session.rollback()
+            _logger.exception("Failed to clean embedding cache, created_at <= %s", cursor[0])
+            continue
+
+        _deleted_embeddings_counter.add(len(embeddings))
+        deleted_count += len(embeddings)
+        _logger.info("Cleaned embedding cache: deleted %d, created_at <= %s", deleted_count, cursor[0])
+        if dify_config.CLEAN_TASK_BATCH_INTERVAL:
+            time.sleep(dify_config.CLEAN_TASK_BATCH_INTERVAL)
     end_at = time.perf_counter()
-    click.echo(click.style(f"Cleaned embedding cache from db success latency: {end_at - start_at}", fg="green"))
+    click.echo(
+        click.style(
+            f"Cleaned embedding cache from db success latency: {end_at - start_at}, deleted: {deleted_count}",
+            fg="green",
+        )
+    )
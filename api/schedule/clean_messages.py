@@ -1,9 +1,11 @@
 import datetime
 import logging
 import time
+from typing import Optional
 
 import click
-from werkzeug.exceptions import NotFound
+from opentelemetry.metrics import get_meter
+from sqlalchemy import literal, tuple_
 
 import app
 from configs import dify_config
@@ -23,6 +25,28 @@ from services.feature_service import FeatureService
 
 _logger = logging.getLogger(__name__)
 
+_meter = get_meter("clean_messages")
+_scanned_messages_counter = _meter.create_counter(
+    "clean_messages.scanned_messages",
+    unit="{message}",
+    description="Messages older than the sandbox retention checked by the clean messages task.",
+)
+_deleted_messages_counter = _meter.create_counter(
+    "clean_messages.deleted_messages",
+    unit="{message}",
+    description="Messages of sandbox tenants deleted by the clean messages task.",
+)
+
+# tables holding rows of a message, deleted before the messages
+_MESSAGE_RELATED_MODELS = (
+    MessageFeedback,
+    MessageAnnotation,
+    MessageChain,
+    MessageAgentThought,
+    MessageFile,
+    SavedMessage,
+)
+
 
 @app.celery.task(queue="dataset")
 def clean_messages():
@@ -31,60 +55,93 @@ def clean_messages():
     plan_sandbox_clean_message_day = datetime.datetime.now() - datetime.timedelta(
         days=dify_config.PLAN_SANDBOX_CLEAN_MESSAGE_DAY_SETTING
     )
+    # looked up once per run, key: app id / tenant id
+    app_tenants: dict[str, Optional[str]] = {}
+    tenant_plans: dict[str, str] = {}
+    scanned_count = 0
+    deleted_count = 0
+    cursor: Optional[tuple[datetime.datetime, str]] = None
     while True:
-        try:
-            # Main query with join and filter
-            messages = (
-                db.session.query(Message)
-                .where(Message.created_at < plan_sandbox_clean_message_day)
-                .order_by(Message.created_at.desc())
-                .limit(100)
-                .all()
+        # walk the messages from the newest to the oldest by (created_at, id), the rows
+        # deleted by earlier batches are not scanned again
+        query = (
+            db.session.query(Message.id, Message.app_id, Message.created_at)
+            .where(Message.created_at < plan_sandbox_clean_message_day)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(dify_config.CLEAN_MESSAGES_BATCH_SIZE)
+        )
+        if cursor:
+            query = query.where(
+                Message.created_at <= cursor[0],
+                tuple_(Message.created_at, Message.id) < tuple_(literal(cursor[0]), literal(cursor[1])),
             )
-
-        except NotFound:
-            break
+        messages = query.all()
         if not messages:
             break
-        for message in messages:
-            plan_sandbox_clean_message_day = message.created_at
-            app = db.session.query(App).filter_by(id=message.app_id).first()
-            if not app:
-                _logger.warning(
-                    "Expected App record to exist, but none was found, app_id=%s, message_id=%s",
-                    message.app_id,
-                    message.id,
-                )
-                continue
-            features_cache_key = f"features:{app.tenant_id}"
-            plan_cache = redis_client.get(features_cache_key)
-            if plan_cache is None:
-                features = FeatureService.get_features(app.tenant_id)
-                redis_client.setex(features_cache_key, 600, features.billing.subscription.plan)
-                plan = features.billing.subscription.plan
-            else:
-                plan = plan_cache.decode()
-            if plan == "sandbox":
-                # clean related message
-                db.session.query(MessageFeedback).where(MessageFeedback.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(MessageAnnotation).where(MessageAnnotation.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(MessageChain).where(MessageChain.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(MessageAgentThought).where(MessageAgentThought.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(MessageFile).where(MessageFile.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(SavedMessage).where(SavedMessage.message_id == message.id).delete(
-                    synchronize_session=False
-                )
-                db.session.query(Message).where(Message.id == message.id).delete()
-                db.session.commit()
+        cursor = (messages[-1].created_at, messages[-1].id)
+        _scanned_messages_counter.add(len(messages))
+        scanned_count += len(messages)
+
+        try:
+            _load_app_tenants({message.app_id for message in messages}, app_tenants)
+            message_ids = []
+            for message in messages:
+                tenant_id = app_tenants[message.app_id]
+                if not tenant_id:
+                    continue
+                if _get_tenant_plan(tenant_id, tenant_plans) == "sandbox":
+                    message_ids.append(message.id)
+
+            if message_ids:
+                for model in _MESSAGE_RELATED_MODELS:
+                    db.session.query(model).where(model.message_id.in_(message_ids)).delete(synchronize_session=False)
+                db.session.query(Message).where(Message.id.in_(message_ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            _logger.exception("Failed to clean messages, created_at <= %s", cursor[0])
+            continue
+
+        _deleted_messages_counter.add(len(message_ids))
+        deleted_count += len(message_ids)
+        _logger.info(
+            "Cleaned messages: scanned %d, deleted %d, created_at <= %s", scanned_count, deleted_count, cursor[0]
+        )
+        if dify_config.CLEAN_TASK_BATCH_INTERVAL:
+            time.sleep(dify_config.CLEAN_TASK_BATCH_INTERVAL)
     end_at = time.perf_counter()
-    click.echo(click.style(f"Cleaned messages from db success latency: {end_at - start_at}", fg="green"))
+    click.echo(
+        click.style(
+            f"Cleaned messages from db success latency: {end_at - start_at}, "
+            f"scanned: {scanned_count}, deleted: {deleted_count}",
+            fg="green",
+        )
+    )
+
+
+def _load_app_tenants(app_ids: set[str], app_tenants: dict[str, Optional[str]]) -> None:
+    missing_app_ids = app_ids - app_tenants.keys()
+    if not missing_app_ids:
+        return
+    for app_id, tenant_id in db.session.query(App.id, App.tenant_id).where(App.id.in_(missing_app_ids)):
+        app_tenants[app_id] = tenant_id
+    for app_id in missing_app_ids - app_tenants.keys():
+        _logger.warning("Expected App record to exist, but none was found, app_id=%s", app_id)
+        app_tenants[app_id] = None
+
+
+def _get_tenant_plan(tenant_id: str, tenant_plans: dict[str, str]) -> str:
+    plan = tenant_plans.get(tenant_id)
+    if plan is not None:
+        return plan
+
+    features_cache_key = f"features:{tenant_id}"
+    plan_cache = redis_client.get(features_cache_key)
+    if plan_cache is None:
+        features = FeatureService.get_features(tenant_id)
+        redis_client.setex(features_cache_key, 600, features.billing.subscription.plan)
+        plan = features.billing.subscription.plan
+    else:
+        plan = plan_cache.decode()
+    tenant_plans[tenant_id] = plan
+    return plan
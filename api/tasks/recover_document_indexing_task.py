@@ -6,7 +6,7 @@ from celery import shared_task  # type: ignore
 
 from core.indexing_runner import DocumentIsPausedError, IndexingRunner
 from extensions.ext_database import db
-from models.dataset import Document
+from models.dataset import Document, DocumentSegment
 
 
 @shared_task(queue="dataset")
@@ -33,7 +33,13 @@ def recover_document_indexing_task(dataset_id: str, document_id: str):
         if document.indexing_status in {"waiting", "parsing", "cleaning"}:
             indexing_runner.run([document])
         elif document.indexing_status == "splitting":
-            indexing_runner.run_in_splitting_status(document)
+            segments = db.session.query(DocumentSegment).where(DocumentSegment.document_id == document_id).all()
+            if segments and IndexingRunner.get_split_checkpoint(document.id):
+                # a streaming run stopped before the whole document was split, keep the segments of the
+                # batches it split and continue splitting after the last of them
+                indexing_runner.run_in_streaming_status(document)
+            else:
+                indexing_runner.run_in_splitting_status(document)
         elif document.indexing_status == "indexing":
             indexing_runner.run_in_indexing_status(document)
         end_at = time.perf_counter()
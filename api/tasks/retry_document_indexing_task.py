@@ -65,26 +65,46 @@ def retry_document_indexing_task(dataset_id: str, document_ids: list[str]):
                 logging.info(click.style(f"Document not found: {document_id}", fg="yellow"))
                 return
             try:
-                # clean old data
-                index_processor = IndexProcessorFactory(document.doc_form).init_index_processor()
-
+                indexing_runner = IndexingRunner()
                 segments = db.session.query(DocumentSegment).where(DocumentSegment.document_id == document_id).all()
-                if segments:
-                    index_node_ids = [segment.index_node_id for segment in segments]
-                    # delete from vector index
-                    index_processor.clean(dataset, index_node_ids, with_keywords=True, delete_child_chunks=True)
+                if segments and IndexingRunner.get_split_checkpoint(document.id):
+                    # a streaming run failed before the whole document was split, keep the segments of the
+                    # batches it split and continue splitting after the last of them
+                    document.indexing_status = "splitting"
+                    document.error = None
+                    document.stopped_at = None
+                    db.session.add(document)
+                    db.session.commit()
 
-                for segment in segments:
-                    db.session.delete(segment)
-                db.session.commit()
+                    indexing_runner.run_in_streaming_status(document)
+                elif document.splitting_completed_at and segments:
+                    # the document failed after it was split, keep its segments and resume indexing after
+                    # the last completed batch instead of extracting and embedding everything again
+                    document.indexing_status = "indexing"
+                    document.error = None
+                    document.stopped_at = None
+                    db.session.add(document)
+                    db.session.commit()
 
-                document.indexing_status = "parsing"
-                document.processing_started_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
-                db.session.add(document)
-                db.session.commit()
+                    indexing_runner.run_in_indexing_status(document)
+                else:
+                    # clean old data
+                    index_processor = IndexProcessorFactory(document.doc_form).init_index_processor()
+                    if segments:
+                        index_node_ids = [segment.index_node_id for segment in segments]
+                        # delete from vector index
+                        index_processor.clean(dataset, index_node_ids, with_keywords=True, delete_child_chunks=True)
 
-                indexing_runner = IndexingRunner()
-                indexing_runner.run([document])
+                    for segment in segments:
+                        db.session.delete(segment)
+                    db.session.commit()
+
+                    document.indexing_status = "parsing"
+                    document.processing_started_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+                    db.session.add(document)
+                    db.session.commit()
+
+                    indexing_runner.run([document])
                 redis_client.delete(retry_indexing_cache_key)
             except Exception as ex:
                 document.indexing_status = "error"
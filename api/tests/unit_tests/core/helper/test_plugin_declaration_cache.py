@@ -0,0 +1,97 @@
+import pytest
+
+from core.helper import plugin_declaration_cache
+from core.helper.plugin_declaration_cache import PluginDeclarationCache, PluginDeclarationCacheType
+from core.model_runtime.entities.common_entities import I18nObject
+from core.model_runtime.entities.model_entities import AIModelEntity, FetchFrom, ModelPropertyKey, ModelType
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value = self.data.get(key)
+        return str(value).encode() if isinstance(value, int) else value
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(plugin_declaration_cache, "redis_client", redis)
+    monkeypatch.setattr(plugin_declaration_cache, "_declaration_lru_cache", plugin_declaration_cache.LRUCache(100))
+    return redis
+
+
+def _schema(model: str = "gpt") -> AIModelEntity:
+    return AIModelEntity(
+        model=model,
+        label=I18nObject(en_US=model),
+        model_type=ModelType.LLM,
+        fetch_from=FetchFrom.PREDEFINED_MODEL,
+        model_properties={ModelPropertyKey.CONTEXT_SIZE: 4096},
+    )
+
+
+def _cache(tenant_id: str = "tenant") -> PluginDeclarationCache[AIModelEntity]:
+    return PluginDeclarationCache(tenant_id, PluginDeclarationCacheType.MODEL_SCHEMA, "openai:gpt", AIModelEntity)
+
+
+def test_hits_return_copies(fake_redis):
+    assert _cache().get() is None
+    _cache().set(_schema())
+
+    first, second = _cache().get(), _cache().get()
+    assert first == _schema()
+    assert first is not second
+    assert PluginDeclarationCache.get_version("tenant") == 0
+
+
+def test_invalidate_only_affects_the_tenant(fake_redis):
+    _cache("a").set(_schema())
+    _cache("b").set(_schema())
+
+    PluginDeclarationCache.invalidate("a")
+
+    assert _cache("a").get() is None
+    assert _cache("b").get() == _schema()
+
+
+def test_declaration_fetched_before_invalidation_is_not_used_after(fake_redis):
+    cache = _cache()
+    PluginDeclarationCache.invalidate("tenant")
+    cache.set(_schema("stale"))
+
+    assert _cache().get() is None
+
+
+def test_finished_task_invalidates_once(fake_redis):
+    _cache().set(_schema())
+
+    PluginDeclarationCache.invalidate_for_finished_task("tenant", "task")
+    _cache().set(_schema())
+    PluginDeclarationCache.invalidate_for_finished_task("tenant", "task")
+
+    assert _cache().get() == _schema()
+
+
+def test_redis_tier_is_shared(fake_redis, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.PLUGIN_DECLARATION_REDIS_CACHE_ENABLED", True)
+    _cache().set(_schema())
+
+    # another process only sees redis
+    monkeypatch.setattr(plugin_declaration_cache, "_declaration_lru_cache", plugin_declaration_cache.LRUCache(100))
+    assert _cache().get() == _schema()
@@ -0,0 +1,136 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import AssistantPromptMessage, UserPromptMessage
+from models.model import AppMode
+
+
+def _count_tokens(prompt_messages):
+    # one token per word plus one per message
+    return sum(len(str(m.content).split()) + 1 for m in prompt_messages)
+
+
+def _build_memory(provider="openai", model="gpt-4o"):
+    model_instance = MagicMock()
+    model_instance.provider = provider
+    model_instance.model = model
+    model_instance.get_llm_num_tokens.side_effect = _count_tokens
+    return TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance), model_instance
+
+
+def _build_history(turns):
+    prompt_messages = []
+    message_ids = []
+    for i in range(turns):
+        prompt_messages.append(UserPromptMessage(content=f"question {i}"))
+        prompt_messages.append(AssistantPromptMessage(content=f"answer number {i}"))
+        message_ids.extend([f"message-{i}", f"message-{i}"])
+    return prompt_messages, message_ids
+
+
+def _reference_prune(prompt_messages, max_token_limit):
+    prompt_messages = list(prompt_messages)
+    while _count_tokens(prompt_messages) > max_token_limit and len(prompt_messages) > 1:
+        prompt_messages.pop(0)
+    return prompt_messages
+
+
+def test_prune_matches_recounting_after_every_drop():
+    for max_token_limit in (0, 1, 7, 20, 33, 100, 1000):
+        memory, _ = _build_memory(model=f"model-{max_token_limit}")
+        prompt_messages, message_ids = _build_history(10)
+
+        pruned = memory._prune_prompt_messages(
+            list(prompt_messages), message_ids, _count_tokens(prompt_messages), max_token_limit
+        )
+
+        assert pruned == _reference_prune(prompt_messages, max_token_limit)
+
+
+def test_prune_only_counts_the_dropped_messages():
+    memory, model_instance = _build_memory(model="count-dropped")
+    prompt_messages, message_ids = _build_history(100)
+    total_tokens = _count_tokens(prompt_messages)
+
+    pruned = memory._prune_prompt_messages(list(prompt_messages), message_ids, total_tokens, total_tokens - 1)
+
+    # the oldest message covers the excess: one count for it plus the final recount of the remaining history
+    assert pruned == prompt_messages[1:]
+    assert model_instance.get_llm_num_tokens.call_count == 2
+
+
+def test_message_tokens_are_cached_across_calls():
+    memory, model_instance = _build_memory(model="cached")
+    prompt_messages, message_ids = _build_history(5)
+
+    first = [memory._get_message_tokens(m, message_id) for m, message_id in zip(prompt_messages, message_ids)]
+    model_instance.get_llm_num_tokens.reset_mock()
+    second = [memory._get_message_tokens(m, message_id) for m, message_id in zip(prompt_messages, message_ids)]
+
+    assert first == second
+    model_instance.get_llm_num_tokens.assert_not_called()
+
+    # another model uses its own tokenizer, so counts are not shared
+    other_memory, other_model_instance = _build_memory(model="cached-other")
+    for m, message_id in zip(prompt_messages, message_ids):
+        other_memory._get_message_tokens(m, message_id)
+    assert other_model_instance.get_llm_num_tokens.call_count == len(prompt_messages)
+
+
+def _build_workflow_memory():
+    conversation = MagicMock()
+    conversation.mode = AppMode.ADVANCED_CHAT
+    return TokenBufferMemory(conversation=conversation, model_instance=MagicMock())
+
+
+def test_message_files_are_loaded_in_one_query():
+    messages = [MagicMock(id=f"message-{i}") for i in range(3)]
+    files = [MagicMock(message_id="message-0"), MagicMock(message_id="message-2"), MagicMock(message_id="message-0")]
+    with patch("core.memory.token_buffer_memory.db") as mock_db:
+        mock_db.session.scalars.return_value = files
+
+        message_files = TokenBufferMemory._get_message_files(messages)
+
+    mock_db.session.scalars.assert_called_once()
+    assert message_files == {"message-0": [files[0], files[2]], "message-2": [files[1]]}
+
+
+def test_workflow_file_configs_are_resolved_once_per_workflow():
+    memory = _build_workflow_memory()
+    messages = [MagicMock(id=f"message-{i}", workflow_run_id=f"run-{i}") for i in range(4)]
+    workflows = [MagicMock(id="workflow-a", features_dict={"a": 1}), MagicMock(id="workflow-b", features_dict={})]
+    with (
+        patch("core.memory.token_buffer_memory.db") as mock_db,
+        patch("core.memory.token_buffer_memory.FileUploadConfigManager.convert") as mock_convert,
+    ):
+        mock_db.session.execute.return_value.tuples.return_value.all.return_value = [
+            ("run-0", "workflow-a"),
+            ("run-1", "workflow-b"),
+            ("run-2", "workflow-a"),
+            ("run-3", "workflow-a"),
+        ]
+        mock_db.session.scalars.return_value = workflows
+        mock_convert.side_effect = lambda features, is_vision: f"config-{len(features)}"
+
+        configs = memory._get_file_extra_configs(messages)
+
+    mock_db.session.execute.assert_called_once()
+    mock_db.session.scalars.assert_called_once()
+    assert mock_convert.call_count == 2
+    assert configs == {
+        "message-0": "config-1",
+        "message-1": "config-0",
+        "message-2": "config-1",
+        "message-3": "config-1",
+    }
+
+
+def test_missing_workflow_run_raises():
+    memory = _build_workflow_memory()
+    with patch("core.memory.token_buffer_memory.db") as mock_db:
+        mock_db.session.execute.return_value.tuples.return_value.all.return_value = []
+
+        with pytest.raises(ValueError, match="Workflow run not found: run-0"):
+            memory._get_file_extra_configs([MagicMock(id="message-0", workflow_run_id="run-0")])
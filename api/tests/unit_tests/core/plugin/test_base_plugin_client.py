@@ -0,0 +1,75 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from yarl import URL
+
+from core.plugin.entities.plugin_daemon import PluginDaemonInnerError
+from core.plugin.impl import base
+from core.plugin.impl.base import BasePluginClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections: set[int] = set()
+
+    def do_GET(self):  # noqa: N802
+        _Handler.connections.add(id(self.connection))
+        if self.path.startswith("/slow"):
+            threading.Event().wait(0.5)
+        if self.path.startswith("/stream"):
+            body = b"data: {}\n\n" * 3
+        else:
+            body = json.dumps({"code": 0, "message": "", "data": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Handler.connections = set()
+    monkeypatch.setattr(base, "plugin_daemon_inner_api_baseurl", URL(f"http://127.0.0.1:{server.server_port}"))
+    monkeypatch.setattr(base, "_session", None)
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_connections(daemon):
+    client = BasePluginClient()
+
+    for i in range(5):
+        assert client._request_with_plugin_daemon_response("GET", f"plugin/{i}", str) == f"/plugin/{i}"
+    assert list(client._stream_request("GET", "stream")) == ["{}"] * 3
+    assert client._request_with_plugin_daemon_response("GET", "plugin/last", str) == "/plugin/last"
+
+    assert len(_Handler.connections) == 1
+    [pool] = base._connection_pools()
+    assert pool.num_connections == 1
+    assert pool.num_requests == 7
+
+
+def test_timeout(daemon):
+    with pytest.raises(PluginDaemonInnerError) as exc_info:
+        BasePluginClient()._request("GET", "slow", timeout=0.1)
+    assert exc_info.value.message == "Request to Plugin Daemon Service timed out"
+
+
+def test_long_running_timeout_has_no_read_timeout(daemon, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.PLUGIN_DAEMON_READ_TIMEOUT", 0.1)
+    client = BasePluginClient()
+
+    with pytest.raises(PluginDaemonInnerError):
+        client._request("GET", "slow")
+    response = client._request("GET", "slow", timeout=base.long_running_timeout())
+    assert response.json()["data"] == "/slow"
@@ -0,0 +1,42 @@
+import contextlib
+import inspect
+import io
+from unittest.mock import patch
+
+import pytest
+
+from core.plugin.impl import base
+from core.plugin.impl.model import PluginModelClient
+
+
+@pytest.mark.parametrize(
+    ("method", "kwargs"),
+    [
+        ("invoke_llm", {"prompt_messages": []}),
+        ("invoke_text_embedding", {"texts": ["text"], "input_type": "document"}),
+        ("invoke_rerank", {"query": "query", "docs": ["doc"]}),
+        ("invoke_tts", {"content_text": "text", "voice": "voice"}),
+        ("invoke_speech_to_text", {"file": io.BytesIO(b"audio")}),
+        ("invoke_moderation", {"text": "text"}),
+    ],
+)
+def test_model_invocations_have_no_read_timeout(method, kwargs, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.PLUGIN_DAEMON_CONNECT_TIMEOUT", 5.0)
+    common = {
+        "tenant_id": "tenant",
+        "user_id": "user",
+        "plugin_id": "plugin",
+        "provider": "provider",
+        "model": "model",
+        "credentials": {},
+    }
+
+    with patch.object(base.BasePluginClient, "_request_with_plugin_daemon_response_stream") as request:
+        request.return_value = iter([])
+        # an empty response fails some invocations, only the request matters here
+        with contextlib.suppress(ValueError):
+            result = getattr(PluginModelClient(), method)(**common, **kwargs)
+            if inspect.isgenerator(result):
+                list(result)
+
+    assert request.call_args.kwargs["timeout"] == (5.0, None)
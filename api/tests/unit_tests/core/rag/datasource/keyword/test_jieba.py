@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+
+
+def _segment(index_node_id: str, document_id: str = "document-1"):
+    return SimpleNamespace(
+        index_node_id=index_node_id,
+        content=f"content {index_node_id}",
+        index_node_hash=f"hash {index_node_id}",
+        document_id=document_id,
+        dataset_id="dataset-1",
+    )
+
+
+def test_search_hydrates_segments_in_one_query():
+    jieba = Jieba(SimpleNamespace(id="dataset-1", tenant_id="tenant-1"))
+    keyword_table = {"apple": {"node-1", "node-2", "node-3"}, "banana": {"node-2"}, "cherry": {"node-3"}}
+
+    with (
+        patch.object(Jieba, "_get_dataset_keyword_table", return_value=keyword_table),
+        patch.object(Jieba, "_retrieve_ids_by_query", return_value=["node-3", "node-2", "node-1"]),
+        patch("core.rag.datasource.keyword.keyword_base.db") as mock_db,
+    ):
+        # segment of node-2 is filtered out by document_ids_filter
+        mock_db.session.scalars.return_value = [_segment("node-1"), _segment("node-3")]
+        documents = jieba.search("apple banana cherry", top_k=3, document_ids_filter=["document-1"])
+
+    mock_db.session.scalars.assert_called_once()
+    assert [document.metadata["doc_id"] for document in documents] == ["node-3", "node-1"]
+    assert documents[0].page_content == "content node-3"
+    assert documents[0].metadata["doc_hash"] == "hash node-3"
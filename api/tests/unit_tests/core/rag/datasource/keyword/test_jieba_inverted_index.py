@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from core.rag.datasource.keyword.jieba.jieba_inverted_index import JiebaInvertedIndex
+from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.keyword.keyword_type import KeyWordType
+from core.rag.models.document import Document
+
+
+@pytest.fixture
+def dataset():
+    return SimpleNamespace(id="dataset-1", tenant_id="tenant-1")
+
+
+@pytest.fixture
+def mock_db():
+    with patch("core.rag.datasource.keyword.jieba.jieba_inverted_index.db") as mock_db:
+        yield mock_db
+
+
+def test_get_keyword_factory():
+    assert Keyword.get_keyword_factory(KeyWordType.JIEBA_INVERTED_INDEX) is JiebaInvertedIndex
+
+
+def test_add_texts_writes_postings_in_one_statement(dataset, mock_db):
+    segment = SimpleNamespace(index_node_id="node-1", keywords=None)
+    mock_db.session.scalars.return_value = [segment]
+    texts = [
+        Document(page_content="ignored", metadata={"doc_id": "node-1"}),
+        Document(page_content="ignored", metadata={"doc_id": "node-2"}),
+    ]
+
+    JiebaInvertedIndex(dataset).add_texts(texts, keywords_list=[["apple", "banana", "apple"], ["banana"]])
+
+    assert segment.keywords == ["apple", "banana", "apple"]
+    insert_stmt = mock_db.session.execute.call_args.args[0]
+    params = insert_stmt.compile(dialect=postgresql.dialect()).params
+    rows = {(params[f"keyword_m{i}"], params[f"index_node_id_m{i}"]) for i in range(3)}
+    assert rows == {("apple", "node-1"), ("banana", "node-1"), ("banana", "node-2")}
+    mock_db.session.commit.assert_called_once()
+
+
+def test_search_keeps_ranked_order(dataset, mock_db):
+    segments = [
+        SimpleNamespace(
+            index_node_id=node_id,
+            content=f"content {node_id}",
+            index_node_hash="hash",
+            document_id="doc",
+            dataset_id="d",
+        )
+        for node_id in ("node-2", "node-1")
+    ]
+    mock_db.session.scalars.return_value = ["node-1", "node-2", "node-3"]
+
+    with patch("core.rag.datasource.keyword.keyword_base.db") as mock_base_db:
+        mock_base_db.session.scalars.return_value = segments
+        with patch("core.rag.datasource.keyword.jieba.jieba_inverted_index.JiebaKeywordTableHandler") as mock_handler:
+            mock_handler.return_value.extract_keywords.return_value = {"apple", "banana"}
+            documents = JiebaInvertedIndex(dataset).search("apple banana", top_k=3)
+
+    assert [document.metadata["doc_id"] for document in documents] == ["node-1", "node-2"]
+    assert documents[0].page_content == "content node-1"
+    # one query for the postings, legacy keyword tables are not looked up
+    mock_db.session.scalars.assert_called_once()
+    mock_db.session.scalar.assert_not_called()
+
+
+@pytest.mark.parametrize("delete_legacy", [False, True])
+def test_migrate_legacy_keyword_table(dataset, mock_db, delete_legacy):
+    keyword_table = SimpleNamespace(
+        keyword_table_dict={"__data__": {"table": {"apple": ["node-1", "node-2"], "banana": ["node-1"]}}},
+        data_source_type="database",
+    )
+    mock_db.session.scalar.return_value = keyword_table
+
+    with patch("core.rag.datasource.keyword.jieba.jieba_inverted_index.redis_client"):
+        JiebaInvertedIndex(dataset).migrate_legacy_keyword_table(delete_legacy=delete_legacy)
+
+    insert_stmt = mock_db.session.execute.call_args.args[0]
+    params = insert_stmt.compile(dialect=postgresql.dialect()).params
+    rows = {(params[f"keyword_m{i}"], params[f"index_node_id_m{i}"]) for i in range(3)}
+    assert rows == {("apple", "node-1"), ("apple", "node-2"), ("banana", "node-1")}
+    # the jieba store keeps finding the keywords unless the table is deleted explicitly
+    assert mock_db.session.delete.called == delete_legacy
+    mock_db.session.commit.assert_called_once()
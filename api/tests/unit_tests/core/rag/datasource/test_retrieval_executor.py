@@ -0,0 +1,80 @@
+import threading
+
+from core.rag.datasource.retrieval_executor import RetrievalExecutor
+
+
+def test_submit_returns_results():
+    executor = RetrievalExecutor("test", max_workers=2)
+    futures = [executor.submit("tenant", pow, i, 2) for i in range(5)]
+
+    done, not_done = executor.wait(futures, timeout=5)
+
+    assert not not_done
+    assert len(done) == 5
+    assert [future.result() for future in futures] == [0, 1, 4, 9, 16]
+
+
+def test_workers_are_bounded_and_reused():
+    executor = RetrievalExecutor("test", max_workers=2)
+    for _ in range(3):
+        executor.wait([executor.submit("tenant", lambda: None) for _ in range(10)], timeout=5)
+
+    assert executor.stats()["workers"] <= 2
+
+
+def test_tasks_are_taken_round_robin_across_tenants():
+    executor = RetrievalExecutor("test", max_workers=1)
+    release = threading.Event()
+    order: list[str] = []
+
+    # occupy the only worker so the following tasks queue up
+    blocker = executor.submit("blocker", release.wait, 5)
+    futures = [executor.submit("tenant-a", order.append, f"a{i}") for i in range(3)]
+    futures += [executor.submit("tenant-b", order.append, f"b{i}") for i in range(2)]
+    release.set()
+    executor.wait([blocker, *futures], timeout=5)
+
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_wait_cancels_queued_tasks_on_timeout():
+    executor = RetrievalExecutor("test", max_workers=1)
+    release = threading.Event()
+    running = executor.submit("tenant", release.wait, 5)
+    queued = executor.submit("tenant", lambda: "late")
+
+    done, not_done = executor.wait([running, queued], timeout=0.05)
+
+    assert not done
+    assert not_done == {running, queued}
+    assert queued.cancelled()
+    release.set()
+    assert running.result(timeout=5) is True
+    assert executor.stats()["queue_depth"] == 0
+
+
+def test_task_exception_is_set_on_future():
+    executor = RetrievalExecutor("test", max_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    future = executor.submit("tenant", fail)
+    executor.wait([future], timeout=5)
+
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_tasks_submitted_together_do_not_queue_behind_one_idle_worker():
+    executor = RetrievalExecutor("test", max_workers=4)
+    # leave one idle worker behind
+    executor.wait([executor.submit("tenant", lambda: None)], timeout=5)
+
+    barrier = threading.Barrier(3, timeout=5)
+    futures = [executor.submit("tenant", barrier.wait) for _ in range(3)]
+    done, not_done = executor.wait(futures, timeout=5)
+
+    # the barrier only opens when all three tasks run at the same time
+    assert not not_done
+    assert all(future.exception() is None for future in done)
+    assert executor.stats()["workers"] == 3
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from models.dataset import ChildChunk, DocumentSegment
+from models.dataset import Document as DatasetDocument
+
+
+def _segment(segment_id: str, index_node_id: str) -> DocumentSegment:
+    return DocumentSegment(id=segment_id, dataset_id="dataset-1", index_node_id=index_node_id, content=segment_id)
+
+
+def _child_chunk(child_id: str, segment_id: str, position: int) -> ChildChunk:
+    return ChildChunk(
+        id=child_id, segment_id=segment_id, index_node_id=f"node-{child_id}", content=child_id, position=position
+    )
+
+
+def test_format_retrieval_documents_resolves_chunks_in_bulk():
+    dataset_documents = [
+        SimpleNamespace(id="parent-child-doc", doc_form=IndexType.PARENT_CHILD_INDEX, dataset_id="dataset-1"),
+        SimpleNamespace(id="paragraph-doc", doc_form=IndexType.PARAGRAPH_INDEX, dataset_id="dataset-1"),
+    ]
+    child_chunks = [
+        _child_chunk("child-1", "parent-1", 1),
+        _child_chunk("child-2", "parent-1", 2),
+        _child_chunk("child-3", "parent-2", 1),
+    ]
+    parent_segments = [_segment("parent-1", "node-parent-1"), _segment("parent-2", "node-parent-2")]
+    segments = [_segment("segment-1", "node-segment-1")]
+    results = {DatasetDocument: dataset_documents, ChildChunk: child_chunks}
+    segment_results = [parent_segments, segments]
+
+    def query(model):
+        query_mock = MagicMock()
+        rows = results[model] if model in results else segment_results.pop(0)
+        query_mock.where.return_value.options.return_value.all.return_value = rows
+        query_mock.where.return_value.all.return_value = rows
+        return query_mock
+
+    documents = [
+        Document(page_content="", metadata={"document_id": "paragraph-doc", "doc_id": "node-segment-1", "score": 0.9}),
+        Document(page_content="", metadata={"document_id": "parent-child-doc", "doc_id": "node-child-1", "score": 0.5}),
+        Document(page_content="", metadata={"document_id": "parent-child-doc", "doc_id": "node-child-3", "score": 0.4}),
+        Document(page_content="", metadata={"document_id": "parent-child-doc", "doc_id": "node-child-2", "score": 0.8}),
+        Document(page_content="", metadata={"document_id": "parent-child-doc", "doc_id": "node-missing", "score": 1.0}),
+    ]
+
+    with patch("core.rag.datasource.retrieval_service.db") as mock_db:
+        mock_db.session.query.side_effect = query
+        records = RetrievalService.format_retrieval_documents(documents)
+
+    # dataset documents, child chunks, parent segments and paragraph segments
+    assert mock_db.session.query.call_count == 4
+    assert [record.segment.id for record in records] == ["segment-1", "parent-1", "parent-2"]
+    assert records[0].score == 0.9
+    assert records[0].child_chunks is None
+    assert [child_chunk.id for child_chunk in records[1].child_chunks] == ["child-1", "child-2"]
+    assert records[1].score == 0.8
+    assert records[2].score == 0.4
@@ -0,0 +1,133 @@
+import json
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource.vdb.elasticsearch.elasticsearch_vector import ElasticSearchVector
+from core.rag.datasource.vdb.milvus.milvus_vector import MilvusVector
+from core.rag.datasource.vdb.pgvector.pgvector import PGVector
+from core.rag.datasource.vdb.qdrant.qdrant_vector import QdrantVector
+from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.weaviate.weaviate_vector import WeaviateVector
+
+IDS = [f"id-{i}" for i in range(2 * BaseVector.EXISTING_IDS_BATCH_SIZE + 50)]
+EXISTING_IDS = set(IDS[::2])
+STORED_IDS = IDS[::2]
+
+
+def _milvus_vector(lookups: list[list[str]], stored_ids: list[str] = STORED_IDS) -> BaseVector:
+    def query(collection_name, filter, output_fields, limit, offset):
+        batch_ids = json.loads(filter.split(" in ", 1)[1])
+        assert limit == len(batch_ids)
+        if offset == 0:
+            lookups.append(batch_ids)
+        matches = [id for id in stored_ids if id in batch_ids]
+        return [{"metadata": {"doc_id": id}} for id in matches[offset : offset + limit]]
+
+    vector = MilvusVector.__new__(MilvusVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    vector._client.query.side_effect = query
+    return vector
+
+
+def _qdrant_vector(lookups: list[list[str]]) -> BaseVector:
+    def retrieve(collection_name, ids, with_payload, with_vectors):
+        lookups.append(ids)
+        return [SimpleNamespace(id=id) for id in ids if id in EXISTING_IDS]
+
+    vector = QdrantVector.__new__(QdrantVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    vector._client.retrieve.side_effect = retrieve
+    return vector
+
+
+def _pgvector(lookups: list[list[str]]) -> BaseVector:
+    class Cursor:
+        rows: list[tuple[str]] = []
+
+        def execute(self, sql, params):
+            lookups.append(list(params[0]))
+            self.rows = [(id,) for id in params[0] if id in EXISTING_IDS]
+
+        def __iter__(self):
+            return iter(self.rows)
+
+    vector = PGVector.__new__(PGVector)
+    vector.table_name = "embedding_collection"
+    cursor = Cursor()
+    vector._get_cursor = lambda: nullcontext(cursor)  # type: ignore[method-assign]
+    return vector
+
+
+def _elasticsearch_vector(lookups: list[list[str]]) -> BaseVector:
+    def mget(index, ids, source):
+        lookups.append(ids)
+        return {"docs": [{"_id": id, "found": id in EXISTING_IDS} for id in ids]}
+
+    vector = ElasticSearchVector.__new__(ElasticSearchVector)
+    vector._collection_name = "collection"
+    vector._client = MagicMock()
+    vector._client.mget.side_effect = mget
+    return vector
+
+
+def _weaviate_vector(lookups: list[list[str]], stored_ids: list[str] = STORED_IDS) -> BaseVector:
+    def get(collection_name, properties):
+        query = MagicMock()
+        state: dict = {}
+
+        def with_where(where):
+            state["batch_ids"] = [operand["valueText"] for operand in where["operands"]]
+            return query
+
+        def with_limit(limit):
+            state["limit"] = limit
+            return query
+
+        def with_offset(offset):
+            state["offset"] = offset
+            return query
+
+        def do():
+            batch_ids, limit, offset = state["batch_ids"], state["limit"], state["offset"]
+            if offset == 0:
+                lookups.append(batch_ids)
+            matches = [id for id in stored_ids if id in batch_ids]
+            return {"data": {"Get": {collection_name: [{"doc_id": id} for id in matches[offset : offset + limit]]}}}
+
+        query.with_where.side_effect = with_where
+        query.with_limit.side_effect = with_limit
+        query.with_offset.side_effect = with_offset
+        query.do.side_effect = do
+        return query
+
+    vector = WeaviateVector.__new__(WeaviateVector)
+    vector._collection_name = "Collection"
+    vector._client = MagicMock()
+    vector._client.query.get.side_effect = get
+    return vector
+
+
+@pytest.mark.parametrize(
+    "vector_factory", [_milvus_vector, _qdrant_vector, _pgvector, _elasticsearch_vector, _weaviate_vector]
+)
+def test_get_existing_ids_looks_up_ids_in_batches(vector_factory):
+    lookups: list[list[str]] = []
+    vector = vector_factory(lookups)
+
+    assert vector.get_existing_ids(IDS) == EXISTING_IDS
+    assert [len(batch_ids) for batch_ids in lookups] == [100, 100, 50]
+    assert [id for batch_ids in lookups for id in batch_ids] == IDS
+
+
+@pytest.mark.parametrize("vector_factory", [_milvus_vector, _weaviate_vector])
+def test_get_existing_ids_pages_past_duplicated_doc_ids(vector_factory):
+    lookups: list[list[str]] = []
+    vector = vector_factory(lookups, stored_ids=["id-0", "id-0", "id-0", "id-1", "id-0", "id-2"])
+
+    assert vector.get_existing_ids(["id-0", "id-1", "id-2"]) == {"id-0", "id-1", "id-2"}
+    assert lookups == [["id-0", "id-1", "id-2"]]
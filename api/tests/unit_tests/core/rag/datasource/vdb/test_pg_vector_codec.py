@@ -0,0 +1,77 @@
+import json
+import struct
+import uuid
+from unittest.mock import MagicMock
+
+import numpy as np
+from pgvector.utils import from_db_binary, to_db_binary
+
+from core.rag.datasource.vdb.pg_vector_codec import (
+    PGCOPY_HEADER,
+    copy_rows_binary,
+    encode_jsonb,
+    encode_text,
+    encode_uuid,
+    to_vector_literal,
+)
+
+
+def _read_copy_rows(data: bytes) -> list[list[bytes | None]]:
+    assert data.startswith(PGCOPY_HEADER)
+    offset = len(PGCOPY_HEADER)
+    rows = []
+    while True:
+        (field_count,) = struct.unpack_from("!h", data, offset)
+        offset += 2
+        if field_count == -1:
+            break
+        row: list[bytes | None] = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from("!i", data, offset)
+            offset += 4
+            if length == -1:
+                row.append(None)
+                continue
+            row.append(data[offset : offset + length])
+            offset += length
+        rows.append(row)
+    assert offset == len(data)
+    return rows
+
+
+def test_vector_literal_round_trips_float32():
+    vector = np.random.default_rng(0).uniform(-1, 1, 1536).tolist()
+
+    literal = to_vector_literal(vector)
+
+    assert literal.startswith("[")
+    assert literal.endswith("]")
+    parsed = np.array(literal[1:-1].split(","), dtype=np.float32)
+    np.testing.assert_array_equal(parsed, np.asarray(vector, dtype=np.float32))
+    assert len(literal) < len(json.dumps(vector))
+
+
+def test_copy_rows_binary():
+    cursor = MagicMock()
+    copied = {}
+    cursor.copy_expert.side_effect = lambda sql, file: copied.update(sql=sql, data=file.read())
+    doc_id = str(uuid.uuid4())
+    embedding = [0.1, -0.2, 0.3]
+
+    copy_rows_binary(
+        cursor,
+        "embedding_test",
+        ("id", "text", "meta", "embedding"),
+        (encode_uuid, encode_text, encode_jsonb, to_db_binary),
+        [(doc_id, "你好", {"doc_id": doc_id}, embedding), (uuid.UUID(doc_id), "", None, embedding)],
+    )
+
+    assert copied["sql"] == "COPY embedding_test (id, text, meta, embedding) FROM STDIN WITH (FORMAT BINARY)"
+    rows = _read_copy_rows(copied["data"])
+    assert len(rows) == 2
+    assert rows[0][0] == uuid.UUID(doc_id).bytes
+    assert rows[0][1] == "你好".encode()
+    assert rows[0][2] == b"\x01" + json.dumps({"doc_id": doc_id}).encode()
+    np.testing.assert_array_equal(from_db_binary(rows[0][3]), np.asarray(embedding, dtype=np.float32))
+    assert rows[1][1] == b""
+    assert rows[1][2] is None
@@ -0,0 +1,75 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_factory import Vector
+from core.rag.models.document import Document
+
+
+class FakeVector(BaseVector):
+    def __init__(self, existing_ids: set[str]):
+        super().__init__("fake_collection")
+        self.existing_ids = existing_ids
+        self.text_exists_calls = 0
+
+    def get_type(self) -> str:
+        return "fake"
+
+    def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
+        pass
+
+    def add_texts(self, documents: list[Document], embeddings: list[list[float]], **kwargs):
+        pass
+
+    def text_exists(self, id: str) -> bool:
+        self.text_exists_calls += 1
+        return id in self.existing_ids
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        pass
+
+    def delete_by_metadata_field(self, key: str, value: str) -> None:
+        pass
+
+    def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
+        return []
+
+    def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
+        return []
+
+    def delete(self) -> None:
+        pass
+
+
+def _documents(*doc_ids: str) -> list[Document]:
+    return [Document(page_content=f"content {doc_id}", metadata={"doc_id": doc_id}) for doc_id in doc_ids]
+
+
+def test_default_get_existing_ids_falls_back_to_text_exists():
+    vector = FakeVector(existing_ids={"a", "c"})
+
+    assert vector.get_existing_ids(["a", "b", "c"]) == {"a", "c"}
+    assert vector.text_exists_calls == 3
+
+
+def test_filter_duplicate_texts_uses_one_bulk_lookup():
+    vector = FakeVector(existing_ids={"b", "d"})
+    vector.get_existing_ids = MagicMock(return_value={"b", "d"})  # type: ignore[method-assign]
+    documents = _documents("a", "b", "c", "d", "b")
+    documents.append(Document(page_content="without doc id", metadata={}))
+
+    filtered = vector._filter_duplicate_texts(documents)
+
+    vector.get_existing_ids.assert_called_once_with(["a", "b", "c", "d"])
+    assert [document.page_content for document in filtered] == ["content a", "content c", "without doc id"]
+
+
+def test_vector_filter_duplicate_texts_uses_one_bulk_lookup():
+    vector = Vector.__new__(Vector)
+    vector._vector_processor = MagicMock()
+    vector._vector_processor.get_existing_ids.return_value = {"a"}
+
+    filtered = vector._filter_duplicate_texts(_documents("a", "b", "a", "c"))
+
+    vector._vector_processor.get_existing_ids.assert_called_once_with(["a", "b", "c"])
+    assert [document.metadata["doc_id"] for document in filtered] == ["b", "c"]
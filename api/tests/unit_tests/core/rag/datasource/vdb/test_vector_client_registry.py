@@ -0,0 +1,148 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from core.rag.datasource.vdb.vector_client_registry import SharedConnectionPool, VectorClientRegistry
+
+
+def test_client_is_created_once_per_key():
+    registry = VectorClientRegistry()
+    create = MagicMock(side_effect=lambda: object())
+
+    first = registry.get_or_create("pgvector", ("host-a", 5432), create)
+    second = registry.get_or_create("pgvector", ("host-a", 5432), create)
+    other = registry.get_or_create("pgvector", ("host-b", 5432), create)
+
+    assert first is second
+    assert other is not first
+    assert create.call_count == 2
+
+
+def test_unhealthy_client_is_replaced(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.VECTOR_CLIENT_HEALTH_CHECK_INTERVAL", 0)
+    registry = VectorClientRegistry()
+    close = MagicMock()
+    healthy = {"value": True}
+
+    first = registry.get_or_create("qdrant", "key", object, health_check=lambda c: healthy["value"], close=close)
+    assert registry.get_or_create("qdrant", "key", object, health_check=lambda c: True) is first
+
+    healthy["value"] = False
+    second = registry.get_or_create("qdrant", "key", object, health_check=lambda c: True, close=close)
+
+    assert second is not first
+    close.assert_called_once_with(first)
+
+
+def test_health_check_does_not_block_other_clients(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.VECTOR_CLIENT_HEALTH_CHECK_INTERVAL", 0)
+    registry = VectorClientRegistry()
+    checking = threading.Event()
+    release = threading.Event()
+
+    def slow_health_check(client):
+        checking.set()
+        return release.wait(5)
+
+    slow = registry.get_or_create("pgvector", "slow", object, health_check=slow_health_check)
+    other = registry.get_or_create("pgvector", "other", object)
+    thread = threading.Thread(target=registry.get_or_create, args=("pgvector", "slow", object))
+    thread.start()
+    assert checking.wait(5)
+
+    # the slow database is being checked, lookups of other clients still go through
+    assert registry.get_or_create("pgvector", "other", object) is other
+    release.set()
+    thread.join()
+    assert registry.get_or_create("pgvector", "slow", object, health_check=slow_health_check) is slow
+
+
+def test_idle_clients_are_evicted_unless_in_use(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.VECTOR_CLIENT_IDLE_TIMEOUT", 1)
+    registry = VectorClientRegistry()
+    close = MagicMock()
+    in_use = {"idle": 0, "busy": 2}
+
+    idle = registry.get_or_create("pgvector", "idle", object, close=close, usage=lambda c: in_use["idle"])
+    busy = registry.get_or_create("pgvector", "busy", object, close=close, usage=lambda c: in_use["busy"])
+
+    with patch("core.rag.datasource.vdb.vector_client_registry.time.monotonic", return_value=10**6):
+        registry.get_or_create("pgvector", "other", object)
+
+    close.assert_called_once_with(idle)
+    assert sorted(registry.stats()) == [("pgvector", 0), ("pgvector", 2)]
+    assert registry.get_or_create("pgvector", "busy", object) is busy
+
+
+def test_clients_are_not_shared_with_forked_processes():
+    registry = VectorClientRegistry()
+    parent_client = registry.get_or_create("pgvector", "key", object)
+
+    with patch("core.rag.datasource.vdb.vector_client_registry.os.getpid", return_value=-1):
+        child_client = registry.get_or_create("pgvector", "key", object)
+
+    assert child_client is not parent_client
+
+
+@pytest.fixture
+def mock_connect():
+    with patch("psycopg2.pool.psycopg2.connect") as connect:
+        connect.side_effect = lambda *args, **kwargs: MagicMock(closed=0)
+        yield connect
+
+
+def test_shared_pool_waits_for_a_free_connection(mock_connect):
+    pool = SharedConnectionPool(1, 1, host="localhost")
+    conn = pool.getconn()
+    acquired = threading.Event()
+
+    def get_second_connection():
+        pool.putconn(pool.getconn())
+        acquired.set()
+
+    thread = threading.Thread(target=get_second_connection)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    pool.putconn(conn)
+    assert acquired.wait(5)
+    thread.join()
+    assert pool.used_connections() == 0
+
+
+def test_shared_pool_raises_when_exhausted(mock_connect, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.VECTOR_POOL_CONNECTION_TIMEOUT", 0.05)
+    pool = SharedConnectionPool(1, 1, host="localhost")
+    conn = pool.getconn()
+
+    with pytest.raises(psycopg2.pool.PoolError, match="connection pool exhausted"):
+        pool.getconn()
+
+    pool.putconn(conn)
+    pool.putconn(pool.getconn())
+    assert pool.used_connections() == 0
+
+
+def test_shared_pool_replaces_closed_connections(mock_connect):
+    pool = SharedConnectionPool(1, 2, host="localhost")
+    conn = pool.getconn()
+    conn.closed = 2
+    pool.putconn(conn)
+
+    new_conn = pool.getconn()
+
+    assert new_conn is not conn
+    assert not new_conn.closed
+
+
+def test_shared_pool_ping(mock_connect):
+    pool = SharedConnectionPool(1, 1, host="localhost")
+    assert pool.ping()
+
+    conn = pool.getconn()
+    conn.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError()
+    pool.putconn(conn)
+    assert not pool.ping()
+    assert pool.used_connections() == 0
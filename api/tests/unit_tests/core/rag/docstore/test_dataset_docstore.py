@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.rag.docstore.dataset_docstore import DatasetDocumentStore
+from core.rag.models.document import ChildDocument, Document
+from models.dataset import ChildChunk, DocumentSegment
+
+
+def _document(doc_id: str, children: int = 0) -> Document:
+    return Document(
+        page_content=f"content {doc_id}",
+        metadata={"doc_id": doc_id, "doc_hash": f"hash {doc_id}"},
+        children=[
+            ChildDocument(page_content=f"child {doc_id} {i}", metadata={"doc_id": f"{doc_id}-{i}", "doc_hash": "h"})
+            for i in range(children)
+        ],
+    )
+
+
+@pytest.fixture
+def mock_db():
+    with patch("core.rag.docstore.dataset_docstore.db") as db:
+        db.session.query.return_value.where.return_value.scalar.return_value = 3
+        db.session.scalars.return_value = []
+        yield db
+
+
+@pytest.fixture
+def mock_insert():
+    with patch("core.rag.docstore.dataset_docstore.insert") as insert:
+        yield insert
+
+
+def _store() -> DatasetDocumentStore:
+    dataset = MagicMock(id="dataset-id", tenant_id="tenant-id", indexing_technique="economy")
+    return DatasetDocumentStore(dataset=dataset, user_id="user-id", document_id="document-id")
+
+
+def _inserted_rows(mock_insert, model) -> list[dict]:
+    rows = []
+    for insert_call, values_call in zip(mock_insert.call_args_list, mock_insert.return_value.values.call_args_list):
+        if insert_call.args[0] is model:
+            rows.extend(values_call.args[0])
+    return rows
+
+
+def test_new_segments_are_inserted_in_bulk(mock_db, mock_insert):
+    _store().add_documents([_document("a", children=2), _document("b"), _document("c", children=1)], save_child=True)
+
+    mock_db.session.scalars.assert_called_once()
+    mock_db.session.add.assert_not_called()
+    segments = _inserted_rows(mock_insert, DocumentSegment)
+    assert [(row["index_node_id"], row["position"]) for row in segments] == [("a", 4), ("b", 5), ("c", 6)]
+    assert all(row["enabled"] is False and row["document_id"] == "document-id" for row in segments)
+    children = _inserted_rows(mock_insert, ChildChunk)
+    segment_ids = {row["index_node_id"]: row["id"] for row in segments}
+    assert [(row["segment_id"], row["position"]) for row in children] == [
+        (segment_ids["a"], 1),
+        (segment_ids["a"], 2),
+        (segment_ids["c"], 1),
+    ]
+    mock_db.session.commit.assert_called_once()
+
+
+def test_existing_segments_are_updated(mock_db, mock_insert):
+    existing = MagicMock(id="segment-b", index_node_id="b")
+    mock_db.session.scalars.return_value = [existing]
+
+    _store().add_documents([_document("a"), _document("b", children=1)], save_child=True)
+
+    assert existing.content == "content b"
+    assert existing.index_node_hash == "hash b"
+    assert [row["index_node_id"] for row in _inserted_rows(mock_insert, DocumentSegment)] == ["a"]
+    assert [row["segment_id"] for row in _inserted_rows(mock_insert, ChildChunk)] == ["segment-b"]
+
+
+def test_existing_segments_are_rejected_without_allow_update(mock_db, mock_insert):
+    mock_db.session.scalars.return_value = [MagicMock(id="segment-a", index_node_id="a")]
+
+    with pytest.raises(ValueError, match="already exists"):
+        _store().add_documents([_document("a")], allow_update=False)
+
+    mock_insert.assert_not_called()
+
+
+def test_repeated_doc_ids_are_rejected_without_allow_update(mock_db, mock_insert):
+    with pytest.raises(ValueError, match="doc_id a already exists"):
+        _store().add_documents([_document("a"), _document("b"), _document("a")], allow_update=False)
+
+    mock_insert.assert_not_called()
+    mock_db.session.commit.assert_not_called()
+
+
+def test_existing_segments_without_children_keep_their_child_chunks(mock_db, mock_insert):
+    mock_db.session.scalars.return_value = [
+        MagicMock(id="segment-a", index_node_id="a"),
+        MagicMock(id="segment-b", index_node_id="b"),
+    ]
+
+    _store().add_documents([_document("a"), _document("b", children=1)], save_child=True)
+
+    delete_query = mock_db.session.query.return_value.where
+    deleted_segment_ids = [
+        call.args[-1].right.value for call in delete_query.call_args_list if call.args and len(call.args) == 4
+    ]
+    assert deleted_segment_ids == [["segment-b"]]
+    assert [row["segment_id"] for row in _inserted_rows(mock_insert, ChildChunk)] == ["segment-b"]
@@ -0,0 +1,152 @@
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from core.model_runtime.entities.model_entities import ModelPropertyKey
+from core.model_runtime.errors.invoke import InvokeRateLimitError
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from libs import helper
+from models.dataset import Embedding
+
+
+def test_embedding_binary_roundtrip(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.EMBEDDING_CACHE_BINARY_FORMAT_ENABLED", True)
+    vector = [0.1, -0.25, 0.5]
+    data = Embedding.encode_embedding(vector)
+
+    assert data.startswith(Embedding.BINARY_EMBEDDING_PREFIX)
+    assert len(data) == len(Embedding.BINARY_EMBEDDING_PREFIX) + 8 * len(vector)
+    # a cache hit returns exactly the vector that was stored
+    assert Embedding.decode_embedding(data) == vector
+
+
+def test_embedding_pickled_until_binary_format_enabled():
+    vector = [0.1, -0.25, 0.5]
+    data = Embedding.encode_embedding(vector)
+
+    # readable by versions that only know pickled embeddings
+    assert pickle.loads(data) == vector  # noqa: S301
+    assert Embedding.decode_embedding(data) == vector
+
+
+def test_embedding_decode_legacy_pickle():
+    vector = [0.1, -0.25, 0.5]
+    assert Embedding.decode_embedding(pickle.dumps(vector, protocol=pickle.HIGHEST_PROTOCOL)) == vector
+
+
+@pytest.fixture
+def model_instance():
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "text-embedding-3-small"
+    model_schema = MagicMock()
+    model_schema.model_properties = {ModelPropertyKey.MAX_CHUNKS: 2}
+    model_instance.model_type_instance.get_model_schema.return_value = model_schema
+    model_instance.invoke_text_embedding.side_effect = lambda texts, **kwargs: MagicMock(
+        embeddings=[[float(len(text)), 0.0] for text in texts]
+    )
+    return model_instance
+
+
+def test_embed_documents_bulk_lookup_and_upsert(model_instance):
+    texts = ["cached", "a", "bb", "a", "ccc"]
+    cached_hash = helper.generate_text_hash("cached")
+    mock_db = MagicMock()
+    mock_db.session.execute.side_effect = [
+        [(cached_hash, Embedding.encode_embedding([0.0, 1.0]))],
+        None,
+    ]
+
+    with patch("core.rag.embedding.cached_embedding.db", mock_db):
+        embeddings = CacheEmbedding(model_instance).embed_documents(texts)
+
+    # one bulk lookup for all hashes and one multi-row insert for the new ones
+    assert mock_db.session.execute.call_count == 2
+    mock_db.session.commit.assert_called_once()
+    insert_stmt = mock_db.session.execute.call_args_list[1].args[0]
+    assert len(insert_stmt._multi_values[0]) == 3
+
+    # only uncached texts are sent to the model, in max_chunks sized batches
+    invoked = [call.kwargs["texts"] for call in model_instance.invoke_text_embedding.call_args_list]
+    assert invoked == [["a", "bb"], ["a", "ccc"]]
+
+    assert embeddings[0] == [0.0, 1.0]
+    assert embeddings[1] == embeddings[3] == [1.0, 0.0]
+    assert np.allclose(embeddings[4], [1.0, 0.0])
+
+
+def test_build_embedding_batches_by_token_budget(model_instance):
+    model_instance.get_text_embedding_num_tokens.side_effect = lambda texts: [len(text) for text in texts]
+    texts = ["aaaa", "bb", "cc", "dddddd", "e", "f", "g"]
+
+    with patch("core.rag.embedding.cached_embedding.dify_config") as mock_config:
+        mock_config.EMBEDDING_BATCH_MAX_TOKENS = 6
+        batches = CacheEmbedding(model_instance)._build_embedding_batches(texts, max_chunks=2)
+
+    assert batches == [["aaaa", "bb"], ["cc"], ["dddddd"], ["e", "f"], ["g"]]
+
+
+def test_embed_batches_concurrently_preserves_order(model_instance):
+    batches = [["a"], ["bb"], ["ccc"], ["dddd"]]
+
+    with patch("core.rag.embedding.cached_embedding.dify_config") as mock_config:
+        mock_config.EMBEDDING_CONCURRENT_BATCHES = 3
+        mock_config.EMBEDDING_EXECUTOR_WORKERS = 8
+        mock_config.EMBEDDING_RATE_LIMIT_MAX_RETRIES = 0
+        results = CacheEmbedding(model_instance)._embed_batches(batches)
+
+    assert results == [[[1.0, 0.0]], [[2.0, 0.0]], [[3.0, 0.0]], [[4.0, 0.0]]]
+
+
+def test_concurrent_batches_are_bounded_across_calls(model_instance):
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def invoke_text_embedding(texts, **kwargs):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return MagicMock(embeddings=[[float(len(text)), 0.0] for text in texts])
+
+    model_instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    batches = [["a"], ["bb"], ["ccc"], ["dddd"], ["eeeee"]]
+
+    with patch("core.rag.embedding.cached_embedding.dify_config") as mock_config:
+        mock_config.EMBEDDING_CONCURRENT_BATCHES = 2
+        mock_config.EMBEDDING_EXECUTOR_WORKERS = 8
+        mock_config.EMBEDDING_RATE_LIMIT_MAX_RETRIES = 0
+        # two indexing calls of the same tenant and model at once
+        with ThreadPoolExecutor(max_workers=2) as callers:
+            futures = [callers.submit(CacheEmbedding(model_instance)._embed_batches, batches) for _ in range(2)]
+            results = [future.result(5) for future in futures]
+
+    assert results == [[[[float(i), 0.0]] for i in range(1, 6)]] * 2
+    assert max_in_flight == 2
+
+
+def test_invoke_embedding_batch_backs_off_on_rate_limit(model_instance):
+    model_instance.invoke_text_embedding.side_effect = [
+        InvokeRateLimitError("rate limited"),
+        MagicMock(embeddings=[[1.0, 0.0]]),
+    ]
+
+    with (
+        patch("core.rag.embedding.cached_embedding.dify_config") as mock_config,
+        patch("core.rag.embedding.cached_embedding.time.sleep") as mock_sleep,
+    ):
+        mock_config.EMBEDDING_CONCURRENT_BATCHES = 1
+        mock_config.EMBEDDING_RATE_LIMIT_MAX_RETRIES = 1
+        assert CacheEmbedding(model_instance)._invoke_embedding_batch(["a"]) == [[1.0, 0.0]]
+
+    mock_sleep.assert_called_once()
+    assert model_instance.invoke_text_embedding.call_count == 2
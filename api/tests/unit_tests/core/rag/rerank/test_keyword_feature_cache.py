@@ -0,0 +1,71 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from core.rag.rerank.keyword_feature_cache import KeywordFeatureCache
+from extensions.ext_redis import redis_client
+
+
+def _document(doc_id: str, doc_hash: str | None, content: str = "content") -> Document:
+    metadata = {"doc_id": doc_id, "dataset_id": "dataset-1"}
+    if doc_hash:
+        metadata["doc_hash"] = doc_hash
+    return Document(page_content=content, metadata=metadata)
+
+
+def test_get_documents_keywords_resolution_order():
+    keyword_table_handler = MagicMock()
+    keyword_table_handler.extract_keywords.side_effect = lambda text, _: {f"extracted {text}"}
+    documents = [
+        _document("stored-node", "stored-hash"),
+        _document("redis-node", "redis-hash"),
+        _document("new-node", "new-hash", content="new"),
+        _document("external-node", None, content="external"),
+    ]
+    redis_client.mget.return_value = [json.dumps(["from", "redis"]), None]
+
+    with patch("core.rag.rerank.keyword_feature_cache.db") as mock_db:
+        mock_db.session.execute.return_value = [("dataset-1", "stored-node", ["stored", "keywords"])]
+        documents_keywords = KeywordFeatureCache(keyword_table_handler).get_documents_keywords(documents)
+
+    assert documents_keywords == [
+        {"stored", "keywords"},
+        {"from", "redis"},
+        {"extracted new"},
+        {"extracted external"},
+    ]
+    redis_client.mget.assert_called_once_with(["keyword_features:redis-hash", "keyword_features:new-hash"])
+    redis_client.pipeline.return_value.setex.assert_called_once_with(
+        "keyword_features:new-hash", 86400, json.dumps(["extracted new"])
+    )
+
+    # the second lookup is served from the in-process cache
+    redis_client.mget.reset_mock()
+    keyword_table_handler.extract_keywords.reset_mock()
+    with patch("core.rag.rerank.keyword_feature_cache.db") as mock_db:
+        mock_db.session.execute.return_value = []
+        documents_keywords = KeywordFeatureCache(keyword_table_handler).get_documents_keywords(documents[1:3])
+
+    assert documents_keywords == [{"from", "redis"}, {"extracted new"}]
+    redis_client.mget.assert_not_called()
+    keyword_table_handler.extract_keywords.assert_not_called()
+
+
+def test_extracted_keywords_are_capped_like_stored_keywords():
+    content = " ".join(f"keyword{i}" * (i + 1) + f" keyword{i}" for i in range(30))
+    keyword_table_handler = JiebaKeywordTableHandler()
+    stored_keywords = sorted(keyword_table_handler.extract_keywords(content, 10))
+    documents = [
+        _document("stored-node", "stored-top-k", content),
+        _document("unstored-node", "unstored-top-k", content),
+    ]
+    redis_client.mget.return_value = [None, None]
+
+    with patch("core.rag.rerank.keyword_feature_cache.db") as mock_db:
+        mock_db.session.execute.return_value = [("dataset-1", "stored-node", stored_keywords)]
+        documents_keywords = KeywordFeatureCache(keyword_table_handler).get_documents_keywords(documents)
+
+    # the same chunk gets the same features whether its keywords were stored or extracted
+    assert documents_keywords[0] == documents_keywords[1] == set(stored_keywords)
+    assert len(documents_keywords[1]) <= 10
@@ -0,0 +1,55 @@
+import math
+from collections import Counter
+
+import pytest
+
+from core.rag.rerank.keyword_scorer import KeywordScoreMethod, KeywordScorer
+
+
+def _reference_tfidf_cosine(query_keywords, documents_keywords):
+    """The dict based algorithm previously used by WeightRerankRunner."""
+    total_documents = len(documents_keywords)
+    all_keywords = set().union(*documents_keywords)
+    keyword_idf = {
+        keyword: math.log((1 + total_documents) / (1 + sum(1 for d in documents_keywords if keyword in d))) + 1
+        for keyword in all_keywords
+    }
+    query_tfidf = {k: c * keyword_idf.get(k, 0) for k, c in Counter(query_keywords).items()}
+    similarities = []
+    for document_keywords in documents_keywords:
+        document_tfidf = {k: c * keyword_idf.get(k, 0) for k, c in Counter(document_keywords).items()}
+        numerator = sum(query_tfidf[k] * document_tfidf[k] for k in set(query_tfidf) & set(document_tfidf))
+        denominator = math.sqrt(sum(v**2 for v in query_tfidf.values())) * math.sqrt(
+            sum(v**2 for v in document_tfidf.values())
+        )
+        similarities.append(numerator / denominator if denominator else 0.0)
+    return similarities
+
+
+def test_tfidf_cosine_matches_reference():
+    documents_keywords = [{f"word{(i * j + i) % 50}" for j in range(i % 15)} for i in range(120)]
+    query_keywords = {"word1", "word7", "word13", "word42", "unseen"}
+
+    scores = KeywordScorer().score_keywords(query_keywords, documents_keywords)
+
+    assert scores == pytest.approx(_reference_tfidf_cosine(query_keywords, documents_keywords))
+
+
+def test_tfidf_cosine_without_overlap():
+    assert KeywordScorer().score_keywords({"apple"}, [{"banana"}, set()]) == [0.0, 0.0]
+    assert KeywordScorer().score_keywords({"apple"}, []) == []
+
+
+def test_bm25_ranks_rare_and_short_matches_higher():
+    documents_keywords = [
+        {"apple", "banana", "cherry", "date", "elderberry"},
+        {"apple", "banana"},
+        {"banana", "fig"},
+        {"grape"},
+    ]
+
+    scores = KeywordScorer(KeywordScoreMethod.BM25).score_keywords({"apple"}, documents_keywords)
+
+    assert scores[1] == pytest.approx(1.0)
+    assert 0 < scores[0] < scores[1]
+    assert scores[2] == scores[3] == 0.0
@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock, patch
+
+from core.rag.models.document import Document
+from core.rag.retrieval.dataset_retrieval import DatasetRetrieval
+from core.rag.retrieval.retrieval_methods import RetrievalMethod
+
+
+def _dataset(
+    provider="vendor",
+    indexing_technique="high_quality",
+    embedding_model_provider="openai",
+    embedding_model="text-embedding-3-small",
+    search_method=RetrievalMethod.SEMANTIC_SEARCH.value,
+):
+    return MagicMock(
+        provider=provider,
+        indexing_technique=indexing_technique,
+        embedding_model_provider=embedding_model_provider,
+        embedding_model=embedding_model,
+        retrieval_model={"search_method": search_method},
+    )
+
+
+def test_query_is_embedded_once_per_shared_embedding_model():
+    datasets = [
+        _dataset(),
+        _dataset(search_method=RetrievalMethod.HYBRID_SEARCH.value),
+        _dataset(embedding_model="text-embedding-3-large"),
+        _dataset(search_method=RetrievalMethod.FULL_TEXT_SEARCH.value, embedding_model="text-embedding-3-large"),
+        _dataset(indexing_technique="economy", embedding_model="text-embedding-3-large"),
+        _dataset(provider="external", embedding_model="text-embedding-3-large"),
+    ]
+    with (
+        patch("core.rag.retrieval.dataset_retrieval.ModelManager") as mock_model_manager,
+        patch("core.rag.retrieval.dataset_retrieval.CacheEmbedding") as mock_cache_embedding,
+    ):
+        mock_cache_embedding.return_value.embed_query.return_value = [0.1, 0.2]
+
+        query_vectors = DatasetRetrieval()._embed_query_for_datasets("tenant", datasets, "query")
+
+    # only the small model is shared by two semantically searched datasets
+    assert query_vectors == {("openai", "text-embedding-3-small"): [0.1, 0.2]}
+    mock_model_manager.return_value.get_model_instance.assert_called_once()
+    mock_cache_embedding.return_value.embed_query.assert_called_once_with("query")
+
+
+def test_query_embedding_failure_falls_back_to_per_dataset_embedding():
+    with (
+        patch("core.rag.retrieval.dataset_retrieval.ModelManager"),
+        patch("core.rag.retrieval.dataset_retrieval.CacheEmbedding") as mock_cache_embedding,
+    ):
+        mock_cache_embedding.return_value.embed_query.side_effect = ValueError("quota exceeded")
+
+        query_vectors = DatasetRetrieval()._embed_query_for_datasets("tenant", [_dataset(), _dataset()], "query")
+
+    assert query_vectors == {}
+
+
+def test_calculate_vector_score_keeps_top_k_by_score():
+    documents = [
+        Document(page_content=str(score), metadata={"score": score}) for score in (0.3, 0.9, 0.1, 0.7, 0.9, 0.5)
+    ]
+    retrieval = DatasetRetrieval()
+
+    top = retrieval.calculate_vector_score(documents, top_k=3, score_threshold=0.2)
+    all_above_threshold = retrieval.calculate_vector_score(documents, top_k=0, score_threshold=0.2)
+
+    assert [document.metadata["score"] for document in top] == [0.9, 0.9, 0.7]
+    assert top[0] is documents[1]
+    assert [document.metadata["score"] for document in all_above_threshold] == [0.9, 0.9, 0.7, 0.5, 0.3]
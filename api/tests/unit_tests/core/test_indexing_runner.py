@@ -0,0 +1,272 @@
+import threading
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+from flask import Flask, current_app
+
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+
+
+def _text_docs(count: int) -> list[Document]:
+    return [Document(page_content=f"text {i}", metadata={"doc_id": str(i)}) for i in range(count)]
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.INDEXING_STREAMING_BATCH_SIZE", 2)
+    monkeypatch.setattr("configs.dify_config.INDEXING_STREAMING_MAX_PENDING_BATCHES", 1)
+    runner = IndexingRunner.__new__(IndexingRunner)
+    runner._transform = MagicMock(side_effect=lambda _, __, text_docs, ___, ____: list(text_docs))  # type: ignore
+    runner._save_segments = MagicMock()  # type: ignore
+    runner._update_document_index_status = MagicMock()  # type: ignore
+    runner._save_split_checkpoint = MagicMock()  # type: ignore
+    runner._clear_split_checkpoint = MagicMock()  # type: ignore
+    with Flask(__name__).app_context(), patch("core.indexing_runner.db"):
+        yield runner
+
+
+def _dataset_document(doc_form: str = IndexType.PARAGRAPH_INDEX) -> MagicMock:
+    return MagicMock(id="document-id", doc_form=doc_form)
+
+
+def test_streaming_indexes_batches_in_order(runner):
+    indexed: list[list[str]] = []
+
+    def index_documents(index_processor, dataset, dataset_document, documents):
+        indexed.append([document.page_content for document in documents])
+        return len(documents)
+
+    runner._index_documents = MagicMock(side_effect=index_documents)
+
+    runner._run_streaming(MagicMock(), MagicMock(), _dataset_document(), _text_docs(5), {})
+
+    assert indexed == [["text 0", "text 1"], ["text 2", "text 3"], ["text 4"]]
+    assert runner._save_segments.call_count == 3
+    statuses = [call.kwargs["after_indexing_status"] for call in runner._update_document_index_status.call_args_list]
+    assert statuses == ["indexing", "completed"]
+    completed_params = runner._update_document_index_status.call_args.kwargs["extra_update_params"]
+    assert 5 in completed_params.values()
+
+
+def test_streaming_bounds_pending_batches(runner):
+    release = threading.Event()
+    first_batch_loading = threading.Event()
+
+    def index_documents(index_processor, dataset, dataset_document, documents):
+        first_batch_loading.set()
+        assert release.wait(5)
+        return 0
+
+    runner._index_documents = MagicMock(side_effect=index_documents)
+    flask_app = current_app._get_current_object()
+
+    def run_streaming():
+        with flask_app.app_context():
+            runner._run_streaming(MagicMock(), MagicMock(), _dataset_document(), _text_docs(10), {})
+
+    thread = threading.Thread(target=run_streaming)
+    thread.start()
+    assert first_batch_loading.wait(5)
+    # one batch is loading and one is pending, the splitting thread waits before transforming a third
+    threading.Event().wait(0.2)
+    assert runner._transform.call_count == 3
+
+    release.set()
+    thread.join(5)
+    assert runner._transform.call_count == 5
+
+
+def test_streaming_stops_splitting_when_loading_fails(runner):
+    runner._index_documents = MagicMock(side_effect=ValueError("embedding failed"))
+
+    with pytest.raises(ValueError, match="embedding failed"):
+        runner._run_streaming(MagicMock(), MagicMock(), _dataset_document(), _text_docs(10), {})
+
+    assert runner._transform.call_count < 5
+    statuses = [call.kwargs["after_indexing_status"] for call in runner._update_document_index_status.call_args_list]
+    assert "completed" not in statuses
+
+
+def test_streaming_propagates_splitting_errors(runner):
+    runner._transform.side_effect = ValueError("split failed")
+    runner._index_documents = MagicMock()
+
+    with pytest.raises(ValueError, match="split failed"):
+        runner._run_streaming(MagicMock(), MagicMock(), _dataset_document(), _text_docs(3), {})
+
+    runner._index_documents.assert_not_called()
+
+
+def test_streaming_resumes_from_split_checkpoint_after_failing_midway(runner):
+    def transform(index_processor, dataset, text_docs, doc_language, process_rule):
+        if text_docs[0].page_content == "text 4":
+            raise ValueError("split failed")
+        return list(text_docs)
+
+    runner._transform.side_effect = transform
+    runner._index_documents = MagicMock(side_effect=lambda _, __, ___, documents: len(documents))
+
+    with pytest.raises(ValueError, match="split failed"):
+        runner._run_streaming(MagicMock(), MagicMock(), _dataset_document(), _text_docs(7), {})
+
+    # a checkpoint is recorded after the segments of each split batch are saved
+    assert [call.args for call in runner._save_split_checkpoint.call_args_list] == [
+        ("document-id", 2),
+        ("document-id", 4),
+    ]
+    runner._clear_split_checkpoint.assert_called_once_with("document-id")
+
+    runner._transform.reset_mock()
+    runner._transform.side_effect = lambda _, __, text_docs, ___, ____: list(text_docs)
+    runner._index_documents.reset_mock()
+    runner._clear_split_checkpoint.reset_mock()
+    pending_documents = _text_docs(4)[2:]
+
+    runner._run_streaming(
+        MagicMock(),
+        MagicMock(),
+        _dataset_document(),
+        _text_docs(7),
+        {},
+        split_text_docs=4,
+        pending_documents=pending_documents,
+        completed_tokens=2,
+    )
+
+    transformed = [[document.page_content for document in call.args[2]] for call in runner._transform.call_args_list]
+    assert transformed == [["text 4", "text 5"], ["text 6"]]
+    assert runner._index_documents.call_args_list[0].args[3] == pending_documents
+    # the checkpoint is only dropped once the whole document is split
+    runner._clear_split_checkpoint.assert_called_once_with("document-id")
+    completed_params = runner._update_document_index_status.call_args.kwargs["extra_update_params"]
+    assert 7 in completed_params.values()
+
+
+def test_run_in_streaming_status_drops_segments_after_split_checkpoint():
+    runner = IndexingRunner.__new__(IndexingRunner)
+    runner._extract = MagicMock(return_value=_text_docs(7))  # type: ignore
+    runner._run_streaming = MagicMock()  # type: ignore
+    segments = [
+        MagicMock(status="completed", tokens=7, index_node_id="a", position=1),
+        MagicMock(status="indexing", tokens=3, index_node_id="b", position=2, content="content b"),
+        MagicMock(status="indexing", tokens=3, index_node_id="c", position=3, content="content c"),
+    ]
+    index_processor = MagicMock()
+
+    with (
+        patch("core.indexing_runner.db") as mock_db,
+        patch("core.indexing_runner.IndexProcessorFactory") as index_processor_factory,
+        patch.object(IndexingRunner, "get_split_checkpoint", return_value=(4, 2)),
+    ):
+        mock_db.session.query.return_value.filter_by.return_value.all.return_value = segments
+        index_processor_factory.return_value.init_index_processor.return_value = index_processor
+        runner.run_in_streaming_status(_dataset_document())
+
+    dataset = mock_db.session.query().filter_by().first()
+    assert index_processor.clean.call_args_list == [
+        call(dataset, ["c"], with_keywords=True, delete_child_chunks=True),
+        call(dataset, ["b"], with_keywords=False),
+    ]
+    mock_db.session.delete.assert_called_once_with(segments[2])
+    streaming_kwargs = runner._run_streaming.call_args.kwargs
+    assert streaming_kwargs["split_text_docs"] == 4
+    assert [document.metadata["doc_id"] for document in streaming_kwargs["pending_documents"]] == ["b"]
+    assert streaming_kwargs["completed_tokens"] == 7
+
+
+def test_full_doc_parent_child_is_not_streamed(runner):
+    parent_child = _dataset_document(IndexType.PARENT_CHILD_INDEX)
+
+    assert IndexingRunner._is_streaming_enabled(_dataset_document(), {})
+    assert IndexingRunner._is_streaming_enabled(parent_child, {"rules": {"parent_mode": "paragraph"}})
+    assert not IndexingRunner._is_streaming_enabled(parent_child, {"rules": {"parent_mode": "full-doc"}})
+
+
+def test_streaming_is_disabled_by_default(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.INDEXING_STREAMING_BATCH_SIZE", 0)
+
+    assert not IndexingRunner._is_streaming_enabled(_dataset_document(), {})
+
+
+def test_process_chunk_commits_a_checkpoint_per_batch(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.INDEXING_CHECKPOINT_BATCH_SIZE", 2)
+    runner = IndexingRunner.__new__(IndexingRunner)
+    index_processor = MagicMock()
+    embedding_model_instance = MagicMock()
+    embedding_model_instance.get_text_embedding_num_tokens.side_effect = lambda texts: [1] * len(texts)
+    paused_after_batches = 2
+    loaded_batches: list[list[str]] = []
+
+    def check_paused(document_id):
+        if len(loaded_batches) == paused_after_batches:
+            raise DocumentIsPausedError()
+
+    runner._check_document_paused_status = MagicMock(side_effect=check_paused)  # type: ignore
+    index_processor.load.side_effect = lambda dataset, documents, with_keywords: loaded_batches.append(
+        [document.page_content for document in documents]
+    )
+
+    with patch("core.indexing_runner.db") as mock_db, pytest.raises(DocumentIsPausedError):
+        runner._process_chunk(
+            Flask(__name__), index_processor, _text_docs(5), MagicMock(), _dataset_document(), embedding_model_instance
+        )
+
+    assert loaded_batches == [["text 0", "text 1"], ["text 2", "text 3"]]
+    assert mock_db.session.commit.call_count == 2
+
+
+def test_run_in_indexing_status_resumes_after_completed_segments():
+    runner = IndexingRunner.__new__(IndexingRunner)
+    runner._load = MagicMock()  # type: ignore
+    segments = [
+        MagicMock(status="completed", tokens=7, index_node_id="a"),
+        MagicMock(status="indexing", tokens=3, index_node_id="b", content="content b"),
+    ]
+    index_processor = MagicMock()
+
+    with (
+        patch("core.indexing_runner.db") as mock_db,
+        patch("core.indexing_runner.IndexProcessorFactory") as index_processor_factory,
+    ):
+        mock_db.session.query.return_value.filter_by.return_value.all.return_value = segments
+        index_processor_factory.return_value.init_index_processor.return_value = index_processor
+        runner.run_in_indexing_status(_dataset_document())
+
+    index_processor.clean.assert_called_once_with(
+        mock_db.session.query().filter_by().first(), ["b"], with_keywords=False
+    )
+    load_kwargs = runner._load.call_args.kwargs
+    assert [document.metadata["doc_id"] for document in load_kwargs["documents"]] == ["b"]
+    assert load_kwargs["completed_tokens"] == 7
+
+
+def test_run_in_splitting_status_cleans_the_index_of_existing_segments():
+    runner = IndexingRunner.__new__(IndexingRunner)
+    runner._extract = MagicMock(return_value=_text_docs(3))  # type: ignore
+    runner._transform = MagicMock(return_value=[])  # type: ignore
+    runner._load_segments = MagicMock()  # type: ignore
+    runner._load = MagicMock()  # type: ignore
+    segments = [MagicMock(index_node_id="a"), MagicMock(index_node_id="b")]
+    index_processor = MagicMock()
+
+    with (
+        patch("core.indexing_runner.db") as mock_db,
+        patch("core.indexing_runner.IndexProcessorFactory") as index_processor_factory,
+        patch.object(IndexingRunner, "_is_streaming_enabled", return_value=False),
+    ):
+        mock_db.session.query.return_value.filter_by.return_value.all.return_value = segments
+        index_processor_factory.return_value.init_index_processor.return_value = index_processor
+        manager = MagicMock()
+        manager.attach_mock(index_processor.clean, "clean")
+        manager.attach_mock(mock_db.session.delete, "delete")
+        runner.run_in_splitting_status(_dataset_document())
+
+    dataset = mock_db.session.query().filter_by().first()
+    # vectors and keywords are removed before the segments they were built from
+    assert manager.mock_calls == [
+        call.clean(dataset, ["a", "b"], with_keywords=True, delete_child_chunks=True),
+        call.delete(segments[0]),
+        call.delete(segments[1]),
+    ]
@@ -0,0 +1,166 @@
+import threading
+import time
+from concurrent.futures import wait
+
+import pytest
+
+from core.workflow.graph_engine.graph_engine import GraphEngineThreadPool
+from core.workflow.graph_engine.workflow_scheduler import WorkflowScheduler
+
+
+class _Probe:
+    """Counts how many probed tasks run at once, the tasks block until released."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.release = threading.Event()
+
+    def __call__(self, value=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        assert self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+        return value
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_group_limit():
+    scheduler = WorkflowScheduler(max_workers=10, tenant_max_workers=10, nested_max_tasks=10)
+    group = scheduler.create_group("tenant", max_workers=2)
+    probe = _Probe()
+
+    futures = [group.submit(probe, i) for i in range(6)]
+    _wait_until(lambda: probe.running == 2)
+    time.sleep(0.05)
+    assert probe.running == 2
+    probe.release.set()
+
+    assert [future.result(5) for future in futures] == list(range(6))
+    assert probe.max_running == 2
+
+
+def test_tenant_and_process_limits():
+    scheduler = WorkflowScheduler(max_workers=3, tenant_max_workers=2, nested_max_tasks=10)
+    probe = _Probe()
+
+    futures = [scheduler.create_group(tenant, max_workers=10).submit(probe) for tenant in ("a", "a", "a", "b", "c")]
+    _wait_until(lambda: probe.running == 3)
+    time.sleep(0.05)
+    assert scheduler.stats()["running_tasks"] == 3
+    assert scheduler.stats()["queue_depth"] == 2
+    probe.release.set()
+
+    wait(futures, timeout=5)
+    assert all(future.done() for future in futures)
+    assert probe.max_running == 3
+
+
+def test_groups_are_served_round_robin():
+    scheduler = WorkflowScheduler(max_workers=1, tenant_max_workers=1, nested_max_tasks=10)
+    gate = _Probe()
+    order = []
+    busy_group = scheduler.create_group("tenant", max_workers=1)
+    other_group = scheduler.create_group("tenant", max_workers=1)
+
+    blocker = busy_group.submit(gate)
+    _wait_until(lambda: gate.running == 1)
+    busy_futures = [busy_group.submit(order.append, f"busy-{i}") for i in range(3)]
+    other_future = other_group.submit(order.append, "other")
+    gate.release.set()
+
+    wait([blocker, other_future, *busy_futures], timeout=5)
+    assert order.index("other") <= 1
+
+
+def test_nested_tasks_bypass_process_limit():
+    scheduler = WorkflowScheduler(max_workers=1, tenant_max_workers=1, nested_max_tasks=10)
+    group = scheduler.create_group("tenant", max_workers=5)
+
+    def parent():
+        # the parent holds the only process slot while it waits for its children
+        children = [group.submit(lambda i=i: i) for i in range(3)]
+        return [child.result(5) for child in children]
+
+    assert group.submit(parent).result(5) == [0, 1, 2]
+
+
+def test_nested_tasks_are_capped_per_process():
+    scheduler = WorkflowScheduler(max_workers=1, tenant_max_workers=1, nested_max_tasks=2)
+    group = scheduler.create_group("tenant", max_workers=5)
+    probe = _Probe()
+
+    def parent():
+        children = [group.submit(probe), group.submit(probe)]
+        _wait_until(lambda: probe.running == 2)
+        stats = scheduler.stats()
+        assert (stats["running_tasks"], stats["nested_running_tasks"]) == (1, 2)
+        try:
+            with pytest.raises(ValueError, match="Max nested task count 2"):
+                group.submit(probe)
+        finally:
+            probe.release.set()
+        wait(children, timeout=5)
+        # finished children free their slots
+        return group.submit(lambda: "after").result(5)
+
+    assert group.submit(parent).result(5) == "after"
+    _wait_until(lambda: scheduler._nested_in_flight == 0)
+
+
+def test_cancel_pending():
+    scheduler = WorkflowScheduler(max_workers=1, tenant_max_workers=1, nested_max_tasks=10)
+    group = scheduler.create_group("tenant", max_workers=1)
+    probe = _Probe()
+
+    running = group.submit(probe)
+    _wait_until(lambda: probe.running == 1)
+    pending = [group.submit(probe) for _ in range(2)]
+
+    assert group.cancel_pending() == 2
+    assert all(future.cancelled() for future in pending)
+    probe.release.set()
+    running.result(5)
+
+
+def test_wakeup_racing_the_idle_timeout(monkeypatch):
+    monkeypatch.setattr("core.workflow.graph_engine.workflow_scheduler.WORKER_IDLE_TIMEOUT", 0.05)
+    scheduler = WorkflowScheduler(max_workers=4, tenant_max_workers=4, nested_max_tasks=10)
+    group = scheduler.create_group("tenant", max_workers=4)
+
+    for i in range(3):
+        assert group.submit(lambda value: value, i).result(5) == i
+        _wait_until(lambda: scheduler._idle_workers == 1)
+        # the idle worker times out while the condition is held, then a task hands it a wakeup
+        with scheduler._condition:
+            time.sleep(0.2)
+            future = group.submit(lambda value: value, i)
+        assert future.result(5) == i
+        assert scheduler._idle_workers >= 0
+        _wait_until(lambda: scheduler.stats()["workers"] == 0)
+
+    assert scheduler._idle_workers == 0
+    assert scheduler._wakeups == 0
+
+
+def test_thread_pool_keeps_max_submit_count():
+    pool = GraphEngineThreadPool(tenant_id="tenant", max_workers=1, max_submit_count=2)
+    probe = _Probe()
+
+    futures = [pool.submit(probe), pool.submit(probe)]
+    with pytest.raises(ValueError, match="Max submit count 2"):
+        pool.submit(probe)
+
+    probe.release.set()
+    for future in futures:
+        future.result(5)
+        pool.task_done_callback(future)
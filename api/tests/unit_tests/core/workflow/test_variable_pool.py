@@ -436,3 +436,63 @@ class TestVariablePoolSerialization:
         loaded = VariablePool.model_validate(pool_dict)
         assert isinstance(loaded.variable_dictionary, defaultdict)
         loaded.add(["non_exist_node", "a"], 1)
+
+
+class TestVariablePoolChild:
+    def test_child_reads_through_without_copying(self, pool):
+        large_value = ["x" * 1024] * 1024
+        pool.add(("node_1", "output"), large_value)
+
+        child = pool.create_child()
+
+        assert child.get(("node_1", "output")) is pool.get(("node_1", "output"))
+        assert child.get(("sys", "user_id")).value == "test_user_id"
+        assert not child.variable_dictionary
+
+    def test_child_writes_and_removals_stay_local(self, pool):
+        pool.add(("node_1", "a"), "parent a")
+        pool.add(("node_1", "b"), "parent b")
+        pool.add(("node_2", "c"), "parent c")
+        child = pool.create_child()
+
+        child.add(("node_1", "a"), "child a")
+        child.remove(("node_1", "b"))
+        child.remove(("node_2",))
+        child.add(("node_3", "d"), "child d")
+
+        assert child.get(("node_1", "a")).value == "child a"
+        assert child.get(("node_1", "b")) is None
+        assert child.get(("node_2", "c")) is None
+        assert pool.get(("node_1", "a")).value == "parent a"
+        assert pool.get(("node_1", "b")).value == "parent b"
+        assert pool.get(("node_2", "c")).value == "parent c"
+        assert pool.get(("node_3", "d")) is None
+        assert "node_3" not in pool.variable_dictionary
+
+    def test_sibling_children_are_isolated(self, pool):
+        first, second = pool.create_child(), pool.create_child()
+
+        first.add(("iteration", "item"), 1)
+        second.add(("iteration", "item"), 2)
+
+        assert first.get(("iteration", "item")).value == 1
+        assert second.get(("iteration", "item")).value == 2
+        assert first.create_child().get(("iteration", "item")).value == 1
+
+    def test_merge_applies_child_changes(self, pool):
+        pool.add(("node_1", "a"), "parent a")
+        pool.add(("node_1", "b"), "parent b")
+        child = pool.create_child()
+        child.add(("node_1", "a"), "child a")
+        child.remove(("node_1", "b"))
+        child.add(("node_2", "c"), "child c")
+
+        pool.merge(child)
+
+        assert pool.get(("node_1", "a")).value == "child a"
+        assert pool.get(("node_1", "b")) is None
+        assert pool.get(("node_2", "c")).value == "child c"
+
+    def test_merge_rejects_unrelated_pool(self, pool):
+        with pytest.raises(ValueError, match="child"):
+            pool.merge(VariablePool.empty())
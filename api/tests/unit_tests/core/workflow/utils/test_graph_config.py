@@ -0,0 +1,81 @@
+import copy
+import json
+
+import pytest
+
+from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.utils import graph_config as graph_config_module
+from core.workflow.utils.graph_config import FrozenDict, freeze, load_graph_config
+
+GRAPH = json.dumps(
+    {
+        "nodes": [
+            {"id": "start", "data": {"type": "start", "title": "Start"}},
+            {"id": "llm", "data": {"type": "llm", "title": "LLM", "tags": ["a"]}},
+            {"id": "answer", "data": {"type": "answer", "title": "Answer", "answer": "{{#llm.text#}}"}},
+        ],
+        "edges": [
+            {"id": "start-llm", "source": "start", "target": "llm"},
+            {"id": "llm-answer", "source": "llm", "target": "answer"},
+        ],
+    }
+)
+
+
+@pytest.fixture(autouse=True)
+def graph_config_cache(monkeypatch):
+    monkeypatch.setattr(graph_config_module, "_graph_config_cache", graph_config_module.LRUCache(10))
+
+
+def test_graph_config_is_parsed_once_per_version():
+    graph_config = load_graph_config("workflow", GRAPH)
+
+    assert load_graph_config("workflow", GRAPH) is graph_config
+    assert load_graph_config("other-workflow", GRAPH) is not graph_config
+    assert load_graph_config("workflow", GRAPH.replace("LLM", "Chat")) is not graph_config
+    assert graph_config == json.loads(GRAPH)
+
+
+def test_graph_config_is_deeply_immutable():
+    graph_config = load_graph_config("workflow", GRAPH)
+
+    with pytest.raises(TypeError):
+        graph_config["nodes"] = []  # type: ignore[index]
+    with pytest.raises(TypeError):
+        graph_config["nodes"].pop()
+    with pytest.raises(TypeError):
+        graph_config["nodes"][1]["data"]["tags"].append("b")
+
+
+def test_copies_are_mutable():
+    graph_config = freeze(json.loads(GRAPH))
+
+    graph_copy = copy.deepcopy(graph_config)
+    graph_copy["nodes"][1]["data"]["tags"].append("b")
+
+    assert type(graph_copy) is dict
+    assert graph_config["nodes"][1]["data"]["tags"] == ["a"]
+
+
+def test_graphs_of_frozen_configs_are_cached_and_copied(monkeypatch):
+    monkeypatch.setattr("core.workflow.graph_engine.entities.graph._graph_cache", graph_config_module.LRUCache(10))
+    graph_config = load_graph_config("workflow", GRAPH)
+    init_calls = []
+    original_init = Graph._init.__func__
+
+    def counting_init(cls, *args):
+        init_calls.append(args)
+        return original_init(cls, *args)
+
+    monkeypatch.setattr(Graph, "_init", classmethod(counting_init))
+
+    graph = Graph.init(graph_config)
+    graph.node_id_config_mapping["llm"]["data"]["title"] = "changed"
+    other_graph = Graph.init(graph_config)
+    Graph.init(dict(graph_config))
+
+    assert len(init_calls) == 2
+    assert other_graph is not graph
+    assert other_graph.node_id_config_mapping["llm"]["data"]["title"] == "LLM"
+    assert not isinstance(other_graph.node_id_config_mapping["llm"], FrozenDict)
+    assert other_graph.answer_stream_generate_routes == graph.answer_stream_generate_routes
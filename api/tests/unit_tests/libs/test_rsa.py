@@ -1,7 +1,11 @@
+from unittest.mock import patch
+
+import pytest
 import rsa as pyrsa
+from cachetools import TTLCache
 from Crypto.PublicKey import RSA
 
-from libs import gmpy2_pkcs10aep_cipher
+from libs import gmpy2_pkcs10aep_cipher, rsa
 
 
 def test_gmpy2_pkcs10aep_cipher() -> None:
@@ -27,3 +31,59 @@ def test_gmpy2_pkcs10aep_cipher() -> None:
     encrypted_by_private_key = private_cipher_rsa.encrypt(message=raw_text_bytes)
     decrypted_by_private_key = private_cipher_rsa.decrypt(encrypted_by_private_key)
     assert decrypted_by_private_key == raw_text_bytes
+
+
+@pytest.fixture
+def key_storage():
+    files: dict[str, bytes] = {}
+    with (
+        patch("libs.rsa.storage") as storage,
+        patch("libs.rsa.redis_client") as redis_client,
+        patch.object(rsa, "_decoding_cache", TTLCache(maxsize=10, ttl=60)),
+        patch.object(rsa, "_decrypted_cache", TTLCache(maxsize=10, ttl=60)),
+    ):
+        storage.save.side_effect = files.__setitem__
+        storage.load.side_effect = lambda filepath: files[filepath]
+        redis_client.get.return_value = None
+        yield storage
+
+
+def test_decrypt_caches_key_and_secrets(key_storage) -> None:
+    public_key = rsa.generate_key_pair("tenant")
+    encrypted = rsa.encrypt("secret", public_key)
+
+    with patch("libs.rsa._decrypt_token_with_decoding", wraps=rsa._decrypt_token_with_decoding) as decrypt:
+        assert [rsa.decrypt(encrypted, "tenant") for _ in range(3)] == ["secret"] * 3
+        assert rsa.decrypt(rsa.encrypt("other", public_key), "tenant") == "other"
+
+    assert key_storage.load.call_count == 1
+    assert decrypt.call_count == 2
+
+
+def test_new_key_pair_invalidates_cache(key_storage) -> None:
+    encrypted = rsa.encrypt("secret", rsa.generate_key_pair("tenant"))
+    assert rsa.decrypt(encrypted, "tenant") == "secret"
+
+    public_key = rsa.generate_key_pair("tenant")
+
+    with pytest.raises(ValueError):
+        rsa.decrypt(encrypted, "tenant")
+    assert rsa.decrypt(rsa.encrypt("secret", public_key), "tenant") == "secret"
+    assert key_storage.load.call_count == 2
+
+
+def test_key_reset_by_another_process_invalidates_cache(key_storage) -> None:
+    generations: dict[str, int] = {}
+    rsa.redis_client.get.side_effect = lambda key: generations.get(key)
+    rsa.redis_client.incr.side_effect = lambda key: generations.__setitem__(key, generations.get(key, 0) + 1)
+    encrypted = rsa.encrypt("secret", rsa.generate_key_pair("tenant"))
+    assert rsa.decrypt(encrypted, "tenant") == "secret"
+
+    # the reset-encrypt-key-pair command replaces the key with its own cache
+    with patch.object(rsa, "_decoding_cache", TTLCache(maxsize=10, ttl=60)):
+        public_key = rsa.generate_key_pair("tenant")
+
+    with pytest.raises(ValueError):
+        rsa.decrypt(encrypted, "tenant")
+    assert rsa.decrypt(rsa.encrypt("secret", public_key), "tenant") == "secret"
+    assert key_storage.load.call_count == 2
@@ -0,0 +1,195 @@
+"""
+Unit tests for the write-behind implementation of WorkflowNodeExecutionRepository.
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.repositories import WriteBehindWorkflowNodeExecutionRepository
+from core.repositories.write_behind_workflow_node_execution_repository import _NodeExecutionWriter
+from core.workflow.entities.workflow_node_execution import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+from core.workflow.nodes.enums import NodeType
+from models.account import Account
+from models.workflow import WorkflowNodeExecutionTriggeredFrom
+
+
+@pytest.fixture
+def session():
+    session = MagicMock(spec=Session)
+    session.__enter__ = MagicMock(return_value=session)
+    session.__exit__ = MagicMock(return_value=None)
+    session_factory = MagicMock(spec=sessionmaker)
+    session_factory.return_value = session
+    return session, session_factory
+
+
+@pytest.fixture
+def mock_user():
+    user = Account()
+    user.id = "test-user-id"
+    user._current_tenant = MagicMock()
+    user._current_tenant.id = "test-tenant"
+    return user
+
+
+@pytest.fixture
+def mock_writer():
+    with patch("core.repositories.write_behind_workflow_node_execution_repository._writer") as writer:
+        yield writer
+
+
+def _repository(session_factory, user, triggered_from=WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN):
+    return WriteBehindWorkflowNodeExecutionRepository(
+        session_factory=session_factory, user=user, app_id="test-app", triggered_from=triggered_from
+    )
+
+
+def _execution(execution_id: str, status=WorkflowNodeExecutionStatus.RUNNING) -> WorkflowNodeExecution:
+    return WorkflowNodeExecution(
+        id=execution_id,
+        node_execution_id=f"node-execution-{execution_id}",
+        workflow_id="test-workflow-id",
+        workflow_execution_id="test-workflow-run-id",
+        index=1,
+        node_id="test-node-id",
+        node_type=NodeType.LLM,
+        title="Test Node",
+        status=status,
+        created_at=datetime.now(),
+    )
+
+
+def test_save_buffers_until_flush(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    repository = _repository(session_factory, mock_user)
+
+    repository.save(_execution("a"))
+    repository.save(_execution("b"))
+
+    session_obj.merge.assert_not_called()
+    mock_writer.schedule.assert_called_with(repository, urgent=False)
+
+    repository.flush()
+
+    assert [call.args[0].id for call in session_obj.merge.call_args_list] == ["a", "b"]
+    session_obj.commit.assert_called_once()
+
+
+def test_only_latest_state_is_written(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    repository = _repository(session_factory, mock_user)
+
+    repository.save(_execution("a"))
+    repository.save(_execution("a", status=WorkflowNodeExecutionStatus.SUCCEEDED))
+    repository.flush()
+
+    session_obj.merge.assert_called_once()
+    assert session_obj.merge.call_args.args[0].status == WorkflowNodeExecutionStatus.SUCCEEDED
+
+
+def test_full_batch_is_urgent(session, mock_user, mock_writer, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE", 2)
+    _, session_factory = session
+    repository = _repository(session_factory, mock_user)
+
+    repository.save(_execution("a"))
+    repository.save(_execution("b"))
+
+    assert [call.kwargs["urgent"] for call in mock_writer.schedule.call_args_list] == [False, True]
+
+
+def test_failed_flush_keeps_newer_states(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    repository = _repository(session_factory, mock_user)
+    repository.save(_execution("a"))
+    repository.save(_execution("b"))
+
+    def commit_after_newer_save():
+        repository.save(_execution("a", status=WorkflowNodeExecutionStatus.FAILED))
+        raise RuntimeError("database unavailable")
+
+    session_obj.commit.side_effect = commit_after_newer_save
+    with pytest.raises(RuntimeError):
+        repository.flush()
+
+    session_obj.merge.reset_mock()
+    session_obj.commit.side_effect = None
+    repository.flush()
+
+    written = {call.args[0].id: call.args[0].status for call in session_obj.merge.call_args_list}
+    assert written == {"a": WorkflowNodeExecutionStatus.FAILED, "b": WorkflowNodeExecutionStatus.RUNNING}
+
+
+def test_single_step_is_saved_synchronously(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    repository = _repository(session_factory, mock_user, WorkflowNodeExecutionTriggeredFrom.SINGLE_STEP)
+
+    repository.save(_execution("a"))
+
+    session_obj.merge.assert_called_once()
+    mock_writer.schedule.assert_not_called()
+
+
+def test_reads_flush_first(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    repository = _repository(session_factory, mock_user)
+    repository.save(_execution("a"))
+
+    repository.get_db_models_by_workflow_run("test-workflow-run-id")
+
+    session_obj.merge.assert_called_once()
+
+
+def test_writer_backs_off_and_drops_after_max_attempts(session, mock_user, mock_writer, monkeypatch):
+    monkeypatch.setattr("configs.dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL", 0.5)
+    monkeypatch.setattr("configs.dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS", 3)
+    session_obj, session_factory = session
+    session_obj.commit.side_effect = RuntimeError("database unavailable")
+    repository = _repository(session_factory, mock_user)
+    repository.save(_execution("a"))
+    repository.save(_execution("b"))
+    writer = _NodeExecutionWriter()
+    writer._repositories[repository] = None
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+
+    with patch("core.repositories.write_behind_workflow_node_execution_repository._dropped_counter") as counter:
+        writer._flush_scheduled()
+        assert writer._retries[repository] == (1, 101.0)
+        # not retried before the backoff delay is over
+        writer._flush_scheduled()
+        assert session_obj.commit.call_count == 1
+
+        now = 101.0
+        writer._flush_scheduled()
+        assert writer._retries[repository] == (2, 103.0)
+
+        now = 103.0
+        writer._flush_scheduled()
+
+    assert session_obj.commit.call_count == 3
+    counter.add.assert_called_once_with(2)
+    # the dropped executions and the repository are released
+    assert repository._pending == {}
+    assert writer._repositories == {}
+    assert writer._retries == {}
+
+
+def test_writer_releases_repository_after_retry_succeeds(session, mock_user, mock_writer):
+    session_obj, session_factory = session
+    session_obj.commit.side_effect = [RuntimeError("database unavailable"), None]
+    repository = _repository(session_factory, mock_user)
+    repository.save(_execution("a"))
+    writer = _NodeExecutionWriter()
+    writer._repositories[repository] = None
+
+    writer._flush_scheduled()
+    writer._retries[repository] = (1, 0.0)
+    writer._flush_scheduled()
+
+    assert session_obj.commit.call_count == 2
+    assert writer._repositories == {}
+    assert writer._retries == {}
@@ -0,0 +1,131 @@
+import importlib
+import operator
+import sys
+from collections import defaultdict, namedtuple
+from collections.abc import Callable
+from types import ModuleType, SimpleNamespace
+from typing import Any
+
+import pytest
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import Tuple
+
+_OPERATORS: dict[Any, Callable[[Any, Any], bool]] = {
+    operators.lt: operator.lt,
+    operators.le: operator.le,
+    operators.in_op: lambda value, values: value in values,
+}
+
+
+def _column_value(row: SimpleNamespace, clause: Any) -> Any:
+    if isinstance(clause, Tuple):
+        return tuple(_column_value(row, column) for column in clause.clauses)
+    return getattr(row, clause.key)
+
+
+def _bound_value(clause: Any) -> Any:
+    if isinstance(clause, Tuple):
+        return tuple(_bound_value(value) for value in clause.clauses)
+    return clause.effective_value
+
+
+class FakeQuery:
+    """Evaluates the comparisons, ordering and limit the clean tasks use on in-memory rows."""
+
+    def __init__(self, session: "FakeSession", table: str, columns: list[str] | None) -> None:
+        self._session = session
+        self._table = table
+        self._row_type = namedtuple("Row", columns) if columns else None  # type: ignore
+        self._criteria: list[Any] = []
+        self._order_by: list[Any] = []
+        self._limit: int | None = None
+
+    def where(self, *criteria: Any) -> "FakeQuery":
+        self._criteria.extend(criteria)
+        return self
+
+    def order_by(self, *clauses: Any) -> "FakeQuery":
+        # the tasks only walk from the newest rows to the oldest
+        assert all(clause.modifier is operators.desc_op for clause in clauses)
+        self._order_by.extend(clause.element.key for clause in clauses)
+        return self
+
+    def limit(self, limit: int) -> "FakeQuery":
+        self._limit = limit
+        return self
+
+    def _rows(self) -> list[SimpleNamespace]:
+        rows = [
+            row
+            for row in self._session.tables[self._table]
+            if all(
+                _OPERATORS[criterion.operator](_column_value(row, criterion.left), _bound_value(criterion.right))
+                for criterion in self._criteria
+            )
+        ]
+        if self._order_by:
+            rows.sort(key=lambda row: tuple(getattr(row, key) for key in self._order_by), reverse=True)
+        return rows[: self._limit] if self._limit is not None else rows
+
+    def all(self) -> list[Any]:
+        rows = self._rows()
+        self._session.selected[self._table].append([row.id for row in rows])
+        if self._row_type is None:
+            return rows
+        return [self._row_type(*(getattr(row, key) for key in self._row_type._fields)) for row in rows]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def delete(self, synchronize_session: Any = None) -> int:
+        self._session.before_delete(self._table)
+        rows = self._rows()
+        self._session.tables[self._table] = [row for row in self._session.tables[self._table] if row not in rows]
+        return len(rows)
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.tables: defaultdict[str, list[SimpleNamespace]] = defaultdict(list)
+        # ids of the rows returned by each query, by table
+        self.selected: defaultdict[str, list[list[Any]]] = defaultdict(list)
+        self.commit_count = 0
+        self.rollback_count = 0
+        self.before_delete: Callable[[str], None] = lambda table: None
+
+    def add_rows(self, table: str, rows: list[dict[str, Any]]) -> None:
+        self.tables[table].extend(SimpleNamespace(**row) for row in rows)
+
+    def query(self, entity: Any, *entities: Any) -> FakeQuery:
+        # a model, or columns of one model
+        if hasattr(entity, "class_"):
+            return FakeQuery(self, entity.class_.__tablename__, [column.key for column in (entity, *entities)])
+        return FakeQuery(self, entity.__tablename__, None)
+
+    def commit(self) -> None:
+        self.commit_count += 1
+
+    def rollback(self) -> None:
+        self.rollback_count += 1
+
+
+@pytest.fixture
+def fake_session() -> FakeSession:
+    return FakeSession()
+
+
+@pytest.fixture
+def load_task(monkeypatch, fake_session) -> Callable[[str], ModuleType]:
+    """Import a schedule module with its database session replaced by `fake_session`."""
+
+    def load(name: str) -> ModuleType:
+        # the app module creates the whole app when imported, the tasks only need its celery decorator
+        celery = SimpleNamespace(task=lambda **kwargs: lambda fn: fn)
+        monkeypatch.setitem(sys.modules, "app", SimpleNamespace(celery=celery))
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        module = importlib.import_module(name)
+        monkeypatch.setattr(module, "db", SimpleNamespace(session=fake_session))
+        monkeypatch.setattr("configs.dify_config.CLEAN_TASK_BATCH_INTERVAL", 0)
+        return module
+
+    return load
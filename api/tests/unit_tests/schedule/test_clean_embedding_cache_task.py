@@ -0,0 +1,27 @@
+import datetime
+
+_NOW = datetime.datetime.now()
+
+
+def test_deletes_old_embeddings_in_batches(monkeypatch, load_task, fake_session):
+    monkeypatch.setattr("configs.dify_config.CLEAN_EMBEDDING_CACHE_BATCH_SIZE", 2)
+    monkeypatch.setattr("configs.dify_config.PLAN_SANDBOX_CLEAN_DAY_SETTING", 30)
+    module = load_task("schedule.clean_embedding_cache_task")
+    days_ago = [31, 31, 31, 45, 45, 1]
+    fake_session.add_rows(
+        "embeddings",
+        [
+            {"id": f"embedding-{i}", "created_at": _NOW - datetime.timedelta(days=days)}
+            for i, days in enumerate(days_ago)
+        ],
+    )
+
+    module.clean_embedding_cache_task()
+
+    assert [embedding.id for embedding in fake_session.tables["embeddings"]] == ["embedding-5"]
+    assert fake_session.selected["embeddings"] == [
+        ["embedding-2", "embedding-1"],
+        ["embedding-0", "embedding-4"],
+        ["embedding-3"],
+        [],
+    ]
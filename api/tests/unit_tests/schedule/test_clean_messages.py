@@ -0,0 +1,82 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+_NOW = datetime.datetime.now()
+_PLANS = {"tenant-sandbox": "sandbox", "tenant-pro": "professional"}
+
+
+def _features(tenant_id):
+    return SimpleNamespace(billing=SimpleNamespace(subscription=SimpleNamespace(plan=_PLANS[tenant_id])))
+
+
+@pytest.fixture
+def clean_messages(monkeypatch, load_task, fake_session):
+    monkeypatch.setattr("configs.dify_config.CLEAN_MESSAGES_BATCH_SIZE", 3)
+    monkeypatch.setattr("configs.dify_config.PLAN_SANDBOX_CLEAN_MESSAGE_DAY_SETTING", 30)
+    module = load_task("schedule.clean_messages")
+    fake_session.add_rows(
+        "apps",
+        [{"id": "app-sandbox", "tenant_id": "tenant-sandbox"}, {"id": "app-pro", "tenant_id": "tenant-pro"}],
+    )
+    # several messages share a created_at, so batches end in the middle of them
+    days_ago = [40, 40, 40, 40, 50, 50, 50, 60, 60, 1]
+    fake_session.add_rows(
+        "messages",
+        [
+            {
+                "id": f"message-{i}",
+                "app_id": "app-pro" if i % 4 == 0 else "app-sandbox",
+                "created_at": _NOW - datetime.timedelta(days=days),
+            }
+            for i, days in enumerate(days_ago)
+        ],
+    )
+    fake_session.add_rows(
+        "message_feedbacks", [{"id": f"feedback-{i}", "message_id": f"message-{i}"} for i in range(10)]
+    )
+    with patch.object(module.FeatureService, "get_features", side_effect=_features):
+        yield module
+
+
+def _message_ids(fake_session):
+    return sorted(message.id for message in fake_session.tables["messages"])
+
+
+def test_walks_batches_sharing_created_at_once(clean_messages, fake_session):
+    clean_messages.clean_messages()
+
+    scanned = [message_id for batch in fake_session.selected["messages"] for message_id in batch]
+    old_messages = [f"message-{i}" for i in range(9)]
+    assert sorted(scanned) == old_messages
+    assert [len(batch) for batch in fake_session.selected["messages"]] == [3, 3, 3, 0]
+
+
+def test_keeps_messages_of_other_plans_and_recent_ones(clean_messages, fake_session):
+    clean_messages.clean_messages()
+
+    # message-0, 4 and 8 belong to the professional tenant, message-9 is recent
+    assert _message_ids(fake_session) == ["message-0", "message-4", "message-8", "message-9"]
+    assert sorted(feedback.message_id for feedback in fake_session.tables["message_feedbacks"]) == _message_ids(
+        fake_session
+    )
+
+
+def test_continues_after_a_failed_batch(clean_messages, fake_session):
+    failed = []
+
+    def fail_first_batch(table):
+        if not failed:
+            failed.append(table)
+            raise RuntimeError("deadlock detected")
+
+    fake_session.before_delete = fail_first_batch
+
+    clean_messages.clean_messages()
+
+    assert fake_session.rollback_count == 1
+    # the first batch holds the newest old messages, message-1 to 3 of the same created_at
+    assert _message_ids(fake_session) == [f"message-{i}" for i in (0, 1, 2, 3, 4, 8, 9)]
+    assert [len(batch) for batch in fake_session.selected["messages"]] == [3, 3, 3, 0]
@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.models.document import Document
+from tasks.recover_document_indexing_task import recover_document_indexing_task
+
+
+def _text_docs(count: int) -> list[Document]:
+    return [Document(page_content=f"text {i}", metadata={"doc_id": str(i)}) for i in range(count)]
+
+
+def test_recover_resumes_a_paused_streaming_run_from_its_split_checkpoint(monkeypatch):
+    monkeypatch.setattr("configs.dify_config.INDEXING_STREAMING_BATCH_SIZE", 2)
+    monkeypatch.setattr("configs.dify_config.INDEXING_STREAMING_MAX_PENDING_BATCHES", 1)
+    checkpoints: dict[str, tuple[int, int]] = {}
+    runner = IndexingRunner.__new__(IndexingRunner)
+    runner._extract = MagicMock(side_effect=lambda *_: _text_docs(7))  # type: ignore
+    runner._save_segments = MagicMock()  # type: ignore
+    runner._update_document_index_status = MagicMock()  # type: ignore
+    runner._index_documents = MagicMock(side_effect=lambda _, __, ___, documents: len(documents))  # type: ignore
+    runner._save_split_checkpoint = MagicMock(  # type: ignore
+        side_effect=lambda document_id, split_text_docs: checkpoints.update({document_id: (split_text_docs, 4)})
+    )
+    runner._clear_split_checkpoint = MagicMock(  # type: ignore
+        side_effect=lambda document_id: checkpoints.pop(document_id, None)
+    )
+    runner.get_split_checkpoint = MagicMock(side_effect=checkpoints.get)  # type: ignore
+
+    def pause_at_text_4(index_processor, dataset, text_docs, doc_language, process_rule):
+        if text_docs[0].page_content == "text 4":
+            raise DocumentIsPausedError()
+        return list(text_docs)
+
+    runner._transform = MagicMock(side_effect=pause_at_text_4)  # type: ignore
+    document = MagicMock(id="document-id", dataset_id="dataset-id", indexing_status="splitting", doc_form="text_model")
+
+    with Flask(__name__).app_context(), patch("core.indexing_runner.db") as runner_db:
+        # the document is paused while its third batch is split
+        with pytest.raises(DocumentIsPausedError):
+            runner._run_streaming(MagicMock(), MagicMock(), document, _text_docs(7), {})
+        assert checkpoints == {"document-id": (4, 4)}
+
+        segments = [MagicMock(status="completed", tokens=1, position=position) for position in range(1, 5)]
+        runner_db.session.query.return_value.filter_by.return_value.all.return_value = segments
+        runner._transform.reset_mock()
+        runner._transform.side_effect = lambda _, __, text_docs, ___, ____: list(text_docs)
+        with (
+            patch("tasks.recover_document_indexing_task.db") as task_db,
+            patch("tasks.recover_document_indexing_task.IndexingRunner") as indexing_runner_cls,
+            patch("core.indexing_runner.IndexProcessorFactory"),
+        ):
+            task_db.session.query.return_value.where.return_value.first.return_value = document
+            task_db.session.query.return_value.where.return_value.all.return_value = segments
+            indexing_runner_cls.return_value = runner
+            indexing_runner_cls.get_split_checkpoint.side_effect = checkpoints.get
+            recover_document_indexing_task("dataset-id", "document-id")
+
+    # only the text documents after the checkpoint are split again, the saved segments are kept
+    transformed = [[text_doc.page_content for text_doc in call.args[2]] for call in runner._transform.call_args_list]
+    assert transformed == [["text 4", "text 5"], ["text 6"]]
+    runner_db.session.delete.assert_not_called()
+    assert checkpoints == {}
+    completed = runner._update_document_index_status.call_args.kwargs
+    assert completed["after_indexing_status"] == "completed"
+    assert 7 in completed["extra_update_params"].values()